@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+'''Offline benchmark for the Raspberry Pi Information Screen's plugins.
+
+   Each enabled screen is started on its own and the time taken by each step
+   of its life is measured:
+
+     - loading its KV file, importing it and creating the screen;
+     - its first on_pre_enter/on_enter;
+     - every callback it makes on the main loop while it's displayed (its
+       update cycles);
+     - removing it again (unload and remove_screen).
+
+   along with the number of widgets and the memory used. The results are
+   written as JSON so that runs from different commits can be compared.
+
+   Screens are fed with recorded responses (see core/fixtures.py) rather than
+   the real servers so the results don't depend on the network. To record
+   the responses (this does need a network):
+
+       python benchmark.py --record
+
+   and then to run the benchmark:
+
+       python benchmark.py --output results.json
+
+   The benchmark needs a window so, on a machine without a display, run it
+   under a virtual one e.g. "xvfb-run python benchmark.py".
+'''
+import argparse
+import gc
+import imp
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+# Stop Kivy from trying to parse our command line options
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+
+import kivy
+from kivy.app import App
+from kivy.clock import Clock
+from kivy.core.window import Window
+from kivy.logger import Logger
+from kivy.uix.screenmanager import NoTransition
+
+from core.clockprofile import clock_profiler
+from core.fetch import fetch_service
+from core.fixtures import FixtureFolder, FixtureSession
+from core.getplugins import getPlugins, loadPluginModule
+from core.httpclient import http_client
+from core.infoscreen import InfoScreen
+from core.kvcache import kv_cache
+from core.metrics import count_widgets, process_rss
+from core.tracing import tracer
+
+# Set the current working directory
+os.chdir(os.path.dirname(os.path.abspath(sys.argv[0])))
+
+# How long (in seconds) to leave each screen running
+DEFAULT_DURATION = 10
+
+# How long to wait after removing a screen before measuring the memory
+SETTLE_TIME = 1
+
+
+def git_commit():
+    """Returns the commit being benchmarked (or None if it's not known)."""
+    try:
+        with open(os.devnull, "w") as devnull:
+            return subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                           stderr=devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def screen_folder(plugin):
+    """Returns the name of the folder the plugin lives in. The profiler and
+       the fetch service use this to identify a screen.
+    """
+    return os.path.basename(os.path.dirname(plugin["kvpath"]))
+
+
+def missing_dependencies(plugin):
+    missing = []
+    for d in plugin["dependencies"]:
+        try:
+            imp.find_module(d)
+        except ImportError:
+            missing.append(d)
+    return missing
+
+
+class Stopwatch(object):
+    """Records how long the code inside it took in a dictionary."""
+    def __init__(self, results, name):
+        self.results = results
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.results[self.name] = time.time() - self.start
+        return False
+
+
+class BenchmarkApp(App):
+    def __init__(self, plugins, duration, **kwargs):
+        super(BenchmarkApp, self).__init__(**kwargs)
+        self.plugins = plugins
+        self.duration = duration
+        self.results = {}
+        self.base = None
+        self._steps = None
+
+    def build(self):
+        # Same size as the official Raspberry Pi display
+        Window.size = (800, 480)
+        kv_cache.load_file("base.kv")
+
+        # Start with no screens. We'll add them one at a time.
+        self.base = InfoScreen(plugins=[])
+        self.base.scrmgr.transition = NoTransition()
+        return self.base
+
+    def on_start(self):
+        self._steps = self.run_benchmarks()
+        Clock.schedule_once(self.step, 0)
+
+    def step(self, *args):
+        """Runs the benchmark until it next needs to let the app run."""
+        try:
+            delay = next(self._steps)
+        except StopIteration:
+            self.stop()
+        else:
+            Clock.schedule_once(self.step, delay)
+
+    def run_benchmarks(self):
+        for p in self.plugins:
+            result = self.results[p["name"]] = {}
+            Logger.info("Benchmark: Starting {}".format(p["name"]))
+
+            missing = missing_dependencies(p)
+            if missing:
+                result["error"] = "Missing dependencies: {}".format(missing)
+                continue
+
+            try:
+                for delay in self.benchmark_screen(p, result):
+                    yield delay
+
+            except Exception, e:
+                Logger.exception("Benchmark: {} failed".format(p["name"]))
+                result["error"] = repr(e)
+
+                # Don't leave a broken screen behind for the next one
+                if p["name"] in self.base.availablescreens:
+                    self.base.remove_screen(p["name"])
+
+    def benchmark_screen(self, p, result):
+        base = self.base
+        name = p["name"]
+        folder = screen_folder(p)
+        timings = result["timings"] = {}
+        memory = result["memory"] = {}
+        widgets = result["widgets"] = {}
+
+        gc.collect()
+        memory["start"] = process_rss()
+
+        # Load and create the screen
+        with Stopwatch(timings, "kv"):
+            kv_cache.load_file(p["kvpath"])
+
+        with Stopwatch(timings, "import"):
+            plugin = loadPluginModule(p)
+
+        for source, ttl in p["cache"].items():
+            http_client.cache.set_ttl(source, ttl)
+
+        with Stopwatch(timings, "construct"):
+            screen = getattr(plugin, p["screen"])(name=name,
+                                                  master=base,
+                                                  params=p["params"])
+
+        widgets["construct"] = count_widgets(screen)
+        memory["construct"] = process_rss()
+
+        # Time the screen's on_enter. The screen manager dispatches the event
+        # on the next frame so we have to time the handler itself.
+        self.time_enter(screen, timings)
+
+        base.scrmgr.add_widget(screen)
+        base.availablescreens.append(name)
+        base.switch_to(name)
+
+        # Let the screen run and update itself
+        yield self.duration
+
+        widgets["running"] = count_widgets(screen)
+        memory["running"] = process_rss()
+
+        # Everything the screen did on the main loop while it was running
+        report = clock_profiler.report()["screens"]
+        result["callbacks"] = report.get(folder, {})
+
+        fetches = fetch_service.screen_stats().get(folder)
+        if fetches is not None:
+            (buckets, total, count), errors = fetches
+            result["fetches"] = {"count": count,
+                                 "total": total,
+                                 "avg": total / count if count else 0.0,
+                                 "errors": errors}
+
+        # And remove it again
+        del screen
+        with Stopwatch(timings, "teardown"):
+            base.remove_screen(name)
+
+        # Give anything holding on to the screen a chance to let go
+        yield SETTLE_TIME
+        gc.collect()
+        memory["end"] = process_rss()
+
+    def time_enter(self, screen, timings):
+        """Wraps the screen's on_pre_enter and on_enter handlers to time the
+           first call to each.
+        """
+        for event in ("on_pre_enter", "on_enter"):
+            handler = getattr(screen, event)
+
+            def timed(*args, **kwargs):
+                start = time.time()
+                try:
+                    return timed.handler(*args, **kwargs)
+                finally:
+                    timings.setdefault(timed.event, time.time() - start)
+
+            timed.handler = handler
+            timed.event = event.replace("on_", "first_")
+            setattr(screen, event, timed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the screens.")
+    parser.add_argument("--screens", nargs="*", metavar="NAME",
+                        help="screens to run (default: all enabled screens)")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION,
+                        help="seconds to run each screen for")
+    parser.add_argument("--fixtures", default=FixtureFolder,
+                        help="folder of recorded responses")
+    parser.add_argument("--record", action="store_true",
+                        help="record responses from the real servers")
+    parser.add_argument("--clear-kvcache", action="store_true",
+                        help="parse the KV files rather than loading them "
+                             "from the cache")
+    parser.add_argument("--output", help="file for the results "
+                                         "(default: print them)")
+    args = parser.parse_args()
+
+    # Compare a run after this with one after --clear-kvcache to see what the
+    # KV cache saves
+    if args.clear_kvcache and os.path.isdir(kv_cache.folder):
+        shutil.rmtree(kv_cache.folder)
+
+    plugins = getPlugins()
+    if args.screens:
+        plugins = [p for p in plugins if p["name"] in args.screens]
+
+    # Time everything the screens do on the main loop
+    clock_profiler.configure(enabled=True)
+    clock_profiler.install()
+    tracer.configure(enabled=True)
+
+    # Use the recorded responses in place of the network
+    fixtures = FixtureSession(args.fixtures, record=args.record)
+    http_client.use_session(fixtures)
+
+    app = BenchmarkApp(plugins, args.duration)
+    app.run()
+
+    fixtures.close()
+
+    # Save the timeline of the screens' refreshes too
+    tracer.export()
+
+    results = {"timestamp": time.time(),
+               "commit": git_commit(),
+               "python": platform.python_version(),
+               "kivy": kivy.__version__,
+               "duration": args.duration,
+               "record": args.record,
+               "screens": app.results,
+               "kvcache": kv_cache.stats(),
+               "fixtures": {"used": sorted(fixtures.used),
+                            "missing": sorted(fixtures.missing)}}
+
+    if args.output:
+        with open(args.output, "w") as rfile:
+            json.dump(results, rfile, indent=4, sort_keys=True)
+        Logger.info("Benchmark: Results saved to {}".format(args.output))
+    else:
+        print json.dumps(results, indent=4, sort_keys=True)
+
+if __name__ == "__main__":
+    main()
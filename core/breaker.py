@@ -0,0 +1,181 @@
+'''Circuit breakers for the servers used by the screens.
+
+   If a server is down, there's no point sending it a request every time a
+   screen updates as each one will just wait for the full timeout. Instead,
+   each host has a circuit breaker:
+
+     closed:    requests are sent as normal. After a number of failures in a
+                row (connection errors, timeouts or 5xx responses) the breaker
+                opens.
+
+     open:      requests fail straight away with CircuitOpenError. The breaker
+                stays open for a backoff period which doubles each time the
+                breaker opens again (up to a maximum), with some random jitter
+                so that screens don't all retry at the same moment.
+
+     half_open: once the backoff has passed, one request is allowed through
+                as a probe. If it succeeds the breaker closes, otherwise it
+                opens again.
+
+   The failure count and backoff can be set in the "http" section of
+   config.json.
+'''
+import random
+import time
+from threading import Lock
+
+try:
+    from requests import ConnectionError as _BaseError
+except ImportError:
+    _BaseError = IOError
+
+# Number of failures in a row before a breaker opens
+DEFAULT_FAILURES = 3
+
+# Backoff (in seconds) the first time a breaker opens
+DEFAULT_BACKOFF = 5
+
+# Maximum backoff (in seconds)
+DEFAULT_MAX_BACKOFF = 300
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(_BaseError):
+    """Raised instead of making a request to a host that is down.
+
+       This is a subclass of requests.ConnectionError so screens which
+       already handle connection errors don't need to change.
+    """
+    pass
+
+
+class CircuitBreaker(object):
+    def __init__(self, host, failures=DEFAULT_FAILURES,
+                 backoff=DEFAULT_BACKOFF, maxbackoff=DEFAULT_MAX_BACKOFF):
+        self.host = host
+        self.failures = failures
+        self.backoff = backoff
+        self.maxbackoff = maxbackoff
+        self.state = CLOSED
+
+        # Number of failures since the last success
+        self.failed = 0
+
+        # Number of times the breaker has opened since the last success
+        self.trips = 0
+
+        self.retry_at = None
+        self.probing = False
+        self.rejected = 0
+        self.last_error = None
+        self._lock = Lock()
+
+    def allow(self):
+        """Returns True if a request can be sent to the host."""
+        with self._lock:
+            if self.state == OPEN and time.time() >= self.retry_at:
+                self.state = HALF_OPEN
+                self.probing = False
+
+            # Only one probe at a time when half open
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+
+            if self.state == CLOSED:
+                return True
+
+            self.rejected += 1
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failed = 0
+            self.trips = 0
+            self.retry_at = None
+            self.probing = False
+
+    def failure(self, error=None):
+        with self._lock:
+            self.failed += 1
+            if isinstance(error, basestring):
+                self.last_error = error
+            else:
+                self.last_error = repr(error)
+
+            if self.state == HALF_OPEN or self.failed >= self.failures:
+                self._trip()
+
+    def release(self):
+        """Ends a probe without changing the state of the breaker."""
+        with self._lock:
+            self.probing = False
+
+    def _trip(self):
+        """Opens the breaker (must be called with the lock held)."""
+        delay = min(self.maxbackoff, self.backoff * 2 ** self.trips)
+
+        # Jitter so that requests to the host don't all retry together
+        delay = random.uniform(delay / 2.0, delay)
+
+        self.state = OPEN
+        self.trips += 1
+        self.retry_at = time.time() + delay
+        self.probing = False
+
+    def status(self):
+        with self._lock:
+            retry = None
+            if self.state == OPEN:
+                retry = max(0.0, self.retry_at - time.time())
+
+            return {"state": self.state,
+                    "failures": self.failed,
+                    "trips": self.trips,
+                    "retry_in": retry,
+                    "rejected": self.rejected,
+                    "last_error": self.last_error}
+
+
+class BreakerRegistry(object):
+    """Keeps a circuit breaker for each host."""
+    def __init__(self):
+        self.failures = DEFAULT_FAILURES
+        self.backoff = DEFAULT_BACKOFF
+        self.maxbackoff = DEFAULT_MAX_BACKOFF
+        self._breakers = {}
+        self._lock = Lock()
+
+    def configure(self, failures=None, backoff=None, maxbackoff=None):
+        with self._lock:
+            if failures is not None:
+                self.failures = max(1, int(failures))
+            if backoff is not None:
+                self.backoff = backoff
+            if maxbackoff is not None:
+                self.maxbackoff = maxbackoff
+
+            # Existing breakers start again with the new settings
+            self._breakers.clear()
+
+    def get(self, host):
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(host,
+                                         failures=self.failures,
+                                         backoff=self.backoff,
+                                         maxbackoff=self.maxbackoff)
+                self._breakers[host] = breaker
+            return breaker
+
+    def status(self):
+        """Returns the state of each host's breaker."""
+        with self._lock:
+            breakers = self._breakers.values()
+
+        return dict((b.host, b.status()) for b in breakers)
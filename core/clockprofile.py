@@ -0,0 +1,324 @@
+'''Clock callback profiler for the Raspberry Pi Information Screen.
+
+   When a callback takes too long, it blocks the main loop and the display
+   stutters. With profiling turned on (the "profile" section of config.json),
+   every callback that a screen schedules with Clock.schedule_once or
+   Clock.schedule_interval is timed. So is every callback that the fetch
+   service or tick bus makes to a screen.
+
+   For each callback we record the number of calls and the median, 95th
+   percentile and maximum duration. A warning is logged whenever a callback
+   blocks the main loop for longer than the threshold. The owning screen is
+   worked out from the file that the callback (or the code that scheduled
+   it) lives in.
+
+   The results are available from [HOST]/api/profile and are written to a
+   file when the app exits.
+'''
+import json
+import os
+import sys
+import time
+import weakref
+from collections import deque
+from functools import partial
+from threading import Lock
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+from kivy.weakmethod import WeakMethod
+
+# Callbacks taking longer than this (in seconds) are reported
+DEFAULT_THRESHOLD = 0.05
+
+# Where to save the results when the app exits
+DEFAULT_PROFILE_FILE = os.path.join(".", "cache", "profile.json")
+
+# Number of recent durations to keep for each callback
+MAX_SAMPLES = 1000
+
+# Folder containing the screens
+SCREENS_FOLDER = os.sep + "screens" + os.sep
+
+
+def _screen_from_file(filename):
+    """Returns the name of the screen folder a file belongs to (or None)."""
+    path = os.path.abspath(filename)
+    pos = path.rfind(SCREENS_FOLDER)
+    if pos == -1:
+        return None
+    return path[pos + len(SCREENS_FOLDER):].split(os.sep)[0]
+
+
+def _unwrap(callback):
+    """Returns the underlying function of a callback."""
+    while isinstance(callback, partial):
+        callback = callback.func
+    callback = getattr(callback, "__func__", callback)
+
+    # Functions wrapped by a decorator (e.g. tracer.traced)
+    return getattr(callback, "__wrapped__", callback)
+
+
+def _callback_name(callback):
+    func = _unwrap(callback)
+    name = getattr(func, "__name__", repr(func))
+    obj = getattr(callback, "__self__", None)
+    if obj is not None:
+        name = "{}.{}".format(obj.__class__.__name__, name)
+    return name
+
+
+def callback_screen(callback):
+    """Works out which screen a callback belongs to from its code."""
+    code = getattr(_unwrap(callback), "__code__", None)
+    if code is None:
+        return None
+    return _screen_from_file(code.co_filename)
+
+
+def owner_screen(owner):
+    """Works out which screen an object (e.g. one of a screen's widgets)
+       belongs to from the code of its class.
+
+       The plugins' modules all have the same name ("screen") so we look at
+       the files that the class's methods were defined in.
+    """
+    if owner is None:
+        return None
+
+    for cls in type(owner).__mro__:
+        for value in vars(cls).values():
+            code = getattr(_unwrap(value), "__code__", None)
+            if code is not None:
+                screen = _screen_from_file(code.co_filename)
+                if screen is not None:
+                    return screen
+
+    return None
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = int(round(pct / 100.0 * (len(values) - 1)))
+    return values[index]
+
+
+class ProfiledCallback(object):
+    """Wraps a scheduled callback so that it can be timed.
+
+       The Clock only keeps weak references to bound methods so we do the
+       same: the original callback can still be garbage collected along with
+       its screen.
+    """
+    def __init__(self, profiler, callback, owner):
+        self.profiler = profiler
+        self.callback = WeakMethod(callback)
+        self.owner = owner
+        self.name = _callback_name(callback)
+
+    def __call__(self, *args):
+        callback = self.callback()
+        if callback is None:
+            return False
+
+        return self.profiler.timed(self.owner, self.name, callback, *args)
+
+
+class ClockProfiler(object):
+    def __init__(self):
+        self.enabled = False
+        self.threshold = DEFAULT_THRESHOLD
+        self.filename = DEFAULT_PROFILE_FILE
+        self.installed = False
+        self._lock = Lock()
+
+        # (owner, name) -> stats
+        self._callbacks = {}
+
+        # Object -> {function: ProfiledCallback}. Keeps the wrappers for
+        # bound methods alive for as long as the object is.
+        self._wrappers = weakref.WeakKeyDictionary()
+
+        # Callback -> wrapper for other callbacks (e.g. lambdas and partials).
+        # The Clock keeps the wrapper (and so the callback) alive while it's
+        # scheduled, after which the entry is removed.
+        self._functions = weakref.WeakValueDictionary()
+
+        self._schedule_once = None
+        self._schedule_interval = None
+        self._unschedule = None
+
+    def configure(self, enabled=None, threshold=None, filename=None):
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if threshold is not None:
+            self.threshold = threshold
+        if filename is not None:
+            self.filename = filename
+
+    def install(self):
+        """Starts timing callbacks scheduled by the screens."""
+        if self.installed or not self.enabled:
+            return
+
+        self._schedule_once = Clock.schedule_once
+        self._schedule_interval = Clock.schedule_interval
+        self._unschedule = Clock.unschedule
+
+        Clock.schedule_once = partial(self._schedule, self._schedule_once)
+        Clock.schedule_interval = partial(self._schedule,
+                                          self._schedule_interval)
+        Clock.unschedule = self.unschedule
+
+        self.installed = True
+        Logger.info("Profile: Timing screen callbacks "
+                    "(threshold {:.0f}ms)".format(self.threshold * 1000))
+
+    def _wrapper(self, callback, owner):
+        """Returns the callable to give to the Clock in place of callback."""
+        obj = getattr(callback, "__self__", None)
+
+        # Plain functions (e.g. lambdas) are kept by the Clock so we can just
+        # wrap them. We remember the wrapper so that it can be unscheduled.
+        if obj is None:
+            try:
+                wrapped = self._functions.get(callback)
+            except TypeError:
+                # Can't look it up later so don't profile it
+                return callback
+
+            if wrapped is None:
+                wrapper = ProfiledCallback(self, callback, owner)
+                wrapped = lambda *args: wrapper(*args)
+                self._functions[callback] = wrapped
+            return wrapped
+
+        try:
+            wrappers = self._wrappers.setdefault(obj, {})
+        except TypeError:
+            # Can't keep a weak reference to the object so don't profile it
+            return callback
+
+        func = callback.__func__
+        if func not in wrappers:
+            wrappers[func] = ProfiledCallback(self, callback, owner)
+        return wrappers[func].__call__
+
+    def _schedule(self, schedule, callback, timeout=0):
+        # Find the screen that's scheduling the callback or, failing that,
+        # the screen that the callback belongs to.
+        caller = sys._getframe(1).f_code.co_filename
+        owner = _screen_from_file(caller) or callback_screen(callback)
+
+        if owner is not None:
+            callback = self._wrapper(callback, owner)
+
+        return schedule(callback, timeout)
+
+    def unschedule(self, callback, *args, **kwargs):
+        """Replacement for Clock.unschedule which also works with the
+           original callbacks of wrapped callbacks.
+        """
+        obj = getattr(callback, "__self__", None)
+        if obj is None:
+            try:
+                wrapped = self._functions.get(callback)
+            except TypeError:
+                wrapped = None
+            if wrapped is not None:
+                self._unschedule(wrapped, *args, **kwargs)
+
+        elif not isinstance(obj, ProfiledCallback):
+            try:
+                wrappers = self._wrappers.get(obj, {})
+            except TypeError:
+                wrappers = {}
+            wrapper = wrappers.get(callback.__func__)
+            if wrapper is not None:
+                self._unschedule(wrapper.__call__, *args, **kwargs)
+
+        return self._unschedule(callback, *args, **kwargs)
+
+    def call(self, callback, *args):
+        """Calls a screen's callback, timing it if profiling is turned on.
+           Used by the core services which call screens from the main loop.
+        """
+        owner = callback_screen(callback) if self.enabled else None
+        if owner is None:
+            return callback(*args)
+
+        return self.timed(owner, _callback_name(callback), callback, *args)
+
+    def timed(self, owner, name, callback, *args):
+        start = time.time()
+        try:
+            return callback(*args)
+        finally:
+            self.record(owner, name, time.time() - start)
+
+    def record(self, owner, name, duration):
+        with self._lock:
+            st = self._callbacks.get((owner, name))
+            if st is None:
+                st = {"calls": 0,
+                      "total": 0.0,
+                      "max": 0.0,
+                      "slow": 0,
+                      "samples": deque(maxlen=MAX_SAMPLES)}
+                self._callbacks[(owner, name)] = st
+
+            st["calls"] += 1
+            st["total"] += duration
+            st["max"] = max(st["max"], duration)
+            st["samples"].append(duration)
+            slow = duration > self.threshold
+            if slow:
+                st["slow"] += 1
+
+        if slow:
+            Logger.warning("Profile: {} ({}) blocked the main loop for "
+                           "{:.0f}ms".format(name, owner, duration * 1000))
+
+    def report(self):
+        """Returns the statistics for each callback, grouped by screen."""
+        with self._lock:
+            items = [(k, dict(v, samples=list(v["samples"])))
+                     for k, v in self._callbacks.items()]
+
+        report = {}
+        for (owner, name), st in items:
+            samples = st.pop("samples")
+            st["avg"] = st["total"] / st["calls"] if st["calls"] else 0.0
+            st["p50"] = _percentile(samples, 50)
+            st["p95"] = _percentile(samples, 95)
+            report.setdefault(owner, {})[name] = st
+
+        return {"enabled": self.enabled,
+                "threshold": self.threshold,
+                "screens": report}
+
+    def dump(self):
+        """Writes the report to the profile file."""
+        if not self.enabled:
+            return
+
+        try:
+            folder = os.path.dirname(self.filename)
+            if folder and not os.path.isdir(folder):
+                os.makedirs(folder)
+
+            with open(self.filename, "w") as pfile:
+                json.dump(self.report(), pfile, indent=4, sort_keys=True)
+
+            Logger.info("Profile: Saved to {}".format(self.filename))
+
+        except (IOError, OSError), e:
+            Logger.warning("Profile: Unable to save profile "
+                           "({})".format(repr(e)))
+
+
+# Shared profiler for the app
+clock_profiler = ClockProfiler()
@@ -0,0 +1,170 @@
+'''Command queue for changes requested through the API.
+
+   The API runs in the web server's threads but Kivy widgets must only be
+   changed from the main loop. Requests to reload, enable, disable or show a
+   screen are therefore queued here and carried out on the main loop.
+
+   Requests often come in bursts (e.g. a web page saving a screen's config
+   several times in a row) so a command waits for COALESCE_DELAY seconds
+   before it's run. Any request for the same screen in that time is merged
+   into the waiting command rather than queued separately:
+
+     - a reload merges into any waiting command for the screen (an enable
+       builds the screen with the new config anyway and a disable removes
+       it);
+     - an enable or disable replaces whatever was waiting;
+     - a request to show a screen replaces any other waiting request to
+       show a screen.
+
+   A reload applies the screen's new config in place if the screen knows how
+   (see core/paramsdiff.py) and rebuilds it otherwise.
+
+   Each command has an id which can be used to check whether it's been
+   carried out at [HOST]/api/commands/<id>.
+'''
+import time
+from collections import OrderedDict
+from itertools import count
+from threading import Lock
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+# Seconds to wait for more requests before running a command
+COALESCE_DELAY = 0.5
+
+# Longest (in seconds) a command can be held up by further requests
+MAX_DELAY = 2
+
+# How often (in seconds) to check for commands that are due
+CHECK_INTERVAL = 0.1
+
+# Number of finished commands to remember
+MAX_HISTORY = 100
+
+
+class Command(object):
+    def __init__(self, id, action, screen):
+        self.id = id
+        self.action = action
+        self.screen = screen
+        self.status = "queued"
+        self.error = None
+        self.submitted = time.time()
+        self.due = self.submitted + COALESCE_DELAY
+        self.finished = None
+
+        # Number of requests merged into this command
+        self.merged = 0
+
+    def delay(self):
+        """Puts the command back to wait for more requests."""
+        self.due = min(time.time() + COALESCE_DELAY,
+                       self.submitted + MAX_DELAY)
+
+    def status_dict(self):
+        return {"id": self.id,
+                "action": self.action,
+                "screen": self.screen,
+                "status": self.status,
+                "error": self.error,
+                "merged": self.merged,
+                "submitted": self.submitted,
+                "finished": self.finished}
+
+
+class CommandQueue(object):
+    def __init__(self):
+        self.infoscreen = None
+        self._ids = count(1)
+        self._lock = Lock()
+
+        # Key -> Command for commands waiting to be run
+        self._waiting = OrderedDict()
+
+        # Id -> Command for recent commands
+        self._commands = OrderedDict()
+
+    def attach(self, infoscreen):
+        """Starts running commands on the InfoScreen."""
+        self.infoscreen = infoscreen
+        Clock.schedule_interval(self.run_due, CHECK_INTERVAL)
+
+    def submit(self, action, screen):
+        """Queues an action ("reload", "enable", "disable" or "view") for a
+           screen and returns the Command.
+        """
+        key = ("view",) if action == "view" else ("screen", screen)
+
+        with self._lock:
+            command = self._waiting.get(key)
+
+            if command is not None:
+                command.merged += 1
+                command.delay()
+
+                # A reload is covered by whatever's already waiting
+                if action != "reload":
+                    command.action = action
+                    command.screen = screen
+
+                return command
+
+            command = Command(next(self._ids), action, screen)
+            self._waiting[key] = command
+            self._commands[command.id] = command
+
+            # Forget the oldest commands (as long as they're finished)
+            while len(self._commands) > MAX_HISTORY:
+                oldest = next(iter(self._commands.values()))
+                if oldest.status in ("queued", "running"):
+                    break
+                self._commands.popitem(last=False)
+
+            return command
+
+    def get(self, id):
+        """Returns the command with the id (or None if it's not known)."""
+        with self._lock:
+            return self._commands.get(id)
+
+    def recent(self):
+        with self._lock:
+            return [c.status_dict() for c in self._commands.values()]
+
+    def run_due(self, *args):
+        """Runs the commands that are due (on the main loop)."""
+        if not self._waiting:
+            return
+
+        now = time.time()
+        with self._lock:
+            due = [(k, c) for k, c in self._waiting.items() if c.due <= now]
+            for key, command in due:
+                del self._waiting[key]
+                command.status = "running"
+
+        for key, command in due:
+            self.run(command)
+
+    def run(self, command):
+        actions = {"reload": self.infoscreen.update_screen,
+                   "enable": self.infoscreen.add_screen,
+                   "disable": self.infoscreen.remove_screen,
+                   "view": self.infoscreen.switch_to}
+
+        try:
+            actions[command.action](command.screen)
+            command.status = "done"
+        except Exception, e:
+            command.status = "failed"
+            command.error = repr(e)
+            Logger.error("Commands: Could not {} {} screen "
+                         "({})".format(command.action, command.screen,
+                                       repr(e)))
+        finally:
+            command.finished = time.time()
+
+
+# Shared command queue for the app
+command_queue = CommandQueue()
@@ -0,0 +1,163 @@
+'''In-memory store for the screens' conf.json files.
+
+   The API and web interface change screens' configs (e.g. saving new params
+   or enabling a screen) and the plugin index reads them. Rather than each of
+   them reading and rewriting the files, the configs are kept here:
+
+     - each file is read once and kept in memory until its modification
+       time (or size) changes, so edits made by hand are still picked up;
+     - changes are made in memory straight away and written to disk
+       "delay" seconds later (or "maxdelay" seconds after the first
+       change if more keep coming), so a burst of changes is only written
+       once;
+     - files are written to a temporary file which then replaces the old
+       file, so a crash part way through a write can't leave a broken file.
+
+   The settings are in the "configstore" section of config.json.
+'''
+import json
+import os
+import tempfile
+import time
+from copy import deepcopy
+from threading import RLock, Timer
+
+from kivy.logger import Logger
+
+# Default number of seconds to wait for more changes before writing
+DEFAULT_DELAY = 2
+
+# Default longest time (in seconds) a change can wait to be written
+DEFAULT_MAXDELAY = 10
+
+
+def _stamp(path):
+    """Returns a (mtime, size) tuple for the path or None if it's missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size)
+
+
+class ConfigStore(object):
+    def __init__(self, delay=DEFAULT_DELAY, maxdelay=DEFAULT_MAXDELAY):
+        self.delay = delay
+        self.maxdelay = maxdelay
+        self._lock = RLock()
+
+        # Path -> [stamp, config] for the files we've read
+        self._configs = {}
+
+        # Paths with changes that haven't been written yet and the time of
+        # the first change that's waiting
+        self._dirty = set()
+        self._since = None
+        self._timer = None
+
+    def configure(self, delay=None, maxdelay=None):
+        if delay is not None:
+            self.delay = float(delay)
+        if maxdelay is not None:
+            self.maxdelay = float(maxdelay)
+
+    def _entry(self, path):
+        """Returns the cached entry for the path, reading the file if it's
+           new or has been changed by someone else.
+        """
+        entry = self._configs.get(path)
+        stamp = _stamp(path)
+
+        # Our own changes take priority over the file until they're written
+        if entry is not None and (path in self._dirty or entry[0] == stamp):
+            return entry
+
+        if entry is not None:
+            Logger.info("Config: {} changed on disk. "
+                        "Reloading...".format(path))
+
+        with open(path, "r") as cfg_file:
+            config = json.load(cfg_file)
+
+        entry = self._configs[path] = [stamp, config]
+        return entry
+
+    def get(self, path):
+        """Returns a copy of the config in the file at path."""
+        path = os.path.abspath(path)
+        with self._lock:
+            return deepcopy(self._entry(path)[1])
+
+    def update(self, path, **changes):
+        """Sets the top level keys of the config at path e.g.
+           update(path, enabled=True). The file is written shortly after.
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entry(path)
+            entry[1].update(deepcopy(changes))
+            self._dirty.add(path)
+            self._schedule()
+
+    def _schedule(self):
+        """Starts (or restarts) the timer for writing the changes."""
+        now = time.time()
+        if self._since is None:
+            self._since = now
+
+        if self._timer is not None:
+            self._timer.cancel()
+
+        wait = max(0, min(self.delay, self._since + self.maxdelay - now))
+        self._timer = Timer(wait, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _write(self, path, config):
+        """Writes the config to a temporary file and then moves it over the
+           old file.
+        """
+        folder = os.path.dirname(path)
+        fd, tmppath = tempfile.mkstemp(prefix=".conf.", suffix=".tmp",
+                                       dir=folder)
+        try:
+            with os.fdopen(fd, "w") as tmpfile:
+                json.dump(config, tmpfile, indent=4)
+                tmpfile.flush()
+                os.fsync(tmpfile.fileno())
+
+            # Keep the permissions of the old file
+            if os.path.exists(path):
+                os.chmod(tmppath, os.stat(path).st_mode & 0777)
+
+            os.rename(tmppath, path)
+
+        except:
+            if os.path.exists(tmppath):
+                os.remove(tmppath)
+            raise
+
+    def flush(self):
+        """Writes any changes that are waiting."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._since = None
+
+            for path in sorted(self._dirty):
+                entry = self._configs[path]
+                try:
+                    self._write(path, entry[1])
+                except (IOError, OSError), e:
+                    Logger.error("Config: Could not save {} "
+                                 "({})".format(path, repr(e)))
+                    continue
+
+                # We've written the file so it matches what we've got
+                entry[0] = _stamp(path)
+                self._dirty.discard(path)
+
+
+# Shared config store for the app
+config_store = ConfigStore()
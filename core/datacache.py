@@ -0,0 +1,158 @@
+'''Persistent data cache for the Raspberry Pi Information Screen.
+
+   Screens can save the last data they downloaded so that, after a restart,
+   they can show it straight away (marked as saved data) rather than a
+   "Loading..." message while they wait for the first update.
+
+       data_cache.set("tube", status)
+       status, saved = data_cache.get("tube")
+
+   Saving a value writes to disk so should be done in the fetch service's
+   worker (e.g. at the end of the function that downloads the data) rather
+   than in a callback on the main thread.
+
+   Values must be JSON serialisable. The cache is stored in an SQLite
+   database in the cache folder. Once it's bigger than its size limit, the
+   least recently used entries are removed. The limit can be set in the
+   "datacache" section of config.json.
+
+   Reading an entry doesn't write to the database (which would mean a write
+   to the SD card for every read). The time each entry was last used is
+   kept in memory and saved along with the next change to the cache.
+'''
+import json
+import os
+import sqlite3
+import time
+from threading import Lock
+
+from kivy.logger import Logger
+
+# Location of the cache on disk
+DataCacheFile = os.path.join(".", "cache", "data.sqlite")
+
+# Default size limit (in bytes) for the cached data
+DEFAULT_MAX_SIZE = 2 * 1024 * 1024
+
+
+class DataCache(object):
+    def __init__(self, path=DataCacheFile, maxsize=DEFAULT_MAX_SIZE):
+        self.path = path
+        self.maxsize = maxsize
+        self._db = None
+        self._lock = Lock()
+
+        # Key -> time it was last read, waiting to be saved
+        self._accessed = {}
+
+    def configure(self, maxsize=None):
+        if maxsize is not None:
+            self.maxsize = int(maxsize)
+
+    def _connect(self):
+        """Opens the database (creating it if necessary)."""
+        if self._db is None:
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.isdir(folder):
+                os.makedirs(folder)
+
+            # The cache is used by the main thread and worker threads but all
+            # access is protected by our lock.
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("CREATE TABLE IF NOT EXISTS cache ("
+                       "key TEXT PRIMARY KEY, "
+                       "value TEXT, "
+                       "size INTEGER, "
+                       "saved REAL, "
+                       "accessed REAL)")
+            db.commit()
+            self._db = db
+
+        return self._db
+
+    def get(self, key):
+        """Returns a tuple of the saved value and the time it was saved or
+           (None, None) if there's nothing in the cache.
+        """
+        try:
+            with self._lock:
+                db = self._connect()
+                row = db.execute("SELECT value, saved FROM cache WHERE key=?",
+                                 (key,)).fetchone()
+                if row is None:
+                    return None, None
+
+                # Saved with the next change to the cache
+                self._accessed[key] = time.time()
+
+            return json.loads(row[0]), row[1]
+
+        except (sqlite3.Error, OSError, ValueError), e:
+            Logger.warning("DataCache: Unable to read {} "
+                           "({})".format(key, repr(e)))
+            return None, None
+
+    def set(self, key, value):
+        """Saves the value in the cache."""
+        try:
+            data = json.dumps(value)
+            now = time.time()
+
+            with self._lock:
+                db = self._connect()
+                db.execute("INSERT OR REPLACE INTO cache "
+                           "(key, value, size, saved, accessed) "
+                           "VALUES (?, ?, ?, ?, ?)",
+                           (key, data, len(data), now, now))
+                self._accessed.pop(key, None)
+                self._save_accessed(db)
+                self._evict(db)
+                db.commit()
+
+        except (sqlite3.Error, OSError, TypeError, ValueError), e:
+            Logger.warning("DataCache: Unable to save {} "
+                           "({})".format(key, repr(e)))
+
+    def _save_accessed(self, db):
+        """Writes the times entries were last read (as part of the current
+           transaction).
+        """
+        if self._accessed:
+            db.executemany("UPDATE cache SET accessed=? WHERE key=?",
+                           [(t, k) for k, t in self._accessed.items()])
+            self._accessed.clear()
+
+    def _evict(self, db):
+        """Removes the least recently used entries until we're under the size
+           limit.
+        """
+        total = db.execute("SELECT COALESCE(SUM(size), 0) "
+                           "FROM cache").fetchone()[0]
+
+        if total <= self.maxsize:
+            return
+
+        rows = db.execute("SELECT key, size FROM cache "
+                          "ORDER BY accessed ASC").fetchall()
+
+        for key, size in rows:
+            if total <= self.maxsize:
+                break
+            db.execute("DELETE FROM cache WHERE key=?", (key,))
+            total -= size
+
+    def delete(self, key):
+        try:
+            with self._lock:
+                db = self._connect()
+                db.execute("DELETE FROM cache WHERE key=?", (key,))
+                self._accessed.pop(key, None)
+                self._save_accessed(db)
+                db.commit()
+        except (sqlite3.Error, OSError), e:
+            Logger.warning("DataCache: Unable to delete {} "
+                           "({})".format(key, repr(e)))
+
+
+# Shared cache used by all screens
+data_cache = DataCache()
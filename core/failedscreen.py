@@ -41,3 +41,11 @@ class FailedScreen(Screen):
 
         # Display it.
         self.add_widget(lbl)
+
+    def add_failure(self, name, error):
+        """Adds a screen that failed after start up (e.g. a lazy screen)."""
+        self.failed.append((name, error))
+
+        # Rebuild the screen
+        self.clear_widgets()
+        self.buildLabel()
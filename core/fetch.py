@@ -0,0 +1,325 @@
+'''Background data fetching for the Raspberry Pi Information Screen.
+
+   Screens shouldn't make network requests on the Kivy main loop as a slow
+   server will freeze the display. Instead, they can submit a job to the
+   shared fetch service:
+
+       fetch_service.submit(requests.get, args=(url,),
+                            callback=self.show_data,
+                            errback=self.show_error,
+                            owner=self)
+
+   The function is run by one of a fixed number of worker threads. Its
+   result (or the exception it raised) is then passed back to the callback
+   (or errback) on the main loop via the Kivy Clock so it's safe to update
+   widgets.
+
+   Jobs belonging to a screen are cancelled when the screen is removed. A
+   cancelled job's callbacks are never called.
+
+   If the same function is submitted with the same arguments while an
+   earlier job is still waiting or running, no new job is created. Instead,
+   the result of the earlier job is passed to both sets of callbacks. This
+   means that screens asking for the same data at the same time only cause
+   one request.
+'''
+import time
+from functools import partial
+from threading import Thread, Lock
+from Queue import Queue
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+from core.clockprofile import callback_screen, clock_profiler, owner_screen
+from core.histogram import Histogram
+from core.tracing import tracer
+
+# Default number of worker threads
+DEFAULT_WORKERS = 4
+
+
+def _job_key(func, args, kwargs):
+    """Returns a key to identify identical jobs (or None if the arguments
+       can't be used as a key).
+    """
+    try:
+        key = (func, tuple(args), tuple(sorted(kwargs.items())))
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _job_name(func):
+    name = getattr(func, "__name__", "job")
+    obj = getattr(func, "__self__", None)
+    if obj is not None:
+        name = "{}.{}".format(obj.__class__.__name__, name)
+    return name
+
+
+class FetchJob(object):
+    """A single piece of work submitted to the fetch service."""
+    def __init__(self, func, args, kwargs, key, owner=None):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+
+        # Label the job with the screen that asked for it. The function may
+        # be a class (e.g. FootballMatch), which has no code to look at.
+        self.screen = (owner_screen(owner) or callback_screen(func) or
+                       "core")
+        self.subscribers = []
+        self.done = False
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def cancelled(self):
+        """True if nobody is waiting for the result any more."""
+        return all(s.cancelled for s in self.subscribers)
+
+
+class FetchRequest(object):
+    """A screen's request for the result of a job.
+
+       This is what's returned by FetchService.submit.
+    """
+    def __init__(self, job, callback, errback, owner):
+        self.job = job
+        self.callback = callback
+        self.errback = errback
+        self.owner = owner
+        self.cancelled = False
+
+    def cancel(self):
+        """Stops the request's callbacks from being called."""
+        self.cancelled = True
+
+    @property
+    def pending(self):
+        """True if the job hasn't finished (and hasn't been cancelled)."""
+        return not (self.job.done or self.cancelled)
+
+
+def _is_owned_by(owner, widget):
+    """Returns True if "owner" is "widget" or one of its children.
+
+       Screens that aren't currently displayed have no parent so we follow the
+       screen manager instead.
+    """
+    while owner is not None:
+        if owner is widget:
+            return True
+        owner = (getattr(owner, "parent", None) or
+                 getattr(owner, "manager", None))
+    return False
+
+
+class FetchService(object):
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = workers
+        self._queue = Queue()
+        self._threads = []
+        self._lock = Lock()
+
+        # Jobs that have been submitted but not delivered yet
+        self._jobs = set()
+
+        # Jobs that can be shared with identical requests
+        self._keyed = {}
+
+        # Counters for metrics
+        self._stats = {"submitted": 0,
+                       "completed": 0,
+                       "failed": 0,
+                       "cancelled": 0,
+                       "coalesced": 0,
+                       "wait_total": 0.0,
+                       "wait_max": 0.0,
+                       "run_total": 0.0,
+                       "run_max": 0.0}
+
+        # Screen name -> {"latency": Histogram, "errors": count}
+        self._screens = {}
+
+    def set_workers(self, workers):
+        """Sets the number of worker threads. Must be called before the
+           first job is submitted.
+        """
+        self.workers = max(1, int(workers))
+
+    def _start(self):
+        while len(self._threads) < self.workers:
+            t = Thread(target=self._worker,
+                       name="FetchWorker-{}".format(len(self._threads)))
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, func, args=(), kwargs=None, callback=None, errback=None,
+               owner=None, coalesce=True):
+        """Runs func(*args, **kwargs) in a worker thread.
+
+           The result is passed to callback (or the exception to errback) on
+           the main thread. Returns a FetchRequest which can be cancelled.
+
+           Set coalesce to False if identical calls must each be run.
+        """
+        kwargs = kwargs or {}
+        key = _job_key(func, args, kwargs) if coalesce else None
+
+        with self._lock:
+            self._start()
+            self._stats["submitted"] += 1
+
+            # Is there already an identical job that we can share?
+            job = self._keyed.get(key) if key is not None else None
+            if job is not None and not job.done and job.finished is None:
+                self._stats["coalesced"] += 1
+                request = FetchRequest(job, callback, errback, owner)
+                job.subscribers.append(request)
+                return request
+
+            job = FetchJob(func, args, kwargs, key, owner)
+            request = FetchRequest(job, callback, errback, owner)
+            job.subscribers.append(request)
+            self._jobs.add(job)
+            if key is not None:
+                self._keyed[key] = job
+
+        self._queue.put(job)
+
+        return request
+
+    def cancel(self, owner):
+        """Cancels all jobs belonging to the owner (usually a screen) or any
+           of its children.
+        """
+        with self._lock:
+            requests = [r for j in self._jobs for r in j.subscribers
+                        if _is_owned_by(r.owner, owner)]
+
+        for request in requests:
+            request.cancel()
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+
+            with self._lock:
+                cancelled = job.cancelled
+                if not cancelled:
+                    job.started = time.time()
+
+            if cancelled:
+                self._finish(job)
+                continue
+
+            try:
+                with tracer.span(_job_name(job.func), cat="fetch",
+                                 subscribers=len(job.subscribers)):
+                    result = job.func(*job.args, **job.kwargs)
+                error = None
+            except Exception, e:
+                result = None
+                error = e
+
+            # Once the job has finished, identical requests need a new job.
+            with self._lock:
+                job.finished = time.time()
+                if self._keyed.get(job.key) is job:
+                    del self._keyed[job.key]
+
+            Clock.schedule_once(partial(self._deliver, job, result, error), 0)
+
+    def _finish(self, job, error=None):
+        job.done = True
+
+        with self._lock:
+            self._jobs.discard(job)
+            if self._keyed.get(job.key) is job:
+                del self._keyed[job.key]
+            st = self._stats
+
+            if job.cancelled:
+                st["cancelled"] += 1
+                return
+
+            st["failed" if error else "completed"] += 1
+
+            screen = self._screens.setdefault(job.screen,
+                                              {"latency": Histogram(),
+                                               "errors": 0})
+            if error:
+                screen["errors"] += 1
+
+            if job.started is not None:
+                screen["latency"].observe(job.finished - job.submitted)
+                wait = job.started - job.submitted
+                run = job.finished - job.started
+                st["wait_total"] += wait
+                st["wait_max"] = max(st["wait_max"], wait)
+                st["run_total"] += run
+                st["run_max"] = max(st["run_max"], run)
+
+    def _deliver(self, job, result, error, *args):
+        """Passes the result back to the screen (on the main thread)."""
+        self._finish(job, error)
+
+        with tracer.span(_job_name(job.func), cat="deliver"):
+            self._notify(job, result, error)
+
+    def _notify(self, job, result, error):
+        for request in job.subscribers:
+            if request.cancelled:
+                continue
+
+            if error is not None:
+                if request.errback:
+                    clock_profiler.call(request.errback, error)
+                else:
+                    name = _job_name(job.func)
+                    Logger.warning("Fetch: Error in {}: "
+                                   "{}".format(name, repr(error)))
+
+            elif request.callback:
+                clock_profiler.call(request.callback, result)
+
+    def screen_stats(self):
+        """Returns the latency histogram (see Histogram.snapshot) and error
+           count for each screen's jobs.
+        """
+        with self._lock:
+            screens = dict(self._screens)
+
+        return dict((name, (st["latency"].snapshot(), st["errors"]))
+                    for name, st in screens.items())
+
+    def stats(self):
+        """Returns a dictionary of metrics for the service."""
+        with self._lock:
+            st = dict(self._stats)
+            pending = len(self._jobs)
+
+        finished = st["completed"] + st["failed"]
+
+        return {"workers": self.workers,
+                "queue_depth": self._queue.qsize(),
+                "pending": pending,
+                "submitted": st["submitted"],
+                "completed": st["completed"],
+                "failed": st["failed"],
+                "cancelled": st["cancelled"],
+                "coalesced": st["coalesced"],
+                "wait_avg": st["wait_total"] / finished if finished else 0.0,
+                "wait_max": st["wait_max"],
+                "run_avg": st["run_total"] / finished if finished else 0.0,
+                "run_max": st["run_max"]}
+
+
+# Shared service used by all screens
+fetch_service = FetchService()
@@ -0,0 +1,141 @@
+'''Recorded web responses for testing the screens without a network.
+
+   A FixtureSession can be given to http_client in place of its requests
+   Session:
+
+       http_client.use_session(FixtureSession("benchmarks/fixtures"))
+
+   In replay mode, each request is answered from the fixture folder and a
+   request with no recorded response fails with a ConnectionError (as if the
+   server couldn't be reached). In record mode, requests are sent to the real
+   server and the responses saved to the folder for later.
+
+   Each response is saved as a JSON file named after a hash of the method,
+   URL and request body.
+'''
+import base64
+import hashlib
+import json
+import os
+from threading import Lock
+
+try:
+    import requests
+    from requests.structures import CaseInsensitiveDict
+except ImportError:
+    # Only needed if the fixtures are actually used
+    requests = None
+
+from kivy.logger import Logger
+
+# Default location of the fixtures
+FixtureFolder = os.path.join(".", "benchmarks", "fixtures")
+
+# Headers which could get us a "304 Not Modified" rather than a response
+CONDITIONAL_HEADERS = ("If-None-Match", "If-Modified-Since")
+
+
+def fixture_key(method, url, data=None):
+    """Returns the name of the fixture file for a request. "data" is the
+       body of the request as it's sent.
+    """
+    h = hashlib.sha1()
+    h.update(method.upper())
+    h.update("\0" + url)
+    if data:
+        if isinstance(data, unicode):
+            data = data.encode("utf-8")
+        h.update("\0" + data)
+    return h.hexdigest() + ".json"
+
+
+def response_to_dict(method, url, response):
+    return {"method": method.upper(),
+            "url": url,
+            "status": response.status_code,
+            "headers": dict(response.headers),
+            "encoding": response.encoding,
+            "body": base64.b64encode(response.content)}
+
+
+def dict_to_response(fixture):
+    r = requests.Response()
+    r.status_code = fixture["status"]
+    r.headers = CaseInsensitiveDict(fixture.get("headers", {}))
+    r.encoding = fixture.get("encoding")
+    r.url = fixture["url"]
+    r._content = base64.b64decode(fixture["body"])
+    return r
+
+
+class FixtureSession(object):
+    """Stands in for a requests Session, replaying (or recording)
+       responses.
+    """
+    def __init__(self, folder=FixtureFolder, record=False):
+        self.folder = folder
+        self.record = record
+        self.session = requests.Session() if record else None
+        self.missing = set()
+        self.used = set()
+        self._lock = Lock()
+
+    def _path(self, method, url, data):
+        return os.path.join(self.folder, fixture_key(method, url, data))
+
+    def request(self, method, url, **kwargs):
+        # Build the request so that the fixture is keyed on exactly what
+        # would be sent (including any parameters in the URL)
+        headers = dict(kwargs.pop("headers", None) or {})
+        req = requests.Request(method, url,
+                               headers=headers,
+                               params=kwargs.pop("params", None),
+                               data=kwargs.pop("data", None),
+                               json=kwargs.pop("json", None)).prepare()
+        url = req.url
+        path = self._path(method, url, req.body)
+
+        if self.record:
+            # Make sure we get (and save) the whole response rather than a
+            # "304 Not Modified"
+            for header in CONDITIONAL_HEADERS:
+                req.headers.pop(header, None)
+
+            r = self.session.send(req, **kwargs)
+            self.save(path, response_to_dict(method, url, r))
+            return r
+
+        fixture = self.lookup(path)
+        if fixture is None:
+            with self._lock:
+                self.missing.add((method.upper(), url))
+            raise requests.ConnectionError("No fixture for {} "
+                                           "{}".format(method, url))
+
+        with self._lock:
+            self.used.add((method.upper(), url))
+
+        return dict_to_response(fixture)
+
+    def lookup(self, path):
+        """Returns the saved fixture (or None if there isn't one)."""
+        try:
+            with open(path, "r") as ffile:
+                return json.load(ffile)
+        except (IOError, ValueError):
+            return None
+
+    def save(self, path, fixture):
+        if not os.path.isdir(self.folder):
+            os.makedirs(self.folder)
+
+        tmpfile = path + ".tmp"
+        with open(tmpfile, "w") as ffile:
+            json.dump(fixture, ffile, indent=2, sort_keys=True)
+        os.rename(tmpfile, path)
+
+        Logger.info("Fixtures: Recorded {method} {url}".format(**fixture))
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
@@ -1,64 +1,211 @@
 import imp
 import os
-import json
+from copy import deepcopy
+from threading import RLock
+
+from core.configstore import config_store
 
 # Constants that are used to find plugins
 PluginFolder = "./screens"
 PluginScript = "screen.py"
+PluginWeb = "web.py"
 ScreenConf = "conf.json"
 
 
-def getPlugins(inactive=False):
-    plugins = []
-    a = 1
+def _stamp(path):
+    """Returns a (mtime, size) tuple for the path or None if it's missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size)
 
-    # Get the contents of the plugin folder
-    possibleplugins = os.listdir(PluginFolder)
 
-    # Loop over it
-    for i in possibleplugins:
-        location = os.path.join(PluginFolder, i)
+def _copy(manifest):
+    """Returns a copy of the manifest that callers can change freely.
 
-        # Ignore anything that doesn't meet our criteria
-        if (not os.path.isdir(location) or PluginScript not in
-                                           os.listdir(location)):
-            continue
+       Screens are given their params and may change them (e.g. the tube
+       screen converts its colours) so they mustn't share the cached ones.
+    """
+    plugin = dict(manifest)
+    plugin["params"] = deepcopy(manifest["params"])
+    plugin["cache"] = deepcopy(manifest["cache"])
+    return plugin
 
-        # Load the module info into a variavls
-        inf = imp.find_module("screen", [location])
+
+class PluginIndex(object):
+    """In-memory index of the plugins installed in the screens folder.
+
+       Each plugin's manifest (parsed conf.json, KV text and module details)
+       is built once and kept until the modification time of the plugin folder
+       or one of its files changes, or until the plugin is invalidated
+       explicitly. A single instance is shared by the Kivy app, the API and
+       the web frontend so looking up one screen doesn't mean rescanning all
+       of them.
+    """
+    def __init__(self, folder=PluginFolder):
+        self.folder = folder
+        self._lock = RLock()
+
+        # Plugin name -> (stamp, manifest). Manifest is None for folders
+        # that aren't valid plugins so that we don't keep checking them.
+        self._entries = {}
+
+        # Sorted list of folder names and the stamp of the folder it came from
+        self._names = []
+        self._folder_stamp = None
+
+    def _scan(self):
+        """Refreshes the list of plugin folders if the screens folder has
+           changed.
+        """
+        stamp = _stamp(self.folder)
+        if stamp != self._folder_stamp or not self._names:
+            self._folder_stamp = stamp
+            self._names = sorted(os.listdir(self.folder))
+
+            # Drop any plugins that have been removed
+            for name in list(self._entries):
+                if name not in self._names:
+                    del self._entries[name]
+
+    def _plugin_stamp(self, location):
+        """Builds the key used to check whether a plugin needs reloading."""
+        stamps = [_stamp(location)]
+        stamps += [_stamp(os.path.join(location, f))
+                   for f in (PluginScript, ScreenConf, PluginWeb)]
+        return tuple(stamps)
+
+    def _build(self, name, location):
+        """Parses the plugin folder and returns the manifest (or None)."""
+        if not os.path.isfile(os.path.join(location, PluginScript)):
+            return None
 
         # Plugin needs a conf file.
-        if ScreenConf in os.listdir(location):
-            conf = json.load(open(os.path.join(location, ScreenConf)))
-
-            # See if the user has disabled the plugin.
-            if conf.get("enabled", False) or inactive:
-
-                # Get the KV file text
-                kvpath = os.path.join(location, conf["kv"])
-                kv = open(kvpath).readlines()
-
-                # See if there's a web config file
-                webfile = os.path.join(location, "web.py")
-                if os.path.isfile(webfile):
-                    web = imp.find_module("web", [location])
-                else:
-                    web = None
-
-                # Custom dict for the plugin
-                plugin = {"name": i,
-                          "info": inf,
-                          "id": a,
-                          "screen": conf["screen"],
-                          "dependencies": conf.get("dependencies", list()),
-                          "kv": kv,
-                          "kvpath": kvpath,
-                          "params": conf.get("params", None),
-                          "enabled": conf.get("enabled", False),
-                          "web": web}
-
-                plugins.append(plugin)
-                a = a + 1
-
-    # We're done so return the list of available/enabled plugins
-    return plugins
+        conffile = os.path.join(location, ScreenConf)
+        if not os.path.isfile(conffile):
+            return None
+
+        conf = config_store.get(conffile)
+
+        # Load the module info. We don't keep the open file handle as that
+        # can only be used once. See loadPluginModule.
+        inf = imp.find_module("screen", [location])
+        if inf[0]:
+            inf[0].close()
+
+        # Get the KV file text
+        kvpath = os.path.join(location, conf["kv"])
+        with open(kvpath) as kvfile:
+            kv = kvfile.readlines()
+
+        # See if there's a web config file
+        webfile = os.path.join(location, PluginWeb)
+        if os.path.isfile(webfile):
+            web = imp.find_module("web", [location])
+            if web[0]:
+                web[0].close()
+            web = (None,) + web[1:]
+        else:
+            web = None
+
+        # Custom dict for the plugin
+        return {"name": name,
+                "info": (None,) + inf[1:],
+                "screen": conf["screen"],
+                "dependencies": conf.get("dependencies", list()),
+                "kv": kv,
+                "kvpath": kvpath,
+                "kvstamp": _stamp(kvpath),
+                "params": conf.get("params", None),
+                "cache": conf.get("cache", dict()),
+                "enabled": conf.get("enabled", False),
+                "web": web}
+
+    def _get(self, name):
+        """Returns the (possibly cached) manifest for the named plugin."""
+        location = os.path.join(self.folder, name)
+        stamp = self._plugin_stamp(location)
+
+        cached = self._entries.get(name)
+        if cached is not None and cached[0] == stamp:
+            manifest = cached[1]
+
+            # The KV file isn't part of the stamp so check it separately.
+            if (manifest is None or
+                    manifest["kvstamp"] == _stamp(manifest["kvpath"])):
+                return manifest
+
+        if stamp[0] is None:
+            self._entries.pop(name, None)
+            return None
+
+        manifest = self._build(name, location)
+        self._entries[name] = (stamp, manifest)
+        return manifest
+
+    def invalidate(self, name=None):
+        """Forces the named plugin (or all plugins if no name is given) to be
+           reloaded the next time it's requested.
+        """
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+                self._folder_stamp = None
+            else:
+                self._entries.pop(name, None)
+
+    def get(self, name, inactive=False):
+        """Returns a copy of the manifest for a single plugin or None if the
+           plugin doesn't exist (or is disabled and "inactive" is False).
+        """
+        with self._lock:
+            manifest = self._get(name)
+
+        if manifest is None or not (manifest["enabled"] or inactive):
+            return None
+
+        return _copy(manifest)
+
+    def plugins(self, inactive=False):
+        """Returns a list of all enabled (or, if "inactive" is True, all
+           installed) plugins.
+        """
+        plugins = []
+
+        with self._lock:
+            self._scan()
+
+            for name in self._names:
+                manifest = self._get(name)
+
+                # See if the user has disabled the plugin.
+                if manifest and (manifest["enabled"] or inactive):
+                    plugin = _copy(manifest)
+                    plugin["id"] = len(plugins) + 1
+                    plugins.append(plugin)
+
+        return plugins
+
+
+# Shared index used by all parts of the app
+plugin_index = PluginIndex()
+
+
+def getPlugins(inactive=False):
+    """Returns the list of available/enabled plugins."""
+    return plugin_index.plugins(inactive)
+
+
+def getPlugin(name, inactive=False):
+    """Returns the details of a single plugin (or None if not found)."""
+    return plugin_index.get(name, inactive)
+
+
+def loadPluginModule(plugin, module="screen"):
+    """Imports the plugin's "screen" (or "web") module."""
+    info = plugin["info"] if module == "screen" else plugin["web"]
+    _, pathname, description = info
+
+    with open(pathname, description[1]) as modfile:
+        return imp.load_module(module, modfile, pathname, description)
@@ -0,0 +1,33 @@
+'''Histograms for the Raspberry Pi Information Screen's metrics.
+
+   Counts observations (e.g. durations in seconds) into fixed buckets in the
+   way Prometheus expects: each bucket counts the observations less than or
+   equal to its upper bound.
+'''
+from threading import Lock
+
+# Default bucket upper bounds for network timings (in seconds)
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram(object):
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.total = 0.0
+        self.count = 0
+        self._lock = Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.total += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+
+    def snapshot(self):
+        """Returns a tuple of ([(bound, cumulative count), ...], sum, count).
+        """
+        with self._lock:
+            return (zip(self.buckets, self.counts), self.total, self.count)
@@ -0,0 +1,378 @@
+'''Shared HTTP client for the Raspberry Pi Information Screen.
+
+   All screens should make their web requests through http_client rather
+   than calling requests.get/post directly. The client keeps a single
+   requests Session so connections to each server are pooled and kept alive
+   between polls, and applies a default timeout so a slow server can't hang a
+   request forever.
+
+   The pool size and timeout can be set in the "http" section of config.json.
+
+   GET responses are cached. While a response is fresh (according to its
+   Cache-Control/Expires headers, the "ttl" passed by the screen or an
+   override in the screen's conf.json) it is returned without contacting the
+   server. Once it's stale, the request is sent with If-None-Match and
+   If-Modified-Since headers so that the server can reply with a short "304
+   Not Modified" instead of the whole page. Hit and miss counts are kept for
+   each source.
+
+   Screens can name the source of a request so that its TTL can be
+   overridden in the "cache" section of the screen's conf.json e.g.
+
+       "cache": {"tube": 600}
+
+   If no source is given, the server's host name is used.
+
+   Responses are kept for each URL and set of request headers, so requests
+   for the same URL with different headers (e.g. an Accept type or an
+   Authorization token) don't share a response.
+
+   If a GET for a URL is made while another thread is already fetching the
+   same URL (with the same headers), it waits for that request and shares its response rather than
+   sending a second one (e.g. several football screens polling the same
+   scores page).
+
+   Requests to a host that keeps failing are stopped for a while by a
+   circuit breaker (see core.breaker) so that an outage doesn't cost a full
+   timeout on every poll.
+'''
+import re
+import time
+from collections import OrderedDict
+from email.utils import parsedate_tz, mktime_tz
+from threading import Event, Lock
+from urlparse import urlparse
+
+try:
+    import requests
+    from requests import RequestException
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    # Screens that need requests list it as a dependency so we only fail if
+    # someone actually tries to make a request.
+    requests = None
+
+    # Nothing can raise requests' errors without it
+    class RequestException(Exception):
+        pass
+
+from core.breaker import BreakerRegistry, CircuitOpenError
+from core.tracing import tracer
+
+# Default number of connections to keep open to each server
+DEFAULT_POOL_SIZE = 4
+
+# Default number of servers to keep connection pools for
+DEFAULT_HOSTS = 10
+
+# Default timeout (in seconds) for requests
+DEFAULT_TIMEOUT = 10
+
+# Maximum number of responses to keep in the cache
+MAX_CACHE_ENTRIES = 100
+
+RE_MAX_AGE = re.compile(r"max-age\s*=\s*(\d+)")
+
+
+def _cache_key(url, headers):
+    """Returns the key for the response to a GET request."""
+    if not headers:
+        return url
+
+    # Header names aren't case sensitive
+    lines = sorted("{}: {}".format(name.lower(), value)
+                   for name, value in headers.items())
+    return "\n".join([url] + lines)
+
+
+def _http_date(value):
+    """Converts an HTTP date header to a timestamp (or None)."""
+    parsed = parsedate_tz(value) if value else None
+    return mktime_tz(parsed) if parsed else None
+
+
+class CacheEntry(object):
+    def __init__(self, response, expires):
+        self.response = response
+        self.expires = expires
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+
+    @property
+    def fresh(self):
+        return time.time() < self.expires
+
+    @property
+    def validators(self):
+        """Headers to make a conditional request for this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class InFlight(object):
+    """A GET request which other threads can wait for."""
+    def __init__(self):
+        self.event = Event()
+        self.response = None
+        self.error = None
+
+
+class ResponseCache(object):
+    """Cache of GET responses keyed on URL and request headers."""
+    def __init__(self, maxentries=MAX_CACHE_ENTRIES):
+        self.maxentries = maxentries
+        self._entries = OrderedDict()
+        self._ttls = {}
+        self._stats = {}
+        self._lock = Lock()
+
+    def set_ttl(self, source, ttl):
+        """Overrides the freshness lifetime (in seconds) for a source."""
+        with self._lock:
+            if ttl is None:
+                self._ttls.pop(source, None)
+            else:
+                self._ttls[source] = ttl
+
+    def lifetime(self, source, response, ttl=None):
+        """Works out how long (in seconds) a response stays fresh."""
+        with self._lock:
+            override = self._ttls.get(source)
+
+        if override is not None:
+            return override
+
+        cc = response.headers.get("Cache-Control", "").lower()
+        if "no-store" in cc or "no-cache" in cc:
+            return 0
+
+        max_age = RE_MAX_AGE.search(cc)
+        if max_age:
+            return int(max_age.group(1))
+
+        expires = _http_date(response.headers.get("Expires"))
+        if expires is not None:
+            date = _http_date(response.headers.get("Date")) or time.time()
+            return max(0, expires - date)
+
+        return ttl or 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                # Move to the end so it's the last to be thrown out
+                del self._entries[key]
+                self._entries[key] = entry
+            return entry
+
+    def store(self, key, response, lifetime):
+        entry = CacheEntry(response, time.time() + lifetime)
+
+        # There's no point keeping responses that we can't use again.
+        if lifetime <= 0 and not entry.validators:
+            return
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.maxentries:
+                self._entries.popitem(last=False)
+
+    def record(self, source, result):
+        """Counts a "hit", "miss", "revalidated" or "coalesced" response for
+           a source.
+        """
+        with self._lock:
+            st = self._stats.setdefault(source, {"hit": 0,
+                                                 "miss": 0,
+                                                 "revalidated": 0,
+                                                 "coalesced": 0})
+            st[result] += 1
+
+    def stats(self):
+        """Returns the hit/miss counts and hit ratio for each source."""
+        with self._lock:
+            stats = dict((k, dict(v)) for k, v in self._stats.items())
+
+        for st in stats.values():
+            hits = st["hit"] + st["revalidated"] + st["coalesced"]
+            total = hits + st["miss"]
+            st["ratio"] = float(hits) / total if total else 0.0
+
+        return stats
+
+
+class HTTPClient(object):
+    def __init__(self, poolsize=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        self.poolsize = poolsize
+        self.timeout = timeout
+        self._session = None
+        self._lock = Lock()
+        self.cache = ResponseCache()
+        self.breakers = BreakerRegistry()
+
+        # Cache key -> InFlight for GET requests currently being made
+        self._inflight = {}
+
+    def configure(self, poolsize=None, timeout=None, failures=None,
+                  backoff=None, maxbackoff=None):
+        """Changes the pool size, default timeout and/or circuit breaker
+           settings.
+        """
+        self.breakers.configure(failures=failures,
+                                backoff=backoff,
+                                maxbackoff=maxbackoff)
+
+        with self._lock:
+            if poolsize is not None:
+                self.poolsize = max(1, int(poolsize))
+            if timeout is not None:
+                self.timeout = timeout
+
+            # Build a new session next time we need one
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def use_session(self, session):
+        """Makes requests through the given object (which must have a
+           requests Session's "request" and "close" methods) e.g. a
+           core.fixtures.FixtureSession.
+        """
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = session
+
+    @property
+    def session(self):
+        """The requests Session used for all requests."""
+        with self._lock:
+            if self._session is None:
+                if requests is None:
+                    raise ImportError("The requests module is not installed.")
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=DEFAULT_HOSTS,
+                                      pool_maxsize=self.poolsize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+
+            return self._session
+
+    def request(self, method, url, **kwargs):
+        """Makes a request (accepts the same arguments as requests.request).
+
+           Raises CircuitOpenError if the host's circuit breaker is open.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+
+        breaker = self.breakers.get(urlparse(url).netloc)
+        if not breaker.allow():
+            raise CircuitOpenError("{} is unavailable, not retrying "
+                                   "yet".format(breaker.host))
+
+        try:
+            with tracer.span("HTTP " + method, cat="network",
+                             url=url) as span:
+                r = self.session.request(method, url, **kwargs)
+                span.tags["status"] = r.status_code
+        except RequestException, e:
+            breaker.failure(e)
+            raise
+        except Exception:
+            # Not the server's fault so just allow another probe
+            breaker.release()
+            raise
+
+        if r.status_code >= 500:
+            breaker.failure("HTTP {}".format(r.status_code))
+        else:
+            breaker.success()
+
+        return r
+
+    def get(self, url, source=None, ttl=None, **kwargs):
+        """Makes a GET request, using the cache where possible.
+
+           "source" is the name used for TTL overrides and cache statistics.
+           "ttl" is how long (in seconds) to keep the response if the server
+           doesn't say.
+        """
+        # Requests with parameters are cached under the full URL
+        if kwargs.get("params"):
+            req = requests.Request("GET", url, params=kwargs.pop("params"))
+            url = req.prepare().url
+
+        if source is None:
+            source = urlparse(url).netloc
+
+        key = _cache_key(url, kwargs.get("headers"))
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = InFlight()
+
+        # Someone else is already fetching this URL so wait for their answer
+        if not leader:
+            flight.event.wait()
+            self.cache.record(source, "coalesced")
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+
+        try:
+            flight.response = self._get(url, key, source, ttl, **kwargs)
+            return flight.response
+        except Exception, e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.event.set()
+
+    def _get(self, url, key, source, ttl, **kwargs):
+        entry = self.cache.get(key)
+
+        # Fresh data so no need to go to the server at all
+        if entry is not None and entry.fresh:
+            self.cache.record(source, "hit")
+            return entry.response
+
+        # Stale data so ask the server if it's changed
+        if entry is not None:
+            headers = dict(kwargs.get("headers") or {})
+            headers.update(entry.validators)
+            kwargs["headers"] = headers
+
+        r = self.request("GET", url, **kwargs)
+
+        if r.status_code == 304 and entry is not None:
+            self.cache.record(source, "revalidated")
+            lifetime = self.cache.lifetime(source, r, ttl)
+            self.cache.store(key, entry.response, lifetime)
+            return entry.response
+
+        self.cache.record(source, "miss")
+
+        if r.status_code == 200:
+            lifetime = self.cache.lifetime(source, r, ttl)
+            self.cache.store(key, r, lifetime)
+
+        return r
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+# Shared client used by all screens
+http_client = HTTPClient()
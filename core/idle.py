@@ -0,0 +1,185 @@
+'''Idle mode for the Raspberry Pi Information Screen.
+
+   Kivy runs its main loop at the full frame rate even when nothing on the
+   display is changing. Most screens (e.g. the clock) change once a second
+   or less, so that just keeps the Pi busy.
+
+   When nothing has happened for a while, the idle manager lowers the
+   maximum frame rate. It goes back to the full frame rate straight away
+   when the screen is touched, when the screen changes and while any
+   animation is running.
+
+   Screens that move things with the Clock rather than an Animation (e.g. a
+   game) can set their "keep_awake" attribute to True while they need the
+   full frame rate.
+
+   The CPU time used and the frames drawn are recorded for each screen so the
+   cost of each screen can be seen at [HOST]/api/idle.
+
+   The settings are in the "idle" section of config.json.
+'''
+import os
+import time
+from threading import Lock
+
+from kivy.animation import Animation
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+from core.histogram import Histogram
+
+# Frame rate to use when nothing is happening
+DEFAULT_IDLE_FPS = 10
+
+# Seconds without any activity before we go idle
+DEFAULT_TIMEOUT = 3
+
+# How often (in seconds) to check whether we can go idle
+CHECK_INTERVAL = 0.5
+
+# Buckets for the frame time histogram (in seconds)
+FRAME_BUCKETS = (0.008, 0.017, 0.033, 0.05, 0.1, 0.2, 0.5, 1)
+
+
+def _cpu_time():
+    """Returns user + system CPU time used by the process."""
+    t = os.times()
+    return t[0] + t[1]
+
+
+class IdleManager(object):
+    def __init__(self):
+        self.enabled = True
+        self.idle_fps = DEFAULT_IDLE_FPS
+        self.timeout = DEFAULT_TIMEOUT
+        self.active_fps = None
+        self.idle = False
+        self.scrmgr = None
+        self._awake_until = 0
+        self._lock = Lock()
+
+        # Screen name -> usage counters
+        self.screens = {}
+        self.frame_times = Histogram(FRAME_BUCKETS)
+        self._current = None
+        self._mark = None
+
+    def configure(self, enabled=None, fps=None, timeout=None):
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if fps is not None:
+            self.idle_fps = max(1, float(fps))
+        if timeout is not None:
+            self.timeout = timeout
+
+    def attach(self, scrmgr):
+        """Starts watching the main screen manager (and the window for
+           touches).
+        """
+        from kivy.core.window import Window
+
+        self.scrmgr = scrmgr
+
+        # Kivy doesn't provide a public way to change the frame rate once the
+        # app is running so we have to change the clock's setting directly.
+        self.active_fps = Clock._max_fps
+
+        Window.bind(on_touch_down=self.wake,
+                    on_touch_move=self.wake,
+                    on_touch_up=self.wake)
+        scrmgr.bind(current=self.screen_changed)
+
+        self._current = scrmgr.current
+        self._mark = self._sample()
+        self.wake()
+
+        Clock.schedule_interval(self.check, CHECK_INTERVAL)
+
+        # Called once per frame so we can record the frame times
+        Clock.schedule_interval(self.frame_times.observe, 0)
+
+    def _sample(self):
+        return (time.time(), _cpu_time(), Clock.frames_displayed)
+
+    def _record(self):
+        """Adds the usage since the last sample to the current screen."""
+        now = self._sample()
+
+        if self._current and self._mark:
+            wall, cpu, frames = [n - m for n, m in zip(now, self._mark)]
+
+            with self._lock:
+                st = self.screens.setdefault(self._current,
+                                             {"wall": 0.0,
+                                              "cpu": 0.0,
+                                              "frames": 0,
+                                              "idle": 0.0})
+                st["wall"] += wall
+                st["cpu"] += cpu
+                st["frames"] += frames
+                if self.idle:
+                    st["idle"] += wall
+
+        self._mark = now
+
+    def screen_changed(self, scrmgr, current):
+        self._record()
+        self._current = current
+
+        # The transition will need the full frame rate
+        self.wake()
+
+    def wake(self, *args):
+        """Goes back to the full frame rate for at least "timeout" seconds."""
+        self._awake_until = time.time() + self.timeout
+
+        if self.idle:
+            self.idle = False
+            Clock._max_fps = self.active_fps
+            Logger.debug("Idle: Waking up")
+
+    def _busy(self):
+        """Returns True if something on the display is moving."""
+        if getattr(Animation, "_instances", None):
+            return True
+
+        # Screens can ask to keep the full frame rate
+        screen = getattr(self.scrmgr, "current_screen", None)
+        if getattr(screen, "keep_awake", False):
+            return True
+
+        transition = getattr(self.scrmgr, "transition", None)
+        return bool(getattr(transition, "is_active", False))
+
+    def check(self, *args):
+        self._record()
+
+        if not self.enabled:
+            return
+
+        if self._busy():
+            self.wake()
+
+        elif not self.idle and time.time() > self._awake_until:
+            self.idle = True
+            Clock._max_fps = self.idle_fps
+            Logger.debug("Idle: Going idle")
+
+    def stats(self):
+        """Returns the CPU use and frame rate for each screen."""
+        with self._lock:
+            screens = dict((k, dict(v)) for k, v in self.screens.items())
+
+        for st in screens.values():
+            wall = st["wall"]
+            st["cpu_percent"] = 100.0 * st["cpu"] / wall if wall else 0.0
+            st["fps"] = st["frames"] / wall if wall else 0.0
+            st["idle_percent"] = 100.0 * st["idle"] / wall if wall else 0.0
+
+        return {"idle": self.idle,
+                "max_fps": Clock._max_fps,
+                "screens": screens}
+
+
+# Shared idle manager for the app
+idle_manager = IdleManager()
@@ -1,12 +1,29 @@
 import imp
+import time
+from copy import deepcopy
 
+from kivy.clock import Clock
 from kivy.uix.floatlayout import FloatLayout
 from kivy.properties import BooleanProperty, ObjectProperty
 from kivy.lang import Builder
 from kivy.logger import Logger
 
+from core.commands import command_queue
 from core.failedscreen import FailedScreen
-from core.getplugins import getPlugins
+from core.fetch import fetch_service
+from core.getplugins import getPlugin, loadPluginModule
+from core.httpclient import http_client
+from core.idle import idle_manager
+from core.kvcache import kv_cache
+from core.lazyscreen import LazyScreen
+from core.metrics import metrics
+from core.paramsdiff import ParamsDiff
+from core.prefetch import PrefetchScheduler
+from core.startup import startup_profiler
+
+# Seconds to wait after changing screen before building the next lazy screen.
+# This gives the transition time to finish before we block the main loop.
+PRELOAD_DELAY = 1
 
 
 class InfoScreen(FloatLayout):
@@ -21,12 +38,27 @@ class InfoScreen(FloatLayout):
         # Get our list of available plugins
         plugins = kwargs["plugins"]
 
+        # Should we only build screens when they're needed?
+        self.lazy = kwargs.get("lazy", False)
+        self._preload_event = None
+
+        # Refreshes the screens that are about to be shown
+        prefetch = kwargs.get("prefetch", dict())
+        self.prefetcher = PrefetchScheduler(self, **prefetch)
+
         # We need a list to hold the names of the enabled screens
         self.availablescreens = []
 
         # and an index so we can loop through them:
         self.index = 0
 
+        # The params each screen was built with (so we can tell what's
+        # changed when its config is updated)
+        self.screenparams = {}
+
+        # The data sources each screen has cache settings for
+        self.cachesources = {}
+
         # We want to handle failures gracefully so set up some variables
         # variable to hold the FailScreen object (if needed)
         self.failscreen = None
@@ -48,29 +80,33 @@ class InfoScreen(FloatLayout):
             unmet = False
 
             # Loop over dependencies and test if they exist
-            for d in p["dependencies"]:
-                try:
-                    imp.find_module(d)
-                except ImportError:
-                    # We've got at least one unmet dependency for this screen
-                    unmet = True
-                    p_dep[1].append(d)
-                    Logger.error("Unmet dependencies "
-                                 "for {} screen. Skipping...".format(p["name"]))
+            with startup_profiler.phase(p["name"], "dependencies"):
+                for d in p["dependencies"]:
+                    try:
+                        imp.find_module(d)
+                    except ImportError:
+                        # We've got at least one unmet dependency
+                        unmet = True
+                        p_dep[1].append(d)
+                        Logger.error("Unmet dependencies for {} screen. "
+                                     "Skipping...".format(p["name"]))
 
             # Can we use the screen?
             if unmet:
                 # Add the tupe to our list of unmet dependencies
                 dep_fail.append(p_dep)
 
+            # If we're loading lazily and we've already got a screen to show
+            # then we just need a placeholder for now.
+            elif self.lazy and self.availablescreens:
+                self.scrmgr.add_widget(LazyScreen(name=p["name"], plugin=p))
+                self.availablescreens.append(p["name"])
+                Logger.info("Screen: {} deferred.".format(p["name"]))
+
             # No unmet dependencies so let's try to load the screen.
             else:
                 try:
-                    plugin = imp.load_module("screen", *p["info"])
-                    screen = getattr(plugin, p["screen"])
-                    self.scrmgr.add_widget(screen(name=p["name"],
-                                           master=self,
-                                           params=p["params"]))
+                    self.scrmgr.add_widget(self.build_screen(p))
                     Logger.info("Screen: {} loaded.".format(p["name"]))
 
                 # Uh oh, something went wrong...
@@ -86,7 +122,31 @@ class InfoScreen(FloatLayout):
 
         # If we've got any failures then let's notify the user.
         if dep_fail or failedscreens:
+            self.show_failures(dep_fail, failedscreens)
+
+        # Get the next screen ready in the background.
+        self.schedule_preload()
+        self.prefetcher.screen_changed()
+
+        # Drop the frame rate when nothing's happening on the display
+        idle_manager.attach(self.scrmgr)
 
+        # Keep count of the widgets for the metrics page
+        metrics.attach(self)
+
+        # Carry out changes to screens requested through the API
+        command_queue.attach(self)
+
+        # Start up is done so report how long it took
+        startup_profiler.finish()
+
+    def show_failures(self, dep_fail, failedscreens, show=True):
+        """Displays (or updates) the screen listing screens that failed."""
+        if self.failscreen is not None:
+            for name, error in failedscreens:
+                self.failscreen.add_failure(name, error)
+
+        else:
             # Create the FailedScreen instance
             self.failscreen = FailedScreen(dep=dep_fail,
                                            failed=failedscreens,
@@ -95,8 +155,100 @@ class InfoScreen(FloatLayout):
             # Add it to our screen manager and make sure it's the first screen
             # the user sees.
             self.scrmgr.add_widget(self.failscreen)
+
+        if show:
             self.scrmgr.current = "FAILEDSCREENS"
 
+    def build_screen(self, p):
+        """Imports the plugin and creates an instance of its screen."""
+
+        # Import it
+        with startup_profiler.phase(p["name"], "import"):
+            plugin = loadPluginModule(p)
+
+        # Get the reference to the screen class
+        screen = getattr(plugin, p["screen"])
+
+        # Apply any cache settings for the screen's data sources
+        self.apply_cache_settings(p["name"], p["cache"])
+
+        with startup_profiler.phase(p["name"], "construct"):
+            instance = screen(name=p["name"], master=self,
+                              params=p["params"])
+
+        self.screenparams[p["name"]] = deepcopy(p["params"])
+        return instance
+
+    def apply_cache_settings(self, screenname, cache):
+        """Sets how long to cache each of the screen's data sources, removing
+           any settings for sources that are no longer listed.
+        """
+        for source in self.cachesources.pop(screenname, set()):
+            if source not in cache:
+                http_client.cache.set_ttl(source, None)
+
+        for source, ttl in cache.items():
+            http_client.cache.set_ttl(source, ttl)
+
+        self.cachesources[screenname] = set(cache)
+
+    def load_lazy_screen(self, screenname, show_failure=True):
+        """Replaces a placeholder screen with the real plugin screen.
+
+           Returns True if the screen is ready to be displayed.
+        """
+        placeholder = self.scrmgr.get_screen(screenname)
+
+        # Nothing to do if the screen has already been built
+        if not isinstance(placeholder, LazyScreen):
+            return True
+
+        try:
+            screen = self.build_screen(placeholder.plugin)
+
+        except Exception, e:
+            Logger.error("Could not import "
+                         "{} screen. Skipping...".format(screenname))
+
+            # We can't show this screen so remove it from the rotation...
+            self.scrmgr.remove_widget(placeholder)
+            pos = self.availablescreens.index(screenname)
+            self.availablescreens.remove(screenname)
+            if pos <= self.index and self.availablescreens:
+                self.index = (self.index - 1) % len(self.availablescreens)
+
+            # ...and let the user know.
+            self.show_failures([], [(screenname, repr(e))], show_failure)
+
+            return False
+
+        # Swap the placeholder for the real thing
+        self.scrmgr.remove_widget(placeholder)
+        self.scrmgr.add_widget(screen)
+        Logger.info("Screen: {} loaded.".format(screenname))
+
+        return True
+
+    def schedule_preload(self, rev=False):
+        """Builds the screen that we'd show next in the background."""
+        if self.lazy and self.availablescreens:
+            if self._preload_event is not None:
+                Clock.unschedule(self._preload_event)
+            self._preload_event = Clock.schedule_once(
+                lambda dt: self.preload(rev), PRELOAD_DELAY)
+
+    def preload(self, rev=False):
+        if not self.availablescreens:
+            return
+
+        inc = -1 if rev else 1
+        index = (self.index + inc) % len(self.availablescreens)
+        screenname = self.availablescreens[index]
+
+        # Don't swap the screen that's currently on display
+        if screenname != self.scrmgr.current:
+            self.load_lazy_screen(screenname, show_failure=False)
+
     def toggle_lock(self, locked=None):
         if locked is None:
             self.locked = not self.locked
@@ -110,36 +262,76 @@ class InfoScreen(FloatLayout):
         # ...and add it again.
         self.add_screen(screen)
 
-    def add_screen(self, screenname):
+    def update_screen(self, screenname):
+        """Applies a change to the screen's config.
 
-        # Get the info we need to import this screen
-        foundscreen = [p for p in getPlugins() if p["name"] == screenname]
+           If the screen has an "update_params" method, it's given the
+           changes to its params (see core/paramsdiff.py) so that it can
+           apply them without being rebuilt. The screen is reloaded if it
+           doesn't have the method or can't apply the changes.
 
-        # Check we've found a screen and it's not already running
-        if foundscreen and not screenname in self.availablescreens:
+           Returns True if the screen was updated without being rebuilt.
+        """
+        p = getPlugin(screenname)
+
+        # The screen isn't running so there's nothing to update
+        if not p or screenname not in self.availablescreens:
+            self.reload_screen(screenname)
+            return False
 
-            # Get the details for the screen
-            p = foundscreen[0]
+        start = time.time()
+        screen = self.scrmgr.get_screen(screenname)
 
-            # Import it
-            plugin = imp.load_module("screen", *p["info"])
+        # Placeholders just need the new details for when they're built
+        if isinstance(screen, LazyScreen):
+            screen.plugin = p
+            return True
 
-            # Get the reference to the screen class
-            screen = getattr(plugin, p["screen"])
+        # Apply any changes to the cache settings
+        self.apply_cache_settings(screenname, p["cache"])
+
+        diff = ParamsDiff(self.screenparams.get(screenname), p["params"])
+        if not diff:
+            return True
+
+        updated = False
+        if hasattr(screen, "update_params"):
+            try:
+                updated = screen.update_params(diff)
+            except Exception, e:
+                Logger.error("Screen: Could not update {} screen "
+                             "({})".format(screenname, repr(e)))
+
+        if not updated:
+            self.reload_screen(screenname)
+            return False
+
+        self.screenparams[screenname] = deepcopy(p["params"])
+        Logger.info("Screen: {} updated in {:.1f}ms ({}).".format(
+            screenname, (time.time() - start) * 1000,
+            ", ".join(sorted(diff.keys()))))
+
+        return True
+
+    def add_screen(self, screenname):
+
+        # Get the info we need to import this screen
+        p = getPlugin(screenname)
+
+        # Check we've found a screen and it's not already running
+        if p and not screenname in self.availablescreens:
 
             # Add the KV file to the builder
-            Builder.load_file(p["kvpath"])
+            kv_cache.load_file(p["kvpath"])
 
             # Add the screen
-            self.scrmgr.add_widget(screen(name=p["name"],
-                                   master=self,
-                                   params=p["params"]))
+            self.scrmgr.add_widget(self.build_screen(p))
 
             # Add to our list of available screens
             self.availablescreens.append(screenname)
 
             # Activate screen
-            self.switch_to(screename)
+            self.switch_to(screenname)
 
         elif screenname in self.availablescreens:
 
@@ -149,7 +341,7 @@ class InfoScreen(FloatLayout):
     def remove_screen(self, screenname):
 
         # Get the list of screens
-        foundscreen = [p for p in getPlugins(inactive=True) if p["name"] == screenname]
+        p = getPlugin(screenname, inactive=True)
 
         # Loop over list of available screens
         while screenname in self.availablescreens:
@@ -167,19 +359,22 @@ class InfoScreen(FloatLayout):
             if hasattr(c, "unload"):
                 c.unload()
 
+            # Make sure we don't get any callbacks from outstanding requests
+            fetch_service.cancel(c)
+
             # Delete the screen
             self.scrmgr.remove_widget(c)
             del c
 
-        try:
+        self.screenparams.pop(screenname, None)
+
+        if p:
             # Remove the KV file from our builder
-            Builder.unload_file(foundscreen[0]["kvpath"])
-        except IndexError:
-            pass
+            Builder.unload_file(p["kvpath"])
 
 
     def next_screen(self, rev=False):
-        if not self.locked:
+        if not self.locked and self.availablescreens:
             if rev:
                 self.scrmgr.transition.direction = "right"
                 inc = -1
@@ -188,15 +383,32 @@ class InfoScreen(FloatLayout):
                 inc = 1
 
             self.index = (self.index + inc) % len(self.availablescreens)
-            self.scrmgr.current = self.availablescreens[self.index]
+            screenname = self.availablescreens[self.index]
+
+            # Lazy screens need to be built before we can show them. If that
+            # fails, the user will be shown the failed screens instead.
+            if self.load_lazy_screen(screenname):
+                self.scrmgr.current = screenname
+
+            # Either way, keep preparing (and rotating to) the next screen
+            self.schedule_preload(rev)
+            self.prefetcher.screen_changed(rev)
 
 
     def switch_to(self, screen):
 
         if screen in self.availablescreens:
 
+            # Make sure the screen has been built
+            if not self.load_lazy_screen(screen):
+                return
+
             # Activate the screen
             self.scrmgr.current = screen
 
             # Update the screen index
             self.index = self.availablescreens.index(screen)
+
+            # Get the next screen ready
+            self.schedule_preload()
+            self.prefetcher.screen_changed()
@@ -0,0 +1,193 @@
+'''Cache of parsed KV files.
+
+   Parsing KV files is a noticeable part of start up time on slower Pis so
+   the parsed rules are kept in memory (for screen reloads) and on disk (for
+   the next boot). Entries are keyed on the file path and a hash of the file
+   contents (and the Kivy and Python versions, as compiled code can't be
+   shared between Python versions) so any change to a KV file means it will
+   be parsed again.
+
+   The number of files parsed and loaded from the cache, and the time spent
+   on each, are kept so the cache can be compared with parsing (see
+   kv_cache.stats() and the benchmark's results).
+
+   Use kv_cache.load_file(path) instead of Builder.load_file(path). Files
+   loaded this way can still be unloaded with Builder.unload_file.
+'''
+import codecs
+import copy_reg
+import cPickle as pickle
+import hashlib
+import marshal
+import os
+import sys
+import time
+import types
+from contextlib import contextmanager
+from threading import RLock
+
+import kivy
+from kivy.lang import Builder
+from kivy.logger import Logger
+from kivy.resources import resource_find
+
+# The Parser class lives in a different module in newer versions of Kivy
+try:
+    import kivy.lang.builder as builder_module
+except ImportError:
+    import kivy.lang as builder_module
+
+# Location of the cache on disk
+KVCacheFolder = os.path.join(".", "cache", "kv")
+
+
+def _reduce_code(code):
+    """Allows compiled KV rules (which contain code objects) to be pickled."""
+    return marshal.loads, (marshal.dumps(code),)
+
+copy_reg.pickle(types.CodeType, _reduce_code)
+
+
+class KVCache(object):
+    def __init__(self, folder=KVCacheFolder):
+        self.folder = folder
+        self._lock = RLock()
+        self.parser_class = builder_module.Parser
+
+        # Path -> (digest, parser)
+        self._parsers = {}
+
+        # Where each parser came from: number of files and time taken
+        self._stats = {"memory": [0, 0.0],
+                       "disk": [0, 0.0],
+                       "parsed": [0, 0.0]}
+
+    def _digest(self, data):
+        return hashlib.sha1("\0".join([kivy.__version__, sys.version,
+                                       data])).hexdigest()
+
+    def _cachefile(self, filename):
+        name = hashlib.sha1(os.path.abspath(filename)).hexdigest()
+        return os.path.join(self.folder, name + ".kvc")
+
+    def _read_disk(self, filename, digest):
+        try:
+            with open(self._cachefile(filename), "rb") as cfile:
+                cached_digest, parser = pickle.load(cfile)
+        except (IOError, EOFError):
+            return None
+        except Exception, e:
+            Logger.warning("KVCache: Unable to read cache for "
+                           "{} ({})".format(filename, repr(e)))
+            return None
+
+        if cached_digest != digest:
+            return None
+
+        return parser
+
+    def _write_disk(self, filename, digest, parser):
+        cachefile = self._cachefile(filename)
+        tmpfile = cachefile + ".tmp"
+
+        try:
+            if not os.path.isdir(self.folder):
+                os.makedirs(self.folder)
+
+            with open(tmpfile, "wb") as cfile:
+                pickle.dump((digest, parser), cfile, pickle.HIGHEST_PROTOCOL)
+
+            # Replace the old entry in one go so a crash can't leave a
+            # partial file behind.
+            os.rename(tmpfile, cachefile)
+
+        except Exception, e:
+            Logger.warning("KVCache: Unable to cache "
+                           "{} ({})".format(filename, repr(e)))
+            try:
+                os.remove(tmpfile)
+            except OSError:
+                pass
+
+    def get_parser(self, filename, content):
+        """Returns a parser for the KV file, only parsing it if needed."""
+        start = time.time()
+        digest = self._digest(content)
+
+        with self._lock:
+            cached = self._parsers.get(filename)
+            parser = cached[1] if cached and cached[0] == digest else None
+            source = "memory"
+
+            if parser is None:
+                parser = self._read_disk(filename, digest)
+                source = "disk"
+
+            if parser is None:
+                parser = self.parser_class(content=content, filename=filename)
+                source = "parsed"
+                self._write_disk(filename, digest, parser)
+            else:
+                # The directives (e.g. "#:import") have side effects which
+                # still need to happen.
+                parser.execute_directives()
+
+            self._parsers[filename] = (digest, parser)
+
+            stat = self._stats[source]
+            stat[0] += 1
+            stat[1] += time.time() - start
+
+        return parser
+
+    @contextmanager
+    def _use_cache(self):
+        """Makes the Builder use our cached parsers while loading a file."""
+        def cached_parser(**kwargs):
+            filename = kwargs.get("filename")
+            if filename is None:
+                return self.parser_class(**kwargs)
+            return self.get_parser(filename, kwargs["content"])
+
+        builder_module.Parser = cached_parser
+        try:
+            yield
+        finally:
+            builder_module.Parser = self.parser_class
+
+    def load_file(self, filename, **kwargs):
+        """Equivalent to Builder.load_file but uses the cache."""
+        filename = resource_find(filename) or filename
+
+        with open(filename, "r") as kvfile:
+            data = kvfile.read()
+
+        if data.startswith(codecs.BOM_UTF8):
+            data = data[len(codecs.BOM_UTF8):]
+
+        kwargs["filename"] = filename
+
+        with self._lock:
+            with self._use_cache():
+                return Builder.load_string(data, **kwargs)
+
+    def stats(self):
+        """Returns the number of files (and the time spent) parsed and loaded
+           from the memory and disk caches.
+        """
+        with self._lock:
+            return dict((source, {"files": files, "seconds": seconds})
+                        for source, (files, seconds) in self._stats.items())
+
+    def invalidate(self, filename=None):
+        """Removes the file (or all files) from the in-memory cache."""
+        with self._lock:
+            if filename is None:
+                self._parsers.clear()
+            else:
+                filename = resource_find(filename) or filename
+                self._parsers.pop(filename, None)
+
+
+# Shared cache for base.kv and the plugins' KV files
+kv_cache = KVCache()
@@ -0,0 +1,17 @@
+from kivy.uix.screenmanager import Screen
+from kivy.uix.label import Label
+
+
+class LazyScreen(Screen):
+    """Lightweight placeholder for a plugin screen that hasn't been built yet.
+
+       The InfoScreen swaps this for the real plugin screen the first time
+       the user navigates to it (or just before, when preloading).
+    """
+    def __init__(self, **kwargs):
+        # Details of the plugin (as returned by getPlugins)
+        self.plugin = kwargs.pop("plugin")
+
+        super(LazyScreen, self).__init__(**kwargs)
+
+        self.add_widget(Label(text="Loading {}...".format(self.name)))
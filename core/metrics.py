@@ -0,0 +1,206 @@
+'''Prometheus metrics for the Raspberry Pi Information Screen.
+
+   The metrics are served in the Prometheus text format at [HOST]/metrics so
+   that a number of screens can be monitored together.
+
+   Rendering the metrics must never hold up the display, so they're built in
+   the API server's thread from counters that the services already keep.
+   Anything which means looking at the widgets (widget counts and texture
+   memory) is counted on the main loop every SNAPSHOT_INTERVAL seconds and
+   the last count is reported.
+'''
+import time
+from threading import Lock
+
+from kivy.clock import Clock
+
+from core.fetch import fetch_service
+from core.httpclient import http_client
+from core.idle import idle_manager
+from core.startup import process_rss, startup_profiler
+
+# How often (in seconds) to count the widgets on each screen
+SNAPSHOT_INTERVAL = 30
+
+# Bytes per pixel for textures whose colour format we don't know
+TEXTURE_BPP = 4
+
+
+def count_widgets(widget):
+    """Returns the number of widgets in the tree (including widget)."""
+    count = 0
+    stack = [widget]
+    while stack:
+        w = stack.pop()
+        count += 1
+        stack.extend(w.children)
+    return count
+
+
+def _texture_bytes():
+    """Estimates the memory used by the textures in Kivy's cache."""
+    from kivy.cache import Cache
+
+    total = 0
+    for category in ("kv.texture", "kv.image"):
+        for entry in Cache._objects.get(category, {}).values():
+            obj = entry.get("object")
+            texture = getattr(obj, "texture", obj)
+            size = getattr(texture, "size", None)
+            if size:
+                total += size[0] * size[1] * TEXTURE_BPP
+    return total
+
+
+def _escape(value):
+    return unicode(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(k, _escape(v))
+                          for k, v in sorted(labels.items())) + "}"
+
+
+class MetricsWriter(object):
+    """Builds the lines of a Prometheus text format page."""
+    def __init__(self):
+        self.lines = []
+
+    def header(self, name, mtype, text):
+        self.lines.append("# HELP {} {}".format(name, text))
+        self.lines.append("# TYPE {} {}".format(name, mtype))
+
+    def sample(self, name, value, **labels):
+        if value is None:
+            return
+        self.lines.append(u"{}{} {}".format(name, _labels(labels),
+                                            float(value)))
+
+    def metric(self, name, mtype, text, value, **labels):
+        self.header(name, mtype, text)
+        self.sample(name, value, **labels)
+
+    def histogram(self, name, snapshot, **labels):
+        """Adds the samples for a Histogram.snapshot()."""
+        buckets, total, count = snapshot
+        for bound, n in buckets:
+            self.sample(name + "_bucket", n, le=bound, **labels)
+        self.sample(name + "_bucket", count, le="+Inf", **labels)
+        self.sample(name + "_sum", total, **labels)
+        self.sample(name + "_count", count, **labels)
+
+    def text(self):
+        return u"\n".join(self.lines) + u"\n"
+
+
+class Metrics(object):
+    def __init__(self):
+        self.infoscreen = None
+        self._lock = Lock()
+
+        # Results of the last count on the main loop
+        self._widgets = {}
+        self._textures = None
+
+    def attach(self, infoscreen):
+        """Starts counting the widgets on the InfoScreen's screens."""
+        self.infoscreen = infoscreen
+        self.snapshot()
+        Clock.schedule_interval(self.snapshot, SNAPSHOT_INTERVAL)
+
+    def snapshot(self, *args):
+        """Counts the widgets on each screen (must run on the main loop)."""
+        widgets = dict((s.name, count_widgets(s))
+                       for s in self.infoscreen.scrmgr.screens)
+
+        with self._lock:
+            self._widgets = widgets
+            self._textures = _texture_bytes()
+
+    def render(self):
+        """Returns the metrics in Prometheus text format."""
+        out = MetricsWriter()
+
+        out.metric("infoscreen_uptime_seconds", "gauge",
+                   "Time since the app started.",
+                   time.time() - startup_profiler.started)
+
+        out.metric("infoscreen_process_resident_memory_bytes", "gauge",
+                   "Resident memory size of the process.", process_rss())
+
+        with self._lock:
+            widgets = dict(self._widgets)
+            textures = self._textures
+
+        out.metric("infoscreen_texture_memory_bytes", "gauge",
+                   "Estimated memory used by cached textures.", textures)
+
+        out.header("infoscreen_widgets", "gauge",
+                   "Number of widgets on each screen.")
+        for name, count in sorted(widgets.items()):
+            out.sample("infoscreen_widgets", count, screen=name)
+
+        if self.infoscreen is not None:
+            out.metric("infoscreen_visible_screen", "gauge",
+                       "The screen currently being displayed.", 1,
+                       screen=self.infoscreen.scrmgr.current)
+
+        # Background fetches
+        screens = fetch_service.screen_stats()
+        out.header("infoscreen_fetch_duration_seconds", "histogram",
+                   "Time from submitting a fetch to getting the result.")
+        for name, (latency, errors) in sorted(screens.items()):
+            out.histogram("infoscreen_fetch_duration_seconds", latency,
+                          screen=name)
+
+        out.header("infoscreen_fetch_errors_total", "counter",
+                   "Number of fetches that raised an error.")
+        for name, (latency, errors) in sorted(screens.items()):
+            out.sample("infoscreen_fetch_errors_total", errors, screen=name)
+
+        # HTTP cache
+        cache = http_client.cache.stats()
+        out.header("infoscreen_http_cache_requests_total", "counter",
+                   "HTTP requests by data source and cache result.")
+        for source, st in sorted(cache.items()):
+            for result in ("hit", "miss", "revalidated", "coalesced"):
+                out.sample("infoscreen_http_cache_requests_total",
+                           st[result], source=source, result=result)
+
+        out.header("infoscreen_http_cache_hit_ratio", "gauge",
+                   "Proportion of HTTP requests answered without a download.")
+        for source, st in sorted(cache.items()):
+            out.sample("infoscreen_http_cache_hit_ratio", st["ratio"],
+                       source=source)
+
+        # Circuit breakers
+        breakers = http_client.breakers.status()
+        out.header("infoscreen_http_breaker_open", "gauge",
+                   "1 if requests to the host are being stopped.")
+        for host, st in sorted(breakers.items()):
+            out.sample("infoscreen_http_breaker_open",
+                       int(st["state"] != "closed"), host=host)
+
+        out.header("infoscreen_http_breaker_rejected_total", "counter",
+                   "Requests stopped by the host's circuit breaker.")
+        for host, st in sorted(breakers.items()):
+            out.sample("infoscreen_http_breaker_rejected_total",
+                       st["rejected"], host=host)
+
+        # Rendering
+        out.header("infoscreen_frame_time_seconds", "histogram",
+                   "Time between frames.")
+        out.histogram("infoscreen_frame_time_seconds",
+                      idle_manager.frame_times.snapshot())
+
+        out.metric("infoscreen_idle", "gauge",
+                   "1 if the frame rate has been lowered.",
+                   int(idle_manager.idle))
+
+        return out.text()
+
+
+# Shared metrics for the app
+metrics = Metrics()
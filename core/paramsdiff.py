@@ -0,0 +1,52 @@
+'''Changes to a screen's params.
+
+   When a screen's config is changed through the API, the InfoScreen works
+   out what's changed and passes it to the screen's "update_params" method
+   (if it has one) e.g.
+
+       def update_params(self, diff):
+           # We can only add and remove stops without rebuilding
+           if not diff.only("stops"):
+               return False
+
+           self.set_stops(diff.new["stops"])
+           return True
+
+   If the method returns True, the screen is kept (along with any data it's
+   already downloaded). Otherwise, or if the screen doesn't have the method,
+   the screen is reloaded.
+'''
+from copy import deepcopy
+
+
+class ParamsDiff(object):
+    """The differences between the old and new params for a screen.
+
+       old and new are the full params. added, removed and changed are sets
+       of the top level keys which have been added, removed or changed.
+    """
+    def __init__(self, old, new):
+        self.old = deepcopy(old or dict())
+        self.new = deepcopy(new or dict())
+
+        oldkeys = set(self.old)
+        newkeys = set(self.new)
+
+        self.added = newkeys - oldkeys
+        self.removed = oldkeys - newkeys
+        self.changed = set(k for k in oldkeys & newkeys
+                           if self.old[k] != self.new[k])
+
+    def __nonzero__(self):
+        return bool(self.keys())
+
+    def keys(self):
+        """Returns the set of keys that are different."""
+        return self.added | self.removed | self.changed
+
+    def only(self, *keys):
+        """Returns True if nothing has changed apart from keys."""
+        return self.keys() <= set(keys)
+
+    def __repr__(self):
+        return "<ParamsDiff {}>".format(sorted(self.keys()))
@@ -0,0 +1,119 @@
+'''Prefetch scheduler for the Raspberry Pi Information Screen.
+
+   Most screens only start downloading data when they're shown, so each
+   change of screen shows old (or no) data for a moment. The scheduler asks
+   the screens that are about to be shown to refresh their data first.
+
+   Screens opt in by defining a "prefetch" method. This should start a
+   background update if the screen's data is due to be refreshed (and do
+   nothing if it isn't).
+
+   If "rotate" is set in the "prefetch" section of config.json, the screens
+   change automatically every "rotate" seconds and the next screen is
+   refreshed "lead" seconds before it's shown. Otherwise (the screens are
+   changed by touch), the screens up to "distance" places either side of the
+   current screen are refreshed once the display has changed. Screens further
+   away are left alone as they won't be visible for a while.
+'''
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+from core.lazyscreen import LazyScreen
+
+# Seconds before the switch to refresh the next screen (automatic rotation)
+DEFAULT_LEAD = 10
+
+# Number of screens either side of the current one to refresh (manual
+# rotation)
+DEFAULT_DISTANCE = 1
+
+# Seconds to wait after changing screen before refreshing the neighbours.
+# This lets the transition (and any lazy screen preload) finish first.
+SETTLE_DELAY = 2
+
+
+class PrefetchScheduler(object):
+    def __init__(self, infoscreen, enabled=True, lead=DEFAULT_LEAD,
+                 distance=DEFAULT_DISTANCE, rotate=0):
+        self.infoscreen = infoscreen
+        self.enabled = enabled
+        self.lead = lead
+        self.distance = max(0, int(distance))
+        self.rotate = rotate
+        self._prefetch_event = None
+        self._rotate_event = None
+
+    def cancel(self):
+        for event in (self._prefetch_event, self._rotate_event):
+            if event is not None:
+                Clock.unschedule(event)
+        self._prefetch_event = self._rotate_event = None
+
+    def screen_changed(self, rev=False):
+        """Plans the refreshes (and the next rotation) after the displayed
+           screen has changed.
+        """
+        self.cancel()
+
+        if self.rotate:
+            self._rotate_event = Clock.schedule_once(self.next_screen,
+                                                     self.rotate)
+            delay = max(SETTLE_DELAY, self.rotate - self.lead)
+            screens = self.upcoming(rev, both=False)
+        else:
+            delay = SETTLE_DELAY
+            screens = self.upcoming(rev)
+
+        if self.enabled and screens:
+            self._prefetch_event = Clock.schedule_once(
+                lambda dt: self.prefetch(screens), delay)
+
+    def upcoming(self, rev=False, both=True):
+        """Returns the names of the screens that could be shown next."""
+        names = self.infoscreen.availablescreens
+        if len(names) < 2:
+            return []
+
+        index = self.infoscreen.index
+        direction = -1 if rev else 1
+        distance = self.distance if both else 1
+
+        upcoming = []
+        for step in range(1, distance + 1):
+            offsets = [step * direction]
+            if both:
+                offsets.append(-step * direction)
+            for offset in offsets:
+                name = names[(index + offset) % len(names)]
+                if name not in upcoming and name != names[index]:
+                    upcoming.append(name)
+
+        return upcoming
+
+    def prefetch(self, screens):
+        scrmgr = self.infoscreen.scrmgr
+
+        for name in screens:
+            if name == scrmgr.current or not scrmgr.has_screen(name):
+                continue
+
+            screen = scrmgr.get_screen(name)
+
+            # Lazy screens are refreshed once they've been built
+            if isinstance(screen, LazyScreen) or \
+                    not hasattr(screen, "prefetch"):
+                continue
+
+            try:
+                screen.prefetch()
+            except Exception, e:
+                Logger.warning("Prefetch: Unable to refresh "
+                               "{} ({})".format(name, repr(e)))
+
+    def next_screen(self, *args):
+        """Rotates to the next screen (unless the display is locked)."""
+        if self.infoscreen.locked:
+            self._rotate_event = Clock.schedule_once(self.next_screen,
+                                                     self.rotate)
+        else:
+            self.infoscreen.next_screen()
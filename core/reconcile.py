@@ -0,0 +1,117 @@
+'''Keyed widget updates for list-style screens.
+
+   Many screens show a list of rows (buses, forecasts, calendar events...)
+   which mostly stay the same from one refresh to the next. Rather than
+   clearing the list and building every row again, reconcile() matches the
+   new records to the existing rows by key:
+
+     - rows for records that are still there are kept and updated in place;
+     - rows are only created for new records;
+     - rows for records that have gone are removed;
+     - rows are moved if the order has changed.
+
+   e.g.
+
+       reconcile(self.ids.bus_list, buses,
+                 key=lambda bus: (bus["route"], bus["destination"]),
+                 create=lambda bus: LondonBus(bus=bus),
+                 update=lambda row, bus: row.update(bus))
+
+   If the container is in a ScrollView, the list stays scrolled to the same
+   place when its height changes.
+'''
+from kivy.uix.scrollview import ScrollView
+
+
+def _keep_scroll(container):
+    """Keeps the ScrollView holding container at the same distance from the
+       top of the list the next time the container's height changes.
+    """
+    scrollview = container.parent
+    if not isinstance(scrollview, ScrollView):
+        return
+
+    # Only the latest position matters
+    restore = getattr(container, "_restore_scroll", None)
+    if restore is not None:
+        container.unbind(height=restore)
+
+    overflow = container.height - scrollview.height
+    if overflow <= 0:
+        return
+
+    # Distance (in pixels) from the top of the list
+    offset = (1 - scrollview.scroll_y) * overflow
+
+    def restore(widget, height):
+        container.unbind(height=restore)
+        container._restore_scroll = None
+        overflow = height - scrollview.height
+        if overflow > 0:
+            scrollview.scroll_y = min(1, max(0, 1 - offset / overflow))
+
+    container._restore_scroll = restore
+    container.bind(height=restore)
+
+
+def reconcile(container, records, key, create, update=None):
+    """Updates the children of container to show records (in order).
+
+       key(record) returns a hashable key for the record. Records with the
+       same key are matched to rows in the order they appear.
+       create(record) returns a new row widget.
+       update(row, record) updates an existing row to show the record.
+
+       Children that weren't created by reconcile (e.g. an error message)
+       are removed. Returns the list of rows.
+    """
+    _keep_scroll(container)
+
+    # The rows we've already got
+    existing = {}
+    for child in container.children:
+        rowkey = getattr(child, "reconcile_key", None)
+        if rowkey is not None:
+            existing[rowkey] = child
+
+    rows = []
+    seen = {}
+    for record in records:
+        k = key(record)
+
+        # Make the key unique if there's more than one record with it
+        n = seen.get(k, 0)
+        seen[k] = n + 1
+        rowkey = (k, n)
+
+        row = existing.pop(rowkey, None)
+        if row is not None:
+            if update is not None:
+                update(row, record)
+        else:
+            row = create(record)
+            row.reconcile_key = rowkey
+
+        rows.append(row)
+
+    # Remove the rows that we don't need any more
+    keep = set(id(row) for row in rows)
+    for child in list(container.children):
+        if id(child) not in keep:
+            container.remove_widget(child)
+
+    # Layouts show their children in reverse order so the first row is the
+    # last child.
+    shown = list(reversed(container.children))
+    for i, row in enumerate(rows):
+        if i < len(shown) and shown[i] is row:
+            continue
+
+        if row.parent is container:
+            container.remove_widget(row)
+            shown.remove(row)
+
+        container.add_widget(row, index=len(container.children) - i)
+        shown.insert(i, row)
+
+    return rows
@@ -0,0 +1,147 @@
+'''Leak detection for long running (soak) tests.
+
+   The monitor takes regular samples of:
+
+     - the number of live widgets;
+     - the number of live textures;
+     - the number of live Python objects of each type;
+     - the memory used by the process (RSS).
+
+   Some growth is expected while the app warms up (caches filling, screens
+   being built for the first time, etc.) so samples taken during the warm up
+   period are ignored. After that, each measurement is split into a number
+   of equal periods and is reported as a leak if it grows from each period
+   to the next and by more than a minimum amount overall.
+'''
+import gc
+import time
+from collections import Counter
+
+from kivy.graphics.texture import Texture
+from kivy.uix.widget import Widget
+
+from core.metrics import process_rss
+
+# Number of periods to split the samples into when looking for growth
+DEFAULT_PERIODS = 4
+
+# Growth that we ignore for each measurement (e.g. a few widgets more
+# because a screen's showing more data now).
+MIN_GROWTH = {"widgets": 50,
+              "textures": 20,
+              "objects": 5000,
+              "rss": 10 * 1024 * 1024}
+
+# Growth that we ignore for the number of objects of a single type
+MIN_TYPE_GROWTH = 500
+
+# Number of types to report
+TOP_TYPES = 20
+
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def growth(values, periods=DEFAULT_PERIODS, minimum=0):
+    """Returns the growth in values if it has grown from each period to the
+       next (and by more than "minimum") or None if it hasn't.
+    """
+    size = len(values) // periods
+    if size < 1:
+        return None
+
+    medians = [_median(values[i * size:(i + 1) * size])
+               for i in range(periods)]
+
+    rising = all(b > a for a, b in zip(medians, medians[1:]))
+    total = medians[-1] - medians[0]
+    if rising and total > minimum:
+        return total
+
+    return None
+
+
+class SoakMonitor(object):
+    def __init__(self, warmup=0, periods=DEFAULT_PERIODS):
+        self.warmup = warmup
+        self.periods = periods
+        self.started = time.time()
+
+        # List of (time, widgets, textures, objects, rss) tuples
+        self.samples = []
+
+        # Object counts by type for each sample
+        self.types = []
+
+    def sample(self, *args):
+        """Records the current counts (must run on the main loop)."""
+        gc.collect()
+
+        widgets = textures = 0
+        types = Counter()
+        objects = gc.get_objects()
+        for obj in objects:
+            types[type(obj).__name__] += 1
+            if isinstance(obj, Widget):
+                widgets += 1
+            elif isinstance(obj, Texture):
+                textures += 1
+
+        now = time.time() - self.started
+        self.samples.append((now, widgets, textures, len(objects),
+                             process_rss() or 0))
+        self.types.append(types)
+
+        # Don't keep the objects alive until the next sample
+        del objects
+
+    def _steady(self):
+        """Returns the samples taken after the warm up."""
+        return [(s, t) for s, t in zip(self.samples, self.types)
+                if s[0] >= self.warmup]
+
+    def leaks(self):
+        """Returns a dictionary of the measurements that keep growing."""
+        steady = self._steady()
+        if not steady:
+            return {}
+
+        samples = [s for s, t in steady]
+        hours = max(samples[-1][0] - samples[0][0], 1) / 3600.0
+
+        leaks = {}
+        for i, name in enumerate(("widgets", "textures", "objects", "rss"),
+                                 1):
+            grown = growth([s[i] for s in samples], self.periods,
+                           MIN_GROWTH[name])
+            if grown is not None:
+                leaks[name] = {"growth": grown,
+                               "per_hour": grown / hours}
+
+        # Which types of object are piling up?
+        types = [t for s, t in steady]
+        grown = {}
+        for name in types[-1]:
+            g = growth([t[name] for t in types], self.periods,
+                       MIN_TYPE_GROWTH)
+            if g is not None:
+                grown[name] = g
+
+        if grown:
+            top = sorted(grown.items(), key=lambda x: x[1], reverse=True)
+            leaks["types"] = dict(top[:TOP_TYPES])
+
+        return leaks
+
+    def report(self):
+        """Returns the samples and any leaks found."""
+        leaks = self.leaks()
+        return {"warmup": self.warmup,
+                "duration": time.time() - self.started,
+                "samples": [dict(zip(("time", "widgets", "textures",
+                                      "objects", "rss"), s))
+                            for s in self.samples],
+                "leaks": leaks,
+                "passed": not leaks}
@@ -0,0 +1,241 @@
+'''Local stand-in for the servers used by the screens.
+
+   When the stand-in is turned on (the "standin" section of config.json),
+   every request made through http_client is sent to a small local server
+   instead of the real one. This covers all of the screens' data sources
+   (Wunderground, TfL TrackerNet and bus countdown, HSL, worldtides,
+   celestrak, the BBC sport pages and National Rail) without having to
+   change any of the screens.
+
+   The original URL is passed in the path of the request e.g.
+
+       http://localhost:8090/http://api.wunderground.com/api/...
+
+   In "replay" mode, the server answers from the recorded responses in the
+   fixtures folder (see core.fixtures), after a delay of "latency" seconds
+   give or take up to "jitter" seconds. A proportion ("errorrate") of the
+   requests are answered with an "errorstatus" error instead so that the
+   screens' error handling can be tested. Requests with no recorded
+   response get a "502 Bad Gateway".
+
+   In "record" mode, requests are passed on to the real server and the
+   responses are saved to the fixtures folder.
+
+   The server can also be run on its own (e.g. on another machine) with
+
+       KIVY_NO_ARGS=1 python -m core.standin --port 8090 --latency 0.5
+
+   and the screens pointed at it by setting "url" in the "standin" section.
+'''
+import argparse
+import random
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from threading import Thread
+
+try:
+    import requests
+except ImportError:
+    # The screens that make web requests list requests as a dependency
+    requests = None
+
+from kivy.logger import Logger
+
+from core.fixtures import FixtureFolder, FixtureSession
+from core.httpclient import http_client
+
+# Default port for the stand-in server
+DEFAULT_PORT = 8090
+
+# Default status code for injected errors
+DEFAULT_ERROR_STATUS = 503
+
+# Response headers that don't apply once the body has been decoded
+SKIP_HEADERS = ("content-encoding", "content-length", "transfer-encoding",
+                "connection")
+
+
+class StandinSession(object):
+    """Stands in for a requests Session, sending every request to the
+       stand-in server with the original URL in the path.
+    """
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, self.url + "/" + url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    # Keep connections open as the real servers would
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.upstream("GET")
+
+    def do_POST(self):
+        self.upstream("POST")
+
+    def upstream(self, method):
+        settings = self.server.settings
+        url = self.path.lstrip("/")
+
+        if not url.startswith(("http://", "https://")):
+            self.send_error(404, "Not a stand-in URL")
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+
+        headers = {}
+        if self.headers.get("Content-Type"):
+            headers["Content-Type"] = self.headers["Content-Type"]
+
+        if not settings.record:
+            settings.delay()
+
+            if random.random() < settings.errorrate:
+                self.send_error(settings.errorstatus, "Injected error")
+                return
+
+        try:
+            r = settings.fixtures.request(method, url, data=body,
+                                          headers=headers)
+        except requests.RequestException, e:
+            self.send_error(502, repr(e))
+            return
+
+        self.send_response(r.status_code)
+        for header, value in r.headers.items():
+            if header.lower() not in SKIP_HEADERS:
+                self.send_header(header, value)
+        self.send_header("Content-Length", str(len(r.content)))
+        self.end_headers()
+        self.wfile.write(r.content)
+
+    def log_message(self, format, *args):
+        Logger.debug("Standin: " + format % args)
+
+
+class StandinServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, settings, host, port):
+        HTTPServer.__init__(self, (host, port), StandinHandler)
+        self.settings = settings
+
+
+class Standin(object):
+    def __init__(self):
+        self.enabled = False
+        self.url = None
+        self.port = DEFAULT_PORT
+        self.record = False
+        self.folder = FixtureFolder
+        self.latency = 0
+        self.jitter = 0
+        self.errorrate = 0
+        self.errorstatus = DEFAULT_ERROR_STATUS
+        self.fixtures = None
+        self.server = None
+
+    def configure(self, enabled=None, url=None, port=None, mode=None,
+                  fixtures=None, latency=None, jitter=None, errorrate=None,
+                  errorstatus=None):
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if url is not None:
+            self.url = url
+        if port is not None:
+            self.port = int(port)
+        if mode is not None:
+            self.record = (mode == "record")
+        if fixtures is not None:
+            self.folder = fixtures
+        if latency is not None:
+            self.latency = max(0, latency)
+        if jitter is not None:
+            self.jitter = max(0, jitter)
+        if errorrate is not None:
+            self.errorrate = min(1, max(0, errorrate))
+        if errorstatus is not None:
+            self.errorstatus = int(errorstatus)
+
+    def delay(self):
+        """Waits for the configured latency (plus or minus the jitter)."""
+        wait = self.latency + random.uniform(-self.jitter, self.jitter)
+        if wait > 0:
+            time.sleep(wait)
+
+    def listen(self, host="localhost"):
+        """Creates the stand-in server."""
+        self.fixtures = FixtureSession(self.folder, record=self.record)
+        self.server = StandinServer(self, host, self.port)
+
+        Logger.info("Standin: {} responses on port {} ({})".format(
+            "Recording" if self.record else "Replaying", self.port,
+            self.folder))
+
+    def start(self):
+        """Starts the stand-in server (unless we've been given the URL of
+           one) and sends all of the screens' requests to it.
+        """
+        if not self.enabled:
+            return
+
+        url = self.url
+        if not url:
+            # Create the server here so it's listening before any screen
+            # makes a request
+            self.listen()
+            thread = Thread(target=self.server.serve_forever, name="Standin")
+            thread.daemon = True
+            thread.start()
+            url = "http://localhost:{}".format(self.port)
+
+        http_client.use_session(StandinSession(url))
+        Logger.info("Standin: Screens will use {}".format(url))
+
+
+# Shared stand-in for the app
+standin = Standin()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in server for the "
+                                                 "screens' data sources.")
+    parser.add_argument("--host", default="",
+                        help="address to listen on (default: all)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--record", action="store_true",
+                        help="record responses from the real servers")
+    parser.add_argument("--fixtures", default=FixtureFolder,
+                        help="folder of recorded responses")
+    parser.add_argument("--latency", type=float, default=0,
+                        help="seconds to wait before each response")
+    parser.add_argument("--jitter", type=float, default=0,
+                        help="random variation (seconds) in the latency")
+    parser.add_argument("--errorrate", type=float, default=0,
+                        help="proportion of requests to fail (0 to 1)")
+    parser.add_argument("--errorstatus", type=int,
+                        default=DEFAULT_ERROR_STATUS,
+                        help="status code for failed requests")
+    args = parser.parse_args()
+
+    standin.configure(port=args.port,
+                      mode="record" if args.record else "replay",
+                      fixtures=args.fixtures,
+                      latency=args.latency,
+                      jitter=args.jitter,
+                      errorrate=args.errorrate,
+                      errorstatus=args.errorstatus)
+    standin.listen(args.host)
+    standin.server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+'''Start up profiler for the Raspberry Pi Information Screen.
+
+   Records how long each plugin spends in each phase of start up (checking
+   dependencies, importing the module, loading the KV file and creating the
+   screen) so that slow screens can be identified.
+
+   The change in memory use is measured around each phase and added up for
+   each plugin, so memory used by another plugin (e.g. while loading all the
+   KV files) isn't counted against it.
+
+   The report is written to the log once the screens have been created and
+   is available from the API at [HOST]/api/startup. Screens built after that
+   (e.g. lazy screens or screens reloaded through the API) aren't recorded.
+'''
+import os
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+from kivy.logger import Logger
+
+try:
+    import resource
+except ImportError:
+    # Not available on all platforms so we just won't report memory usage.
+    resource = None
+
+# Names of the phases, in the order they happen
+PHASES = ["dependencies", "import", "kv", "construct"]
+
+
+def process_rss():
+    """Returns the resident set size of the process (in bytes) or None."""
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+
+    # Not Linux so we'll have to make do with the peak size
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    return None
+
+
+def _cpu_time():
+    """Returns user + system CPU time used by the process."""
+    t = os.times()
+    return t[0] + t[1]
+
+
+class StartupProfiler(object):
+    def __init__(self):
+        self._lock = Lock()
+        self.started = time.time()
+        self.finished = None
+        self.plugins = {}
+
+        # Keep the order in which plugins were first seen
+        self.order = []
+
+    def _plugin(self, plugin):
+        if plugin not in self.plugins:
+            self.plugins[plugin] = {"phases": {},
+                                    "wall": 0.0,
+                                    "cpu": 0.0,
+                                    "rss_delta": None}
+            self.order.append(plugin)
+        return self.plugins[plugin]
+
+    @contextmanager
+    def phase(self, plugin, name):
+        """Context manager to time one phase of a plugin's start up."""
+        # Start up is over so this isn't part of it
+        if self.finished is not None:
+            yield
+            return
+
+        with self._lock:
+            self._plugin(plugin)
+
+        wall = time.time()
+        cpu = _cpu_time()
+        rss = process_rss()
+
+        try:
+            yield
+
+        finally:
+            wall = time.time() - wall
+            cpu = _cpu_time() - cpu
+            end_rss = process_rss()
+
+            with self._lock:
+                p = self._plugin(plugin)
+                ph = p["phases"].setdefault(name, {"wall": 0.0, "cpu": 0.0})
+                ph["wall"] += wall
+                ph["cpu"] += cpu
+                p["wall"] += wall
+                p["cpu"] += cpu
+                if rss is not None and end_rss is not None:
+                    delta = (end_rss - rss) // 1024
+                    ph["rss_delta"] = ph.get("rss_delta", 0) + delta
+                    p["rss_delta"] = (p["rss_delta"] or 0) + delta
+
+    def finish(self):
+        """Marks the end of start up and writes the report to the log."""
+        self.finished = time.time()
+        self.log_report()
+
+    def report(self):
+        """Returns a dictionary of the timings recorded so far."""
+        with self._lock:
+            plugins = {}
+            for name in self.order:
+                p = self.plugins[name]
+                plugins[name] = {"phases": dict((k, dict(v)) for k, v
+                                                in p["phases"].items()),
+                                 "wall": p["wall"],
+                                 "cpu": p["cpu"],
+                                 "rss_delta": p["rss_delta"]}
+
+        total = (self.finished or time.time()) - self.started
+
+        return {"started": self.started,
+                "total": total,
+                "complete": self.finished is not None,
+                "order": list(self.order),
+                "plugins": plugins}
+
+    def log_report(self):
+        report = self.report()
+
+        Logger.info("Startup: Total start up time "
+                    "{:.3f}s".format(report["total"]))
+
+        for name in report["order"]:
+            p = report["plugins"][name]
+            phases = ", ".join("{} {:.3f}s/{:.3f}s".format(ph,
+                                                       p["phases"][ph]["wall"],
+                                                       p["phases"][ph]["cpu"])
+                               for ph in PHASES if ph in p["phases"])
+            rss = ("n/a" if p["rss_delta"] is None
+                   else "{:+d}kB".format(p["rss_delta"]))
+            Logger.info("Startup: {} - wall {:.3f}s, cpu {:.3f}s, "
+                        "RSS {} ({})".format(name, p["wall"], p["cpu"],
+                                                   rss, phases))
+
+
+# Shared profiler used by main.py, InfoScreen and the API
+startup_profiler = StartupProfiler()
@@ -0,0 +1,124 @@
+'''Wall clock ticks for the Raspberry Pi Information Screen.
+
+   Screens that show the time (or something that changes with it) shouldn't
+   each schedule their own Clock.schedule_interval(..., 1). Those intervals
+   drift against the real seconds (so a clock can appear to skip a second)
+   and each one wakes up the main loop at a different moment.
+
+   Instead, screens subscribe to the shared tick bus:
+
+       self.timer = tick_bus.subscribe(self.update, SECOND, owner=self)
+       ...
+       tick_bus.unsubscribe(self.timer)
+
+   The bus wakes up once at each wall clock boundary (e.g. just after each
+   second or each minute) and calls every subscriber whose boundary has been
+   reached. Callbacks are passed the current time (time.time()). Callbacks
+   for screens that aren't currently visible are skipped.
+'''
+import math
+import time
+
+from kivy.clock import Clock
+
+from core.clockprofile import clock_profiler
+
+# Granularities (in seconds)
+SECOND = 1
+MINUTE = 60
+FIVE_MINUTES = 5 * 60
+
+# Wake up slightly after the boundary so that the time has definitely
+# changed by the time the callbacks run.
+TICK_MARGIN = 0.005
+
+
+def _is_visible(widget):
+    """Returns True if the widget is on the display.
+
+       Screens that aren't current are removed from their screen manager, so
+       a hidden screen (or anything inside it) has no root window.
+    """
+    return widget.get_root_window() is not None
+
+
+class TickSubscription(object):
+    def __init__(self, callback, granularity, owner):
+        self.callback = callback
+        self.granularity = granularity
+        self.owner = owner
+
+        # The last boundary we delivered
+        self.last = math.floor(time.time() / granularity)
+
+
+class TickBus(object):
+    def __init__(self):
+        self._subscriptions = []
+        self._event = None
+
+    def subscribe(self, callback, granularity=SECOND, owner=None):
+        """Calls callback(now) at each "granularity" boundary of the wall
+           clock. If owner (usually the screen) is given, the callback is only
+           called while it's visible.
+
+           Returns a subscription to pass to unsubscribe.
+        """
+        sub = TickSubscription(callback, granularity, owner)
+        self._subscriptions.append(sub)
+        self._schedule()
+        return sub
+
+    def unsubscribe(self, sub):
+        """Stops a subscription (does nothing if it's None or has already been
+           stopped).
+        """
+        if sub in self._subscriptions:
+            self._subscriptions.remove(sub)
+
+        if not self._subscriptions and self._event is not None:
+            Clock.unschedule(self._event)
+            self._event = None
+
+    def _schedule(self):
+        """Sets a single wake up for the next boundary that's needed."""
+        if self._event is not None:
+            Clock.unschedule(self._event)
+            self._event = None
+
+        if not self._subscriptions:
+            return
+
+        now = time.time()
+        due = min((math.floor(now / s.granularity) + 1) * s.granularity
+                  for s in self._subscriptions)
+
+        self._event = Clock.schedule_once(self._tick,
+                                          due - now + TICK_MARGIN)
+
+    def _tick(self, *args):
+        self._event = None
+        now = time.time()
+
+        try:
+            # Copy the list as callbacks may unsubscribe
+            for sub in self._subscriptions[:]:
+                if sub not in self._subscriptions:
+                    continue
+
+                boundary = math.floor(now / sub.granularity)
+                if boundary == sub.last:
+                    continue
+                sub.last = boundary
+
+                if sub.owner is not None and not _is_visible(sub.owner):
+                    continue
+
+                clock_profiler.call(sub.callback, now)
+
+        finally:
+            self._schedule()
+
+
+# Shared tick bus used by all screens
+tick_bus = TickBus()
@@ -0,0 +1,170 @@
+'''Tracing for the Raspberry Pi Information Screen.
+
+   Records how long each step of a screen refresh takes (e.g. the network
+   request, parsing the page and rebuilding the widgets) as "spans" which
+   can be viewed on a timeline in Chrome's trace viewer (chrome://tracing)
+   or Perfetto.
+
+       with tracer.span("parse", cat="parse", screen="tube"):
+           status = et.XML(raw)
+
+       @tracer.traced(cat="render", screen="weather")
+       def showData(self, days, hours):
+           ...
+
+   Tracing is turned on in the "trace" section of config.json. When it's off
+   spans cost next to nothing. The most recent events are kept in memory and
+   written to the trace file (in Chrome Trace Event JSON format) when the app
+   exits. They are also available from [HOST]/api/trace.
+'''
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+from kivy.logger import Logger
+
+# Where to save the trace when the app exits
+DEFAULT_TRACE_FILE = os.path.join(".", "cache", "trace.json")
+
+# Maximum number of events to keep (oldest are dropped first)
+DEFAULT_MAX_EVENTS = 100000
+
+
+class Span(object):
+    """A timed section of code. Tags can be added while the span is open."""
+    def __init__(self, tracer, name, cat, tags):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.tags = tags
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        end = time.time()
+        if exc_type is not None:
+            self.tags["error"] = repr(exc_value)
+        self.tracer.add(self.name, self.cat, self.start, end, self.tags)
+        return False
+
+
+class NullSpan(object):
+    """Span used when tracing is turned off."""
+    def __init__(self):
+        self.tags = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        # Don't let tags build up
+        self.tags.clear()
+        return False
+
+
+class Tracer(object):
+    def __init__(self):
+        self.enabled = False
+        self.filename = DEFAULT_TRACE_FILE
+        self._events = deque(maxlen=DEFAULT_MAX_EVENTS)
+        self._threads = {}
+        self._null = NullSpan()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def configure(self, enabled=None, filename=None, maxevents=None):
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if filename is not None:
+            self.filename = filename
+        if maxevents is not None:
+            with self._lock:
+                self._events = deque(self._events, maxlen=int(maxevents))
+
+    def span(self, name, cat="app", **tags):
+        """Returns a context manager which records the time spent inside
+           it.
+        """
+        if not self.enabled:
+            return self._null
+        return Span(self, name, cat, tags)
+
+    def traced(self, name=None, cat="app", **tags):
+        """Decorator to record a span each time a function is called."""
+        def decorator(func):
+            spanname = name or func.__name__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with Span(self, spanname, cat, dict(tags)):
+                    return func(*args, **kwargs)
+
+            # Let the profiler find the original function
+            wrapper.__wrapped__ = func
+            return wrapper
+        return decorator
+
+    def add(self, name, cat, start, end, tags):
+        """Records a completed span."""
+        thread = threading.current_thread()
+        event = {"name": name,
+                 "cat": cat,
+                 "ph": "X",
+                 "ts": int(start * 1000000),
+                 "dur": int((end - start) * 1000000),
+                 "pid": self._pid,
+                 "tid": thread.ident,
+                 "args": tags}
+
+        with self._lock:
+            self._events.append(event)
+            self._threads[thread.ident] = thread.name
+
+    def trace(self):
+        """Returns the trace as a Chrome Trace Event dictionary."""
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+
+        # Name the threads so the trace viewer can label them
+        meta = [{"name": "thread_name",
+                 "ph": "M",
+                 "pid": self._pid,
+                 "tid": tid,
+                 "args": {"name": name}} for tid, name in threads.items()]
+
+        return {"traceEvents": meta + events,
+                "displayTimeUnit": "ms"}
+
+    def export(self, filename=None):
+        """Writes the trace to a file."""
+        if not self.enabled:
+            return
+
+        filename = filename or self.filename
+
+        try:
+            folder = os.path.dirname(filename)
+            if folder and not os.path.isdir(folder):
+                os.makedirs(folder)
+
+            with open(filename, "w") as tfile:
+                json.dump(self.trace(), tfile)
+
+            Logger.info("Trace: Saved to {}".format(filename))
+
+        except (IOError, OSError), e:
+            Logger.warning("Trace: Unable to save trace "
+                           "({})".format(repr(e)))
+
+
+# Shared tracer for the app
+tracer = Tracer()
@@ -22,11 +22,53 @@
    [HOST]/api/<screenname>/view
         GET: change to screen
 
+   [HOST]/api/commands/<id>
+        GET: returns the status of a change to a screen. Changes to screens
+        (configure, enable, disable and view) are carried out shortly after
+        the request (see core/commands.py) and the response includes a
+        "command" with the id to check.
+
+   [HOST]/api/commands
+        GET: returns the status of recent changes to screens
+
+   [HOST]/api/startup
+        GET: returns timings for each phase of each screen's start up
+
+   [HOST]/api/fetch
+        GET: returns queue depth and latency of the background fetch service
+
+   [HOST]/api/cache
+        GET: returns hit/miss counts of the HTTP response cache for each source
+
+   [HOST]/api/breakers
+        GET: returns the state of the circuit breaker for each host
+
+   [HOST]/api/idle
+        GET: returns CPU use and frame rate for each screen
+
+   [HOST]/api/profile
+        GET: returns timings of screens' callbacks on the main loop
+
+   [HOST]/metrics
+        GET: returns metrics in Prometheus text format (not wrapped in the
+        usual response format)
+
+   [HOST]/api/trace
+        GET: returns recent refresh timings in Chrome Trace Event format
+        (this is the raw trace, not wrapped in the usual response format)
+
+   The web interface and the screens' web pages should use api_client rather
+   than making HTTP requests to the API e.g.
+
+       from core.webapi import api_client
+       config = api_client.get_config("football")["data"]
+
 
    API Response format:
      successful:
        {"status": "success",
-        "data": [body of response]}
+        "data": [body of response],
+        "command": [status of queued command (if there is one)]}
 
      unsuccessful:
        {"status": "error",
@@ -43,7 +85,16 @@ from kivy.app import App
 
 from bottle import Bottle, template, request, response
 
-from getplugins import getPlugins
+from core.clockprofile import clock_profiler
+from core.commands import command_queue
+from core.configstore import config_store
+from core.fetch import fetch_service
+from core.getplugins import getPlugin, plugin_index
+from core.httpclient import http_client
+from core.idle import idle_manager
+from core.metrics import metrics
+from core.startup import startup_profiler
+from core.tracing import tracer
 
 class InfoScreenAPI(Bottle):
     def __init__(self, infoscreen, folder):
@@ -64,6 +115,36 @@ class InfoScreenAPI(Bottle):
         self.error_handler[404] = self.unknown
 
         # API METHODS
+        self.route("/api/startup",
+                   callback=self.startup,
+                   method="GET")
+        self.route("/api/fetch",
+                   callback=self.fetch_stats,
+                   method="GET")
+        self.route("/api/cache",
+                   callback=self.cache_stats,
+                   method="GET")
+        self.route("/api/breakers",
+                   callback=self.breaker_stats,
+                   method="GET")
+        self.route("/api/idle",
+                   callback=self.idle_stats,
+                   method="GET")
+        self.route("/api/profile",
+                   callback=self.profile,
+                   method="GET")
+        self.route("/metrics",
+                   callback=self.prometheus_metrics,
+                   method="GET")
+        self.route("/api/trace",
+                   callback=self.trace,
+                   method="GET")
+        self.route("/api/commands",
+                   callback=self.commands,
+                   method="GET")
+        self.route("/api/commands/<id:int>",
+                   callback=self.command_status,
+                   method="GET")
         self.route("/api/<screen>/configure",
                    callback=self.get_config,
                    method="GET")
@@ -77,12 +158,18 @@ class InfoScreenAPI(Bottle):
         self.route("/api/<screen>/view",
                    callback=self.view)
 
-    def api_success(self, data):
+    def api_success(self, data, command=None):
         """Base method for response to successful API calls."""
 
-        return {"status": "success",
+        result = {"status": "success",
                   "data": data}
 
+        # Let the caller know how to check on any change we've queued
+        if command is not None:
+            result["command"] = command.status_dict()
+
+        return result
+
     def api_error(self, message):
         """Base method for response to unsuccessful API calls."""
 
@@ -91,28 +178,7 @@ class InfoScreenAPI(Bottle):
 
     def get_config(self, screen):
         """Method to retrieve config file for screen."""
-
-        # Define the path to the config file
-        conffile = os.path.join(self.folder, "screens", screen, "conf.json")
-
-        if os.path.isfile(conffile):
-
-            # Get the config file
-            with open(conffile, "r") as cfg_file:
-
-                # Load the JSON object
-                conf = json.load(cfg_file)
-
-            # Return the "params" section
-            result = self.api_success(conf.get("params", dict()))
-
-        else:
-
-            # Something's gone wrong
-            result = self.api_error("No screen called: {}".format(screen))
-
-        # Provide the response
-        return json.dumps(result)
+        return json.dumps(self.screen_config(screen))
 
     def set_config(self, screen):
 
@@ -126,21 +192,7 @@ class InfoScreenAPI(Bottle):
                                       "Check headers are set correctly.")
 
             else:
-                # Try to save the new config
-                success = self.save_config(screen, js)
-
-                # If successfully saved...
-                if success:
-
-                    # Reload the screen with the new config
-                    self.infoscreen.reload_screen(screen)
-
-                    # Provide success notification
-                    return self.api_success(json.dumps(js))
-
-                else:
-                    # We couldn't save new config
-                    return self.api_error("Unable to save configuration.")
+                return self.configure_screen(screen, js)
 
         except:
             # Something's gone wrong
@@ -154,23 +206,109 @@ class InfoScreenAPI(Bottle):
     def unknown(self, addr):
         return self.default()
 
+    def startup(self):
+        """Method to retrieve the start up profile."""
+        return json.dumps(self.api_success(startup_profiler.report()))
+
+    def fetch_stats(self):
+        """Method to retrieve metrics for the background fetch service."""
+        return json.dumps(self.api_success(fetch_service.stats()))
+
+    def cache_stats(self):
+        """Method to retrieve hit/miss counts for the HTTP response cache."""
+        return json.dumps(self.api_success(http_client.cache.stats()))
+
+    def breaker_stats(self):
+        """Method to retrieve the state of each host's circuit breaker."""
+        return json.dumps(self.api_success(http_client.breakers.status()))
+
+    def idle_stats(self):
+        """Method to retrieve CPU use and frame rate for each screen."""
+        return json.dumps(self.api_success(idle_manager.stats()))
+
+    def profile(self):
+        """Method to retrieve timings of the screens' Clock callbacks."""
+        return json.dumps(self.api_success(clock_profiler.report()))
+
+    def prometheus_metrics(self):
+        """Method to provide metrics for Prometheus."""
+        response.content_type = "text/plain; version=0.0.4; charset=utf-8"
+        return metrics.render()
+
+    def trace(self):
+        """Method to download the trace so it can be opened in a viewer."""
+        response.content_type = "application/json"
+        return json.dumps(tracer.trace())
+
     def view(self, screen):
-        try:
-            self.infoscreen.switch_to(screen)
-            return self.api_success("Changed screen to: {}".format(screen))
-        except:
+        if screen not in self.infoscreen.availablescreens:
             return self.api_error("Could not change screen.")
 
+        # The screen is changed on the main loop
+        command = command_queue.submit("view", screen)
+        return self.api_success("Changed screen to: {}".format(screen),
+                                command)
+
+    def commands(self):
+        """Method to retrieve the status of recent changes to screens."""
+        return json.dumps(self.api_success(command_queue.recent()))
+
+    def command_status(self, id):
+        """Method to check whether a change to a screen has been made."""
+        command = command_queue.get(id)
+        if command is None:
+            result = self.api_error("No command with id: {}".format(id))
+        else:
+            result = self.api_success(command.status_dict())
+        return json.dumps(result)
 
     # Helper Methods ###########################################################
 
+    def screen_config(self, screen):
+        """Returns the response with the "params" section of the screen's
+           config.
+        """
+        # Get the screen's details from the shared plugin index
+        plugin = getPlugin(screen, inactive=True)
+
+        if plugin:
+
+            # Return the "params" section
+            return self.api_success(plugin["params"] or dict())
+
+        else:
+
+            # Something's gone wrong
+            return self.api_error("No screen called: {}".format(screen))
+
+    def configure_screen(self, screen, params):
+        """Saves new params for the screen and reloads it."""
+        try:
+            # Try to save the new config
+            success = self.save_config(screen, params)
+
+            # If successfully saved...
+            if success:
+
+                # Reload the screen with the new config (on the main loop)
+                command = command_queue.submit("reload", screen)
+
+                # Provide success notification
+                return self.api_success(json.dumps(params), command)
+
+            else:
+                # We couldn't save new config
+                return self.api_error("Unable to save configuration.")
+
+        except:
+            # Something's gone wrong
+            return self.api_error("Invalid data received.")
+
     def save_config(self, screen, params):
         try:
             conffile = os.path.join(self.folder, "screens", screen, "conf.json")
-            conf = json.load(open(conffile, "r"))
-            conf["params"] = params
-            with open(conffile, "w") as config:
-                json.dump(conf, config, indent=4)
+            config_store.update(conffile, params=params)
+            plugin_index.invalidate(screen)
             return True
         except:
             return False
@@ -180,11 +318,12 @@ class InfoScreenAPI(Bottle):
             # Update status in config
             self.change_screen_state(screen, True)
 
-            # Make sure the screen is added
-            self.infoscreen.add_screen(screen)
+            # Make sure the screen is added (on the main loop)
+            command = command_queue.submit("enable", screen)
 
             # Success!
-            return self.api_success("{} screen enabled.".format(screen))
+            return self.api_success("{} screen enabled.".format(screen),
+                                    command)
 
         except:
 
@@ -196,11 +335,12 @@ class InfoScreenAPI(Bottle):
             # Update status in config
             self.change_screen_state(screen, False)
 
-            # Make sure the screen is added
-            self.infoscreen.remove_screen(screen)
+            # Make sure the screen is removed (on the main loop)
+            command = command_queue.submit("disable", screen)
 
             # Success!
-            return self.api_success("{} screen disabled.".format(screen))
+            return self.api_success("{} screen disabled.".format(screen),
+                                    command)
         except:
 
             # Something went wrong!
@@ -211,13 +351,56 @@ class InfoScreenAPI(Bottle):
         # Build path to config
         conffile = os.path.join(self.folder, "screens", screen, "conf.json")
 
-        # Load existing config
-        with open(conffile, "r") as f_config:
-            conf = json.load(f_config)
+        # Change status to desired state (the file is saved shortly after)
+        config_store.update(conffile, enabled=enabled)
+
+        # Make sure the plugin index picks up the change
+        plugin_index.invalidate(screen)
+
+
+class APIClient(object):
+    """Calls the API directly rather than over HTTP.
+
+       The web interface and the screens' web pages run in the same process
+       as the API so there's no need for them to make HTTP requests to it.
+       The responses are the same as those sent over HTTP (before they're
+       converted to JSON).
+    """
+    def __init__(self):
+        self.api = None
+
+    def attach(self, api):
+        """Sets the InfoScreenAPI instance to call."""
+        self.api = api
+
+    def _call(self, method, *args):
+        if self.api is None:
+            return {"status": "error",
+                    "message": "The API is not running."}
+        return getattr(self.api, method)(*args)
+
+    def get_config(self, screen):
+        """Returns the "params" section of the screen's config."""
+        return self._call("screen_config", screen)
+
+    def set_config(self, screen, params):
+        """Saves new params for the screen and reloads it."""
+        return self._call("configure_screen", screen, params)
+
+    def enable(self, screen):
+        return self._call("enable_screen", screen)
+
+    def disable(self, screen):
+        return self._call("disable_screen", screen)
+
+    def view(self, screen):
+        return self._call("view", screen)
+
+    def command_status(self, id):
+        """Returns the status of a queued change to a screen (or None)."""
+        command = command_queue.get(id)
+        return command.status_dict() if command is not None else None
 
-        # Change status to desired state
-        conf["enabled"] = enabled
 
-        # Save the updated config
-        with open(conffile, "w") as f_config:
-            json.dump(conf, f_config, indent=4)
+# Shared client for the web interface and the screens' web pages
+api_client = APIClient()
@@ -22,10 +22,10 @@ import imp
 from kivy.app import App
 
 from bottle import Bottle, template, request, TEMPLATE_PATH, redirect
-import requests
 
-from getplugins import getPlugins
-from webapi import InfoScreenAPI
+from core.getplugins import getPlugin, getPlugins, loadPluginModule
+from core.webapi import InfoScreenAPI, api_client
+from core.webserver import serve
 
 HEADER = '''Raspberry Pi Information Screen<br />'''
 
@@ -42,7 +42,7 @@ class InfoScreenWebServer(Bottle):
        The default screen lists all screens installed on the system. From there
        the user is able to customise screens directly.
     """
-    def __init__(self, infoscreen, folder, apiport):
+    def __init__(self, infoscreen, folder):
         super(InfoScreenWebServer, self).__init__()
 
         # We need access to the infoscreen base object in order to manipulate it
@@ -51,9 +51,6 @@ class InfoScreenWebServer(Bottle):
         # Get the folder path so we can build paths to templates etc.
         self.folder = folder
 
-        # Set up the api
-        self.api = "http://localhost:{}/api/".format(apiport)
-
         # Set up templates
         tpls = os.path.join(self.folder, "web", "templates")
         TEMPLATE_PATH.insert(0, tpls)
@@ -76,8 +73,10 @@ class InfoScreenWebServer(Bottle):
     def process_plugins(self):
         # Build a dictionary of screens, their current state and whether or not
         # they provide a custom screen
-        self.screens = {s["name"]: {"web": s["web"], "enabled": s["enabled"]}
-                         for s in getPlugins(True)}
+        self.screens = {s["name"]: {"web": s["web"],
+                                    "enabled": s["enabled"],
+                                    "plugin": s}
+                        for s in getPlugins(True)}
 
     def add_custom_routes(self):
 
@@ -85,13 +84,13 @@ class InfoScreenWebServer(Bottle):
         sc = self.screens
 
         # Get a list of just those screens who have custom web pages
-        addons = [(x, sc[x]["web"]) for x in sc if sc[x]["web"]]
+        addons = [(x, sc[x]["plugin"]) for x in sc if sc[x]["web"]]
 
         # Loop over the list
         for screen, addon in addons:
 
             # Load the module
-            plugin = imp.load_module("web", *addon)
+            plugin = loadPluginModule(addon, "web")
 
             # Loop over the list of web pages...
             for route in plugin.bindings:
@@ -124,16 +123,13 @@ class InfoScreenWebServer(Bottle):
 
             # Call the relevant action
             if action == "view":
-                r = requests.get("{}{}/view".format(self.api,
-                                                    screen))
+                api_client.view(screen)
 
             elif action == "enable":
-                r = requests.get("{}{}/enable".format(self.api,
-                                                      screen))
+                api_client.enable(screen)
 
             elif action == "disable":
-                r = requests.get("{}{}/disable".format(self.api,
-                                                       screen))
+                api_client.disable(screen)
 
             elif action == "configure":
                 redirect("/configure/{}".format(screen))
@@ -151,8 +147,7 @@ class InfoScreenWebServer(Bottle):
 
     def view(self, screen=None):
         """Method to switch screen."""
-        r = requests.get("{}{}/view".format(self.api,
-                                               screen))
+        api_client.view(screen)
 
         return template("all_screens.tpl", screens=self.screens)
 
@@ -160,16 +155,12 @@ class InfoScreenWebServer(Bottle):
 
         if screen in self.screens:
 
-            # Build the path to our config file
-            conffile = os.path.join(self.folder, "screens", screen, "conf.json")
-
-            # Open the file and load the config
-            with open(conffile, "r") as cfg_file:
-                params = json.load(cfg_file)
+            # Get the current config from the plugin index
+            plugin = getPlugin(screen, inactive=True)
 
             # We only want the user to edit the "params" section so just
             # retrieve that part
-            conf = json.dumps(params.get("params", dict()), indent=4)
+            conf = json.dumps(plugin["params"] or dict(), indent=4)
 
             # Build the web page
             return template(SCREEN_CONFIG, screen=screen, conf=conf)
@@ -187,29 +178,24 @@ class InfoScreenWebServer(Bottle):
         else:
             # Let's check if the params have changed
 
-            # Build the path to our config file
-            conffile = os.path.join(self.folder, "screens", screen, "conf.json")
-
-            # Open the file and load the config
-            with open(conffile, "r") as cfg_file:
-                conf = json.load(cfg_file)
+            # Get the current config from the plugin index
+            plugin = getPlugin(screen, inactive=True) or dict()
 
             # Check if the form is the same as the old one
-            if conf.get("params", dict()) != params:
+            if (plugin.get("params") or dict()) != params:
 
                 # If not, we need to update
                 change_params = True
 
             if change_params:
                 # Submit the new params to the API
-                r = requests.post("{}{}/configure".format(self.api,
-                                                          screen), json=params)
+                api_client.set_config(screen, params)
 
             redirect("/")
 
 
-def start_web(appdir, webport, apiport, debug=False):
-    """Starts the webserver on "webport"."""
+def get_running_app():
+    """Waits for the app to start and returns it."""
     infoapp = None
 
     while infoapp is None:
@@ -218,39 +204,37 @@ def start_web(appdir, webport, apiport, debug=False):
             infoapp = None
         sleep(1)
 
-    ws = InfoScreenWebServer(infoapp, appdir, apiport)
+    return infoapp
 
-    ws.run(host="0.0.0.0", port=webport, debug=debug)
+def start_web(appdir, webport, apiport, debug=False, **options):
+    """Starts the API server on "apiport" and the webserver on "webport".
 
-def start_api(appdir, apiport, debug=False):
-    """Starts the API server on "apiport"."""
-    infoapp = None
+       "options" are the settings for the server (see core.webserver).
+    """
+    infoapp = get_running_app()
 
-    while infoapp is None:
-        infoapp = App.get_running_app()
-        if getattr(infoapp, "base", None) is None:
-            infoapp = None
-        sleep(1)
+    # The web interface calls the API directly so we need the API first
+    api = InfoScreenAPI(infoapp, appdir)
+    api_client.attach(api)
 
-    ws = InfoScreenAPI(infoapp, appdir)
+    # The API is still available over HTTP for anything else that wants it
+    t = Thread(target=serve, args=(api, "0.0.0.0", apiport),
+               kwargs=dict(options, name="API"))
+    t.daemon = True
+    t.start()
 
-    ws.run(host="0.0.0.0", port=apiport, debug=debug)
+    ws = InfoScreenWebServer(infoapp, appdir)
 
-def start_web_server(appdir, webport=8088, apiport=8089, debug=False):
-    # Create the webserver in a new thread
-    t = Thread(target=start_web, args=(appdir, webport, apiport, debug))
+    serve(ws, "0.0.0.0", webport, name="Web", debug=debug, **options)
+
+def start_web_server(appdir, webport=8088, apiport=8089, debug=False,
+                     **options):
+    # Create the webserver (and API server) in a new thread
+    t = Thread(target=start_web, args=(appdir, webport, apiport, debug),
+               kwargs=options)
 
     # Daemonise it
     t.daemon = True
 
     # Go!
     t.start()
-
-    # Create the API server in a new thread
-    api = Thread(target=start_api, args=(appdir, apiport))
-
-    # Daemonise it
-    api.daemon = True
-
-    # Go!
-    api.start()
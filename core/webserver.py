@@ -0,0 +1,327 @@
+'''Server backends for the web interface and API.
+
+   Bottle's default server (wsgiref) handles one request at a time so a slow
+   request (or a dashboard polling the API) holds up everyone else. The
+   "threaded" server used here answers requests from a pool of worker
+   threads and keeps connections open between requests. A worker is only
+   busy while it's answering a request: idle connections are handed back to
+   the server, which watches them (along with the listening socket) and
+   queues each one for a worker when its next request arrives. Browsers and
+   dashboards holding connections open can't tie up the workers.
+
+   Responses can be gzipped for clients which accept it and the time taken
+   to answer each request can be logged.
+
+   The settings are in the "webserver" section of config.json:
+
+       "server": "threaded" (default), "wsgiref" or the name of any server
+                 supported by bottle (e.g. "waitress", "cherrypy", "paste")
+       "workers": number of worker threads for the threaded server
+       "keepalive": seconds to keep an idle connection open
+       "gzip": compress responses
+       "log": log each request and how long it took
+'''
+import errno
+import os
+import select
+import time
+from cStringIO import StringIO
+from gzip import GzipFile
+from Queue import Queue
+from threading import Lock, Thread
+from wsgiref.simple_server import (ServerHandler, WSGIRequestHandler,
+                                   WSGIServer)
+
+import bottle
+
+from kivy.logger import Logger
+
+# Default number of worker threads
+DEFAULT_WORKERS = 8
+
+# Default number of seconds to keep an idle connection open
+DEFAULT_KEEPALIVE = 5
+
+# Responses smaller than this (in bytes) aren't worth compressing
+GZIP_MIN_SIZE = 500
+
+# Types of response that are worth compressing
+GZIP_TYPES = ("text/", "application/json", "application/javascript")
+
+
+class KeepAliveServerHandler(ServerHandler):
+    """Runs the app for a single request on a kept-alive connection."""
+    http_version = "1.1"
+    keep_alive = False
+
+    def close(self):
+        # We can only keep the connection open if the client knows where the
+        # response ends.
+        if self.headers is not None:
+            self.keep_alive = ("Content-Length" in self.headers and
+                               self.headers.get("Connection") != "close")
+        ServerHandler.close(self)
+
+
+class KeepAliveHandler(WSGIRequestHandler):
+    """Request handler which keeps HTTP/1.1 connections open."""
+    protocol_version = "HTTP/1.1"
+
+    # The headers and body are written separately so, on a kept-alive
+    # connection, Nagle's algorithm would hold up the end of each response.
+    disable_nagle_algorithm = True
+
+    # Set if the connection should be handed back to the server to wait for
+    # the next request
+    keep_open = False
+
+    def _buffered(self):
+        """Returns True if we've already read part of the next request."""
+        rbuf = getattr(self.rfile, "_rbuf", None)
+        return rbuf is not None and rbuf.tell() > 0
+
+    def handle(self):
+        self.close_connection = 1
+        self.handle_one_request()
+
+        # Carry on if the client has already sent its next request (the
+        # server can't see data that we've buffered).
+        while not self.close_connection and self._buffered():
+            self.handle_one_request()
+
+        self.keep_open = not self.close_connection
+
+    def handle_one_request(self):
+        try:
+            self.raw_requestline = self.rfile.readline(65537)
+        except IOError:
+            # The connection timed out (or was closed)
+            self.close_connection = 1
+            return
+
+        if not self.raw_requestline:
+            self.close_connection = 1
+            return
+
+        if not self.parse_request():
+            return
+
+        handler = KeepAliveServerHandler(self.rfile, self.wfile,
+                                         self.get_stderr(),
+                                         self.get_environ())
+        handler.request_handler = self
+        handler.run(self.server.get_app())
+
+        if not handler.keep_alive:
+            self.close_connection = 1
+
+    def log_message(self, format, *args):
+        Logger.debug("Web: " + format % args)
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGI server which answers requests from a pool of threads.
+
+       Kept-alive connections are only given to a worker when there's a
+       request to read. In between, they wait in self.idle and are closed
+       if they're idle for more than "keepalive" seconds.
+    """
+    def __init__(self, address, handler, workers=DEFAULT_WORKERS,
+                 keepalive=DEFAULT_KEEPALIVE):
+        WSGIServer.__init__(self, address, handler)
+        self.requests = Queue()
+        self.keepalive = keepalive
+
+        # Idle connection -> (client address, time it became idle)
+        self.idle = {}
+        self._idle_lock = Lock()
+
+        # Wakes up the server when a connection is handed back
+        self._wake_r, self._wake_w = os.pipe()
+
+        for i in range(max(1, workers)):
+            worker = Thread(target=self.worker,
+                            name="WebWorker-{}".format(i))
+            worker.daemon = True
+            worker.start()
+
+    def process_request(self, request, client_address):
+        self.requests.put((request, client_address))
+
+    def finish_request(self, request, client_address):
+        """Answers the request and returns True if the connection should be
+           kept open.
+        """
+        handler = self.RequestHandlerClass(request, client_address, self)
+        return handler.keep_open
+
+    def park(self, request, client_address):
+        """Hands an idle connection back to wait for its next request."""
+        with self._idle_lock:
+            self.idle[request] = (client_address, time.time())
+        os.write(self._wake_w, "x")
+
+    def worker(self):
+        while True:
+            request, client_address = self.requests.get()
+            keep = False
+            try:
+                keep = self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+
+            if keep:
+                self.park(request, client_address)
+            else:
+                self.shutdown_request(request)
+
+    def serve_forever(self, poll_interval=0.5):
+        """Accepts new connections and queues idle connections for a worker
+           when they've got a request.
+        """
+        timeout = min(poll_interval, self.keepalive)
+
+        while True:
+            with self._idle_lock:
+                idle = list(self.idle)
+
+            try:
+                readable, _, _ = select.select([self, self._wake_r] + idle,
+                                               [], [], timeout)
+            except select.error, e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+
+            for r in readable:
+                if r is self:
+                    self._handle_request_noblock()
+
+                elif r == self._wake_r:
+                    os.read(self._wake_r, 4096)
+
+                else:
+                    with self._idle_lock:
+                        client_address, _ = self.idle.pop(r)
+                    self.requests.put((r, client_address))
+
+            self.close_idle()
+
+    def close_idle(self):
+        """Closes connections that have been idle for too long."""
+        expired = time.time() - self.keepalive
+        with self._idle_lock:
+            old = [r for r, (_, since) in self.idle.items() if since < expired]
+            for r in old:
+                del self.idle[r]
+
+        for r in old:
+            self.shutdown_request(r)
+
+
+class ThreadedServer(bottle.ServerAdapter):
+    """Bottle adapter for the PooledWSGIServer."""
+    def run(self, app):
+        workers = self.options.get("workers", DEFAULT_WORKERS)
+        keepalive = self.options.get("keepalive", DEFAULT_KEEPALIVE)
+
+        # Longest wait for the rest of a request once it's started
+        class Handler(KeepAliveHandler):
+            timeout = keepalive
+
+        server = PooledWSGIServer((self.host, self.port), Handler, workers,
+                                  keepalive)
+        server.set_app(app)
+        server.serve_forever()
+
+
+class GzipMiddleware(object):
+    """Compresses responses for clients that accept gzip."""
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        if "gzip" not in environ.get("HTTP_ACCEPT_ENCODING", ""):
+            return self.app(environ, start_response)
+
+        # Hold on to the response until we know whether to compress it
+        started = []
+
+        def _start_response(status, headers, exc_info=None):
+            started[:] = [status, headers, exc_info]
+            return lambda data: None
+
+        result = self.app(environ, _start_response)
+        try:
+            body = "".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+        status, headers, exc_info = started
+        names = dict((k.lower(), v) for k, v in headers)
+        ctype = names.get("content-type", "")
+
+        if (len(body) >= GZIP_MIN_SIZE and
+                "content-encoding" not in names and
+                ctype.startswith(GZIP_TYPES)):
+            buf = StringIO()
+            with GzipFile(fileobj=buf, mode="wb") as gz:
+                gz.write(body)
+            body = buf.getvalue()
+            headers = [(k, v) for k, v in headers
+                       if k.lower() != "content-length"]
+            headers += [("Content-Encoding", "gzip"),
+                        ("Content-Length", str(len(body))),
+                        ("Vary", "Accept-Encoding")]
+
+        start_response(status, headers, exc_info)
+        return [body]
+
+
+class TimingMiddleware(object):
+    """Logs each request and how long it took to answer."""
+    def __init__(self, app, name):
+        self.app = app
+        self.name = name
+
+    def __call__(self, environ, start_response):
+        start = time.time()
+        status = []
+
+        def _start_response(st, headers, exc_info=None):
+            status.append(st)
+            return start_response(st, headers, exc_info)
+
+        result = self.app(environ, _start_response)
+
+        Logger.info("{}: {} {} {} ({:.1f}ms)".format(
+            self.name,
+            environ.get("REQUEST_METHOD"),
+            environ.get("PATH_INFO"),
+            status[0].split()[0] if status else "-",
+            (time.time() - start) * 1000))
+
+        return result
+
+
+def serve(app, host, port, name="Web", server="threaded",
+          workers=DEFAULT_WORKERS, keepalive=DEFAULT_KEEPALIVE, gzip=True,
+          log=False, debug=False):
+    """Runs a bottle app with the given server settings (doesn't return)."""
+    wsgi = app
+    if gzip:
+        wsgi = GzipMiddleware(wsgi)
+    if log:
+        wsgi = TimingMiddleware(wsgi, name)
+
+    options = {}
+    if server in (None, "threaded"):
+        server = ThreadedServer
+        options = {"workers": workers, "keepalive": keepalive}
+
+    Logger.info("{}: Starting {} server on port {}".format(
+        name, getattr(server, "__name__", server), port))
+
+    bottle.run(app=wsgi, server=server, host=host, port=port, debug=debug,
+               **options)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+'''Load test for the web interface and API servers.
+
+   Sends requests to a URL from a number of clients at once and reports the
+   number of requests per second and the response times e.g.
+
+       python loadtest.py http://localhost:8089/api/fetch -c 20 -d 10
+
+   To compare server backends, run it once with "server" set to "wsgiref"
+   in the "webserver" section of config.json and once with "threaded".
+'''
+import argparse
+import httplib
+import json
+import threading
+import time
+from urlparse import urlparse
+
+# Default number of clients making requests at the same time
+DEFAULT_CONCURRENCY = 10
+
+# Default length of the test (in seconds)
+DEFAULT_DURATION = 10
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    index = int(round(pct / 100.0 * (len(values) - 1)))
+    return values[index]
+
+
+class Client(threading.Thread):
+    """Makes requests one after another until the end time."""
+    def __init__(self, url, until, keepalive, gzip):
+        super(Client, self).__init__()
+        self.daemon = True
+        self.url = urlparse(url)
+        self.until = until
+        self.keepalive = keepalive
+        self.headers = {"Accept-Encoding": "gzip"} if gzip else {}
+        if not keepalive:
+            self.headers["Connection"] = "close"
+        self.times = []
+        self.errors = 0
+        self.bytes = 0
+
+    def connect(self):
+        return httplib.HTTPConnection(self.url.hostname, self.url.port or 80,
+                                      timeout=30)
+
+    def run(self):
+        path = self.url.path or "/"
+        if self.url.query:
+            path += "?" + self.url.query
+
+        conn = None
+        while time.time() < self.until:
+            start = time.time()
+            try:
+                if conn is None:
+                    conn = self.connect()
+                conn.request("GET", path, headers=self.headers)
+                r = conn.getresponse()
+                self.bytes += len(r.read())
+                if r.status >= 400:
+                    self.errors += 1
+                if not self.keepalive or r.getheader("connection") == "close":
+                    conn.close()
+                    conn = None
+            except Exception:
+                self.errors += 1
+                if conn is not None:
+                    conn.close()
+                conn = None
+                continue
+
+            self.times.append(time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the web "
+                                                 "interface or API.")
+    parser.add_argument("url", nargs="?",
+                        default="http://localhost:8089/api/fetch")
+    parser.add_argument("-c", "--concurrency", type=int,
+                        default=DEFAULT_CONCURRENCY,
+                        help="number of clients")
+    parser.add_argument("-d", "--duration", type=float,
+                        default=DEFAULT_DURATION,
+                        help="length of the test (seconds)")
+    parser.add_argument("--no-keepalive", action="store_true",
+                        help="open a new connection for each request")
+    parser.add_argument("--gzip", action="store_true",
+                        help="accept gzipped responses")
+    parser.add_argument("--json", action="store_true",
+                        help="print the results as JSON")
+    args = parser.parse_args()
+
+    until = time.time() + args.duration
+    clients = [Client(args.url, until, not args.no_keepalive, args.gzip)
+               for _ in range(args.concurrency)]
+
+    start = time.time()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.time() - start
+
+    times = sorted(t for client in clients for t in client.times)
+    results = {"url": args.url,
+               "concurrency": args.concurrency,
+               "duration": elapsed,
+               "requests": len(times),
+               "errors": sum(client.errors for client in clients),
+               "bytes": sum(client.bytes for client in clients),
+               "requests_per_second": len(times) / elapsed,
+               "p50_ms": _percentile(times, 50) * 1000,
+               "p95_ms": _percentile(times, 95) * 1000,
+               "p99_ms": _percentile(times, 99) * 1000,
+               "max_ms": (times[-1] if times else 0) * 1000}
+
+    if args.json:
+        print json.dumps(results, indent=4, sort_keys=True)
+    else:
+        print ("{requests} requests ({errors} errors) in {duration:.1f}s: "
+               "{requests_per_second:.1f} requests/s\n"
+               "Response times: p50 {p50_ms:.1f}ms, p95 {p95_ms:.1f}ms, "
+               "p99 {p99_ms:.1f}ms, max {max_ms:.1f}ms".format(**results))
+
+if __name__ == "__main__":
+    main()
@@ -19,7 +19,17 @@ from kivy.uix.scrollview import ScrollView
 from core.bglabel import BGLabel, BGLabelButton
 from core.getplugins import getPlugins
 from core.hiddenbutton import HiddenButton
+from core.clockprofile import clock_profiler
+from core.configstore import config_store
+from core.datacache import data_cache
+from core.fetch import fetch_service
+from core.httpclient import http_client
+from core.idle import idle_manager
 from core.infoscreen import InfoScreen
+from core.kvcache import kv_cache
+from core.standin import standin
+from core.startup import startup_profiler
+from core.tracing import tracer
 
 # Set the current working directory
 os.chdir(os.path.dirname(os.path.abspath(sys.argv[0])))
@@ -33,14 +43,80 @@ class InfoScreenApp(App):
         # Window size is hardcoded for resolution of official Raspberry Pi
         # display. Can be altered but plugins may not display correctly.
         Window.size = (800, 480)
-        self.base = InfoScreen(plugins=plugins)
+        self.base = InfoScreen(plugins=plugins,
+                               lazy=config.get("lazyscreens", False),
+                               prefetch=config.get("prefetch", dict()))
         return self.base
 
+    def on_stop(self):
+        # Save the callback timings (if we've been recording them)
+        clock_profiler.dump()
+
+        # Save the trace of the screens' refreshes
+        tracer.export()
+
+        # Save any changes to the screens' config that are still waiting
+        config_store.flush()
+
 if __name__ == "__main__":
     # Load our config
     with open("config.json", "r") as cfg_file:
         config = json.load(cfg_file)
 
+    # Set up how changes to the screens' config are saved
+    store = config.get("configstore", dict())
+    config_store.configure(delay=store.get("delay"),
+                           maxdelay=store.get("maxdelay"))
+
+    # Set up the background worker threads for screens' network requests
+    fetch = config.get("fetch", dict())
+    fetch_service.set_workers(fetch.get("workers", 4))
+
+    # Set up the connection pool shared by the screens
+    http = config.get("http", dict())
+    http_client.configure(poolsize=http.get("poolsize"),
+                          timeout=http.get("timeout"),
+                          failures=http.get("failures"),
+                          backoff=http.get("backoff"),
+                          maxbackoff=http.get("maxbackoff"))
+
+    # Send the screens' requests to the local stand-in server if we're
+    # testing without the real servers
+    stand = config.get("standin", dict())
+    standin.configure(enabled=stand.get("enabled"),
+                      url=stand.get("url"),
+                      port=stand.get("port"),
+                      mode=stand.get("mode"),
+                      fixtures=stand.get("fixtures"),
+                      latency=stand.get("latency"),
+                      jitter=stand.get("jitter"),
+                      errorrate=stand.get("errorrate"),
+                      errorstatus=stand.get("errorstatus"))
+    standin.start()
+
+    # Set the size limit for data saved by the screens
+    datacache = config.get("datacache", dict())
+    data_cache.configure(maxsize=datacache.get("maxsize"))
+
+    # Set up the frame rate to use when the display isn't changing
+    idle = config.get("idle", dict())
+    idle_manager.configure(enabled=idle.get("enabled"),
+                           fps=idle.get("fps"),
+                           timeout=idle.get("timeout"))
+
+    # Time the screens' callbacks if we've been asked to
+    profile = config.get("profile", dict())
+    clock_profiler.configure(enabled=profile.get("enabled"),
+                             threshold=profile.get("threshold"),
+                             filename=profile.get("file"))
+    clock_profiler.install()
+
+    # Record a timeline of the screens' refreshes if we've been asked to
+    trace = config.get("trace", dict())
+    tracer.configure(enabled=trace.get("enabled"),
+                     filename=trace.get("file"),
+                     maxevents=trace.get("maxevents"))
+
     # Get a list of installed plugins
     plugins = getPlugins()
 
@@ -49,14 +125,16 @@ if __name__ == "__main__":
 
     # Load the master KV file
     # Builder.load_string(kv_text)
-    Builder.load_file("base.kv")
+    with startup_profiler.phase("base", "kv"):
+        kv_cache.load_file("base.kv")
 
     # Loop over the plugins
     for p in plugins:
 
         # and add their custom KV files to create one master KV file
         # kv_text += "".join(p["kv"])
-        Builder.load_file(p["kvpath"])
+        with startup_profiler.phase(p["name"], "kv"):
+            kv_cache.load_file(p["kvpath"])
 
     # Do we want a webserver?
     web = config.get("webserver", dict())
@@ -82,7 +160,12 @@ if __name__ == "__main__":
         start_web_server(os.path.dirname(os.path.abspath(__file__)),
                          webport,
                          apiport,
-                         debug)
+                         debug,
+                         server=web.get("server", "threaded"),
+                         workers=web.get("workers", 8),
+                         keepalive=web.get("keepalive", 5),
+                         gzip=web.get("gzip", True),
+                         log=web.get("log", False))
 
     # Good to go. Let's start the app.
     InfoScreenApp().run()
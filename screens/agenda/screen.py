@@ -7,6 +7,7 @@ from datetime import timedelta, datetime
 from datetime import time as dt_time
 from itertools import groupby
 
+from kivy.clock import Clock
 from kivy.properties import (StringProperty,
                              ListProperty,
                              ObjectProperty)
@@ -16,6 +17,8 @@ from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.screenmanager import Screen
 
+from core.reconcile import reconcile
+
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from apiclient import discovery
@@ -35,9 +38,11 @@ class CalendarHeader(GridLayout):
 
     def __init__(self, **kwargs):
         super(CalendarHeader, self).__init__(**kwargs)
+        self.setDate(kwargs["dt"])
 
+    def setDate(self, dt):
         # Format the date e.g. "Sunday 31 November 2015"
-        self.header = kwargs["dt"].strftime("%A %d %B %Y")
+        self.header = dt.strftime("%A %d %B %Y")
 
 
 class CalendarItem(GridLayout):
@@ -257,9 +262,6 @@ class AgendaScreen(Screen):
         """Method to draw the Calendar on the screen."""
         all_events = []
 
-        # Clear the screen to prevent duplication
-        self.calendar_grid.clear_widgets()
-
         time_now = datetime.utcnow()
         end_time = time_now + timedelta(self.max_days)
 
@@ -296,6 +298,10 @@ class AgendaScreen(Screen):
         # Sort and group the events
         ordered_events = self.orderEvents(all_events)
 
+        # List of the rows to show: a header for each day followed by
+        # that day's events
+        rows = []
+
         # Loop over the grops
         for day in ordered_events:
 
@@ -304,15 +310,34 @@ class AgendaScreen(Screen):
             if ((day[0] < time_now.date()) or (day[0] > end_time.date())):
                 continue
 
-            # Create a header and display it
-            hdr = CalendarHeader(dt=day[0])
-            self.calendar_grid.add_widget(hdr)
+            # Add a header
+            rows.append(("header", day[0]))
 
-            # Loop over that day's events
+            # Add that day's events
             for event in day[1]:
-
-                # Create an agenda item
-                ev = CalendarItem(event=event)
-
-                # and display it
-                self.calendar_grid.add_widget(ev)
+                rows.append(("event", event))
+
+        # Update the display, only creating widgets for new rows
+        reconcile(self.calendar_grid, rows,
+                  key=self.rowKey,
+                  create=self.createRow,
+                  update=self.updateRow)
+
+    def rowKey(self, row):
+        kind, item = row
+        if kind == "header":
+            return (kind, item)
+        return (kind, item["start"], item["summary"])
+
+    def createRow(self, row):
+        kind, item = row
+        if kind == "header":
+            return CalendarHeader(dt=item)
+        return CalendarItem(event=item)
+
+    def updateRow(self, widget, row):
+        kind, item = row
+        if kind == "header":
+            widget.setDate(item)
+        else:
+            widget.formatEvent(item)
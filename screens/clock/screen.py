@@ -1,9 +1,10 @@
 from datetime import datetime
 
 from kivy.properties import DictProperty
-from kivy.clock import Clock
 from kivy.uix.screenmanager import Screen
 
+from core.ticks import tick_bus, SECOND
+
 
 class ClockScreen(Screen):
     """Simple plugin screen to show digital clock of current time."""
@@ -27,11 +28,11 @@ class ClockScreen(Screen):
 
     def on_enter(self):
         # We only need to update the clock every second.
-        self.timer = Clock.schedule_interval(self.update, 1)
+        self.timer = tick_bus.subscribe(self.update, SECOND, owner=self)
 
     def on_pre_enter(self):
         self.get_time()
 
     def on_pre_leave(self):
         # Save resource by unscheduling the updates.
-        Clock.unschedule(self.timer)
+        tick_bus.unsubscribe(self.timer)
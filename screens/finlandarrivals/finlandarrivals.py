@@ -3,8 +3,9 @@ from the digitransit.fi  website and turn it into a structure that can then
 be used by other python codes.
 """
 
-# Simple way of submitting web requests (easier to use than urllib2)
-import requests
+# Shared (pooled) client for submitting web requests
+from core.httpclient import http_client
+from core.tracing import tracer
 
 # We need json to turn the JSON response into a python dict/list
 import json
@@ -41,13 +42,14 @@ data = \
 
 def __getBusData(stopcode):
     # Add the stop code to the web address and get the page
-    r = requests.post(BASE_URL, data=data%stopcode, headers={"Content-type": "application/graphql"})
+    r = http_client.post(BASE_URL, data=data%stopcode, headers={"Content-type": "application/graphql"})
 
     # If the request was ok
     if r.status_code == 200:
 
             # try and load the response into JSON
-            j = json.loads(r.content)
+            with tracer.span("json", cat="parse", screen="finlandarrivals"):
+                j = json.loads(r.content)
             return j['data']['stop']['stoptimesWithoutPatterns']
 
     else:
@@ -8,10 +8,13 @@ from kivy.uix.label import Label
 from kivy.uix.togglebutton import ToggleButton
 from kivy.uix.screenmanager import Screen
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.stacklayout import StackLayout
-from kivy.uix.scrollview import ScrollView
 from kivy.properties import StringProperty, DictProperty
 
+from core.fetch import fetch_service
+from core.reconcile import reconcile
+from core.ticks import tick_bus, SECOND
+from core.tracing import tracer
+
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import finlandarrivals as HB
@@ -39,7 +42,9 @@ class FinlandArrivals(BoxLayout):
 
     def __init__(self, **kwargs):
         super(FinlandArrivals, self).__init__(**kwargs)
-        bus = kwargs["bus"]
+        self.update(kwargs["bus"])
+
+    def update(self, bus):
         self.bus_route = bus["route"]
         self.bus_type = bus["type"]
         self.bus_destination = bus["destination"]
@@ -70,6 +75,7 @@ class FinlandArrivalsStop(Screen):
         self.filters = None
         self.get_time()
         self.stimer = None
+        self.job = None
 
     def on_pre_enter(self):
         self.get_time()
@@ -81,12 +87,12 @@ class FinlandArrivalsStop(Screen):
         # and schedule updates every 30 seconds.
         self.timer = Clock.schedule_interval(self.get_buses, 3)
         # We only need to update the clock every second.
-        self.stimer = Clock.schedule_interval(self.update, 1)
+        self.stimer = tick_bus.subscribe(self.update, SECOND, owner=self)
 
 
     def on_pre_leave(self):
         # Save resource by unscheduling the updates.
-        Clock.unschedule(self.stimer)
+        tick_bus.unsubscribe(self.stimer)
 
     def on_leave(self):
         # Save resource by removing schedule
@@ -94,13 +100,26 @@ class FinlandArrivalsStop(Screen):
 
     def get_buses(self, *args):
         """Starts the process of retrieving countdown information."""
-        try:
-            # Load the bus data.
-            self.buses = HB.BusLookup(self.stop["stopid"])
-        except:
-            # If there's an error (e.g. no internet connection) then we have
-            # no bus data.
-            self.buses = None
+        # Don't queue up another request if the last one hasn't finished.
+        if self.job and self.job.pending:
+            return
+
+        # Load the bus data in the background.
+        self.job = fetch_service.submit(HB.BusLookup,
+                                        args=(self.stop["stopid"],),
+                                        callback=self.show_buses,
+                                        errback=self.fetch_failed,
+                                        owner=self)
+
+    def fetch_failed(self, error):
+        # If there's an error (e.g. no internet connection) then we have
+        # no bus data.
+        self.show_buses(None)
+
+    @tracer.traced(cat="render", screen="finlandarrivals")
+    def show_buses(self, buses):
+        """Updates the screen with the countdown information."""
+        self.buses = buses
 
         if self.buses:
             # We've got bus data so let's update the screen.
@@ -142,29 +161,23 @@ class FinlandArrivalsStop(Screen):
 
     def draw_buses(self):
         """Adds the buses to the main screen."""
-        # Clear the screen of any buses.
-        self.ids.bx_buses.clear_widgets()
-
         # Get a list of just those buses who are included in the filter.
         buses = [b for b in self.buses if b["route"] in self.filters]
 
+        # Update the list of buses, only creating rows for new buses
+        reconcile(self.ids.bus_list, buses,
+                  key=lambda bus: (bus["route"], bus["destination"]),
+                  create=lambda bus: FinlandArrivals(bus=bus),
+                  update=lambda row, bus: row.update(bus))
+
         # Work out the height needed to display all the buses
         # (we need this for the StackLayout)
-        h = (len(buses) * 30)
-
-        # Create a StackLayout and ScrollView
-        sl = StackLayout(orientation="tb-lr", height=h, size_hint=(1, None))
-        sv = ScrollView(size_hint=(1, 1))
-        sv.add_widget(sl)
-        self.ids.bx_buses.add_widget(sv)
+        self.ids.bus_list.height = len(buses) * 30
 
-        # Loop over the buses, create a FinlandArrivals object and add it to the
-        # StackLayout
+        # Show any service alerts
         for bus in buses:
-            bs = FinlandArrivals(bus=bus)
-            if "alert" in(bus):
+            if "alert" in bus:
                 self.alert = bus["alert"]
-            sl.add_widget(bs)
 
     def toggled(self, instance, value):
         """Updates self.filters to include only those bus routes whose
@@ -16,7 +16,7 @@
 
 import urllib2
 import string
-from BeautifulSoup import BeautifulSoup
+from BeautifulSoup import BeautifulSoup as _BeautifulSoup
 import re
 from datetime import datetime, time
 import json
@@ -24,8 +24,22 @@ import codecs
 import requests
 import socket
 
+from core.httpclient import http_client
+from core.tracing import tracer
+
+
+@tracer.traced(cat="parse", screen="football")
+def BeautifulSoup(*args, **kwargs):
+    """Parses a page (recording how long it takes)."""
+    return _BeautifulSoup(*args, **kwargs)
+
+
 __version__ = "0.3.0"
 
+# Several screens can ask for the same page at the same time so keep pages for
+# a few seconds.
+FOOTBALL_TTL = 10
+
 
 class matchcommon(object):
     '''class for common functions for match classes.'''
@@ -51,7 +65,8 @@ class matchcommon(object):
         #     # Fixed this line to handle accented team namess
         #     return codecs.decode(page, "utf-8") if page else None
         try:
-            r = requests.get(url, timeout=2)
+            r = http_client.get(url, timeout=2, source="football",
+                                ttl=FOOTBALL_TTL)
         # requests timeout doesn'r catch socket.timeout so we need to catch
         # both explicitly
         except (socket.timeout, requests.Timeout, requests.ConnectionError):
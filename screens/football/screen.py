@@ -1,6 +1,7 @@
 import os
 import sys
 import time
+from copy import deepcopy
 from kivy.uix.widget import Widget
 from kivy.properties import (ObjectProperty,
                              DictProperty,
@@ -27,6 +28,8 @@ from kivy.uix.behaviors import ButtonBehavior
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from footballresources.footballscores import FootballMatch, League
 from core.bglabel import BGLabel
+from core.fetch import fetch_service
+from core.tracing import tracer
 
 EVT_GOAL = 0
 EVT_KICK_OFF = 1
@@ -44,6 +47,9 @@ EVT_LOOKUP = {EVT_GOAL: {"text": "GOAL!", "size": 200},
 OBJ_MATCH = 0
 OBJ_LEAGUE = 1
 
+# Seconds to wait before trying again if we couldn't get the data
+RETRY_DELAY = 60
+
 MATCH_COLOURS = {"L": [0.1, 0.1, 0.5, 1],
                  "HT": [0.1, 0.3, 0.3, 1],
                  "FT": [0.5, 0.1, 0.1, 1],
@@ -53,6 +59,18 @@ MATCH_COLOURS = {"L": [0.1, 0.1, 0.5, 1],
 # Football Matches ###########################################################
 
 
+def updatedMatch(matchobject):
+    """Returns an updated copy of the match object.
+
+       The original is still being shown on the main thread so we mustn't
+       change it. The copy keeps the old score so goals and changes of
+       status are still spotted.
+    """
+    match = deepcopy(matchobject)
+    match.Update()
+    return match
+
+
 class FootballEvent(BGLabel):
     """Simple class to show a label displaying a notification."""
     event_text = StringProperty("")
@@ -83,12 +101,17 @@ class FootballBase(Screen):
         self.no_match = None
         self.scr_match = None
         self.timer = None
+        self.job = None
+        self.active = False
         self.nextupdate = 0
 
     def on_enter(self):
         """Calculates when next update is due and sets schedule."""
+        self.active = True
+
         if not self.running:
             Clock.schedule_once(self.getMatchObject, 0.5)
+            return
 
         tm = time.time()
 
@@ -100,15 +123,52 @@ class FootballBase(Screen):
         self.timer = Clock.schedule_once(self.update, dt)
 
     def on_leave(self):
+        self.active = False
         Clock.unschedule(self.timer)
 
+    def prefetch(self):
+        """Refreshes the data before the screen is shown (if it's due)."""
+        if self.active or time.time() < self.nextupdate:
+            return
+
+        if self.running:
+            self.update()
+        else:
+            self.getMatchObject()
+
     def getMatchObject(self, *args):
-        """Initialise the FootballMatch object (can take time)."""
-        if not self.running:
-            self.matchobject = FootballMatch(self.team, detailed=True)
-            self.running = True
+        """Initialise the FootballMatch object (can take time so we do it in
+           the background).
+        """
+        if not self.running and not (self.job and self.job.pending):
+            self.job = fetch_service.submit(FootballMatch,
+                                            args=(self.team,),
+                                            kwargs={"detailed": True},
+                                            callback=self.gotMatchObject,
+                                            errback=self.fetchFailed,
+                                            owner=self)
+
+    def gotMatchObject(self, matchobject):
+        """Shows the new match object and schedules the next update."""
+        self.matchobject = matchobject
+        self.running = True
         self.checkscreen()
+        self.scheduleUpdate()
+
+    def scheduleUpdate(self):
+        if self.matchobject:
+            dt = 30
+        else:
+            dt = 60 * 60
 
+        self.nextupdate = time.time() + dt
+
+        # If we were refreshed before being shown, on_enter will schedule the
+        # next update.
+        if self.active:
+            self.timer = Clock.schedule_once(self.update, dt)
+
+    @tracer.traced(cat="render", screen="football")
     def checkscreen(self):
         """Updates the screen depending on wether or not there is a match
            happening today.
@@ -163,10 +223,28 @@ class FootballBase(Screen):
         self.ids.base_float.remove_widget(widget)
 
     def update(self, *args):
-        """Updates the matchobject and then triggers additional events
-           depending on the match status.
+        """Updates the matchobject (in the background) and then triggers
+           additional events depending on the match status.
         """
-        self.matchobject.Update()
+        if self.job and self.job.pending:
+            return
+
+        self.job = fetch_service.submit(updatedMatch,
+                                        args=(self.matchobject,),
+                                        callback=self.updated,
+                                        errback=self.fetchFailed,
+                                        owner=self)
+
+    def fetchFailed(self, error):
+        """Tries again later if we couldn't get the match details."""
+        self.nextupdate = time.time() + RETRY_DELAY
+
+        if self.active:
+            retry = self.update if self.running else self.getMatchObject
+            self.timer = Clock.schedule_once(retry, RETRY_DELAY)
+
+    def updated(self, matchobject):
+        self.matchobject = matchobject
 
         # Gooooooooooooaaaaaaaaaaaaaallllllllll!
         if self.matchobject.Goal:
@@ -182,13 +260,7 @@ class FootballBase(Screen):
                 self.notifyEvent(event_type=EVT_KICK_OFF)
 
         # Schedule next update
-        if self.matchobject:
-            dt = 30
-        else:
-            dt = 60 * 60
-
-        self.nextupdate = time.time() + dt
-        self.timer = Clock.schedule_once(self.update, dt)
+        self.scheduleUpdate()
 
         # Refresh data on the screen.
         self.checkscreen()
@@ -273,6 +345,8 @@ class LeagueBase(Screen):
         self.leaguename = "Retrieving league information."
         self.running = False
         self.timer = None
+        self.job = None
+        self.active = False
         self.nextupdate = 0
         self.leaguestack = None
         self.newbox = None
@@ -284,8 +358,11 @@ class LeagueBase(Screen):
         """Works out if we're due an update or not and schedules the refesh as
            appropriate.
         """
+        self.active = True
+
         if not self.running:
             Clock.schedule_once(self.getLeagueObject, 0.5)
+            return
 
         tm = time.time()
 
@@ -297,31 +374,81 @@ class LeagueBase(Screen):
         self.timer = Clock.schedule_once(self.update, dt)
 
     def on_leave(self):
+        self.active = False
         Clock.unschedule(self.timer)
 
+    def prefetch(self):
+        """Refreshes the data before the screen is shown (if it's due)."""
+        if self.active or time.time() < self.nextupdate:
+            return
+
+        if self.running:
+            self.update()
+        else:
+            self.getLeagueObject()
+
     def getLeagueObject(self, *args):
-        """Creates the league object if we don't have one yet."""
-        if not self.running:
-            self.leagueobject = League(self.leagueid, detailed=False)
-            self.running = True
+        """Creates the league object (in the background) if we don't have one
+           yet.
+        """
+        if not self.running and not (self.job and self.job.pending):
+            self.job = fetch_service.submit(League,
+                                            args=(self.leagueid,),
+                                            kwargs={"detailed": False},
+                                            callback=self.gotLeagueObject,
+                                            errback=self.fetchFailed,
+                                            owner=self)
+
+    def gotLeagueObject(self, leagueobject):
+        self.leagueobject = leagueobject
+        self.running = True
         self.checkscreen()
+        self.scheduleUpdate()
 
-    def update(self, *args):
-        # Reresh the league object data.
-        self.leagueobject.Update()
-
-        # Schedule the next update
+    def scheduleUpdate(self):
         if self.leagueobject.HasFinished or not self.leagueobject:
             dt = 60 * 60
         else:
             dt = 30
 
         self.nextupdate = time.time() + dt
-        self.timer = Clock.schedule_once(self.update, dt)
+
+        # If we were refreshed before being shown, on_enter will schedule the
+        # next update.
+        if self.active:
+            self.timer = Clock.schedule_once(self.update, dt)
+
+    def update(self, *args):
+        # Get fresh league data in the background (the current league
+        # object is still being shown so we don't change it).
+        if self.job and self.job.pending:
+            return
+
+        self.job = fetch_service.submit(League,
+                                        args=(self.leagueid,),
+                                        kwargs={"detailed": False},
+                                        callback=self.updated,
+                                        errback=self.fetchFailed,
+                                        owner=self)
+
+    def fetchFailed(self, error):
+        """Tries again later if we couldn't get the league details."""
+        self.nextupdate = time.time() + RETRY_DELAY
+
+        if self.active:
+            retry = self.update if self.running else self.getLeagueObject
+            self.timer = Clock.schedule_once(retry, RETRY_DELAY)
+
+    def updated(self, leagueobject):
+        self.leagueobject = leagueobject
+
+        # Schedule the next update
+        self.scheduleUpdate()
 
         # Update the screen.
         self.checkscreen()
 
+    @tracer.traced(cat="render", screen="football")
     def checkscreen(self):
         """Updates the screen depending on the state of the league object."""
         # If there are league matches, clear the screen
@@ -562,6 +689,12 @@ class FootballScreen(Screen):
             if c.name == self.fscrmgr.current:
                 c.on_leave()
 
+    def prefetch(self):
+        # Refresh the match or league that will be shown when we're displayed
+        for c in self.fscrmgr.children:
+            if c.name == self.fscrmgr.current and hasattr(c, "prefetch"):
+                c.prefetch()
+
     def next_screen(self, rev=True):
         a = self.myscreens
         n = -1 if rev else 1
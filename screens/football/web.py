@@ -1,7 +1,7 @@
-import json
 import bottle
 import os
-import requests
+
+from core.webapi import api_client
 
 plugin_path = os.path.dirname(__file__)
 plugin = os.path.basename(plugin_path)
@@ -30,10 +30,7 @@ bindings = [("/footballscores", "show_teams", ["GET"]),
             ("/footballscores/update", "update", ["POST"])]
 
 def show_teams():
-    host = bottle.request.get_header('host')
-    addr = "http://localhost:8089/api/{plugin}/configure".format(host=host,
-                                                          plugin=plugin)
-    getconfig = requests.get(addr).json()
+    getconfig = api_client.get_config(plugin)
 
     with open(all_teams, "r") as teamfile:
         teams = [x.strip() for x in teamfile.readlines()]
@@ -64,16 +61,11 @@ def show_teams():
     return bottle.template(tpl)
 
 def update():
-    host = bottle.request.get_header('host')
-    addr = "http://localhost:8089/api/{plugin}/configure".format(host=host,
-                                                              plugin=plugin)
     leagues = bottle.request.forms.getall("leagues")
     teams = bottle.request.forms.getall("teams")
     data = {"teams": teams, "leagues": leagues}
     print data
-    headers = {"Content-Type": "application/json; charset=utf8"}
-    r = requests.post(addr, headers=headers, data=json.dumps(data))
-    j = r.json()
+    j = api_client.set_config(plugin, data)
     if j["status"] == "success":
         bottle.redirect("/")
     else:
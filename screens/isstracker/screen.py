@@ -5,11 +5,12 @@ import json
 from kivy.uix.label import Label
 from kivy.uix.screenmanager import Screen
 from kivy.garden.mapview import MapView, MapMarker, MarkerMapLayer
-from kivy.clock import Clock
 
-import requests
 import ephem
 
+from core.httpclient import http_client
+from core.ticks import tick_bus, SECOND
+
 class ISSScreen(Screen):
     def __init__(self, **kwargs):
         super(ISSScreen, self).__init__(**kwargs)
@@ -58,11 +59,11 @@ class ISSScreen(Screen):
 
     def on_enter(self):
 
-        self.timer = Clock.schedule_interval(self.update, 1)
+        self.timer = tick_bus.subscribe(self.update, SECOND, owner=self)
 
     def on_leave(self):
 
-        Clock.unschedule(self.timer)
+        tick_bus.unsubscribe(self.timer)
 
     def utcnow(self):
         return (datetime.utcnow() - datetime(1970,1,1)).total_seconds()
@@ -129,7 +130,7 @@ class ISSScreen(Screen):
         if need_update:
 
             # Load the TLE data
-            raw = requests.get(source).text
+            raw = http_client.get(source, source="isstracker").text
 
             # Split the data into a neat list
             all_sats = [sat.strip() for sat in raw.split("\n")]
@@ -10,8 +10,9 @@ Please note, if you use TfL data in your application you should
 acknowledge the source of your data as appropriate.
 """
 
-# Simple way of submitting web requests (easier to use than urllib2)
-import requests
+# Shared (pooled) client for submitting web requests
+from core.httpclient import http_client
+from core.tracing import tracer
 
 # We need json to turn the JSON response into a python dict/list
 import json
@@ -29,7 +30,8 @@ BASE_URL = ("http://countdown.api.tfl.gov.uk/interfaces/"
 
 def __getBusData(stopcode):
     # Add the stop code to the web address and get the page
-    r = requests.get(BASE_URL.format(stopcode=stopcode))
+    r = http_client.get(BASE_URL.format(stopcode=stopcode),
+                        source="londonbus")
 
     # If the request was ok
     if r.status_code == 200:
@@ -47,7 +49,8 @@ def __getBusData(stopcode):
             # representing a single list
             rawdata = "[{data}]".format(data=rawdata)
             # And now we can load into JSON to give us an actual list of lists
-            return json.loads(rawdata)
+            with tracer.span("json", cat="parse", screen="londonbus"):
+                return json.loads(rawdata)
 
     else:
         return None
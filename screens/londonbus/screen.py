@@ -1,16 +1,19 @@
 import os
 import sys
 import re
+import time
 
 from kivy.clock import Clock
 from kivy.uix.label import Label
 from kivy.uix.togglebutton import ToggleButton
 from kivy.uix.screenmanager import Screen
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.stacklayout import StackLayout
-from kivy.uix.scrollview import ScrollView
 from kivy.properties import StringProperty, DictProperty
 
+from core.fetch import fetch_service
+from core.reconcile import reconcile
+from core.tracing import tracer
+
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import londonbus as LB
@@ -36,7 +39,9 @@ class LondonBus(BoxLayout):
 
     def __init__(self, **kwargs):
         super(LondonBus, self).__init__(**kwargs)
-        bus = kwargs["bus"]
+        self.update(kwargs["bus"])
+
+    def update(self, bus):
         self.bus_route = bus["route"]
         self.bus_destination = bus["destination"]
         self.bus_time = bus["time"]
@@ -53,10 +58,14 @@ class LondonBusStop(Screen):
         self.stop = kwargs["stop"]
         self.description = self.stop["description"]
         self.filters = None
+        self.job = None
+        self.nextupdate = 0
 
     def on_enter(self):
-        # Refresh the information when we load the screen
-        Clock.schedule_once(self.get_buses, 0.5)
+        # Refresh the information when we load the screen (unless we were
+        # refreshed just before being shown)
+        if time.time() > self.nextupdate:
+            Clock.schedule_once(self.get_buses, 0.5)
 
         # and schedule updates every 30 seconds.
         self.timer = Clock.schedule_interval(self.get_buses, 30)
@@ -65,18 +74,37 @@ class LondonBusStop(Screen):
         # Save resource by removing schedule
         Clock.unschedule(self.timer)
 
+    def prefetch(self):
+        # Refresh the arrivals before we're shown (if they're due)
+        if time.time() > self.nextupdate:
+            self.get_buses()
+
     def get_buses(self, *args):
         """Starts the process of retrieving countdown information."""
-        try:
-            # Load the bus data.
-            self.buses = LB.BusLookup(self.stop["stopid"])
-        except:
-            # If there's an error (e.g. no internet connection) then we have
-            # no bus data.
-            self.buses = None
+        # Don't queue up another request if the last one hasn't finished.
+        if self.job and self.job.pending:
+            return
+
+        # Load the bus data in the background.
+        self.job = fetch_service.submit(LB.BusLookup,
+                                        args=(self.stop["stopid"],),
+                                        callback=self.show_buses,
+                                        errback=self.fetch_failed,
+                                        owner=self)
+
+    def fetch_failed(self, error):
+        # If there's an error (e.g. no internet connection) then we have
+        # no bus data.
+        self.show_buses(None)
+
+    @tracer.traced(cat="render", screen="londonbus")
+    def show_buses(self, buses):
+        """Updates the screen with the countdown information."""
+        self.buses = buses
 
         if self.buses:
             # We've got bus data so let's update the screen.
+            self.nextupdate = time.time() + 30
             self.draw_filter()
         else:
             # No bus data so notify the user.
@@ -110,27 +138,18 @@ class LondonBusStop(Screen):
 
     def draw_buses(self):
         """Adds the buses to the main screen."""
-        # Clear the screen of any buses.
-        self.ids.bx_buses.clear_widgets()
-
         # Get a list of just those buses who are included in the filter.
         buses = [b for b in self.buses if b["route"] in self.filters]
 
+        # Update the list of buses, only creating rows for new buses
+        reconcile(self.ids.bus_list, buses,
+                  key=lambda bus: (bus["route"], bus["destination"]),
+                  create=lambda bus: LondonBus(bus=bus),
+                  update=lambda row, bus: row.update(bus))
+
         # Work out the height needed to display all the buses
         # (we need this for the StackLayout)
-        h = (len(buses) * 30)
-
-        # Create a StackLayout and ScrollView
-        sl = StackLayout(orientation="tb-lr", height=h, size_hint=(1, None))
-        sv = ScrollView(size_hint=(1, 1))
-        sv.add_widget(sl)
-        self.ids.bx_buses.add_widget(sv)
-
-        # Loop over the buses, create a LondonBus object and add it to the
-        # StackLayout
-        for bus in buses:
-            bs = LondonBus(bus=bus)
-            sl.add_widget(bs)
+        self.ids.bus_list.height = len(buses) * 30
 
     def toggled(self, instance, value):
         """Updates self.filters to include only those bus routes whose
@@ -162,8 +181,7 @@ class LondonBusScreen(Screen):
         # to set up a sub-screen for each bus stop.
         if not self.running:
             for stop in self.stops:
-                nm = str(stop["stopid"])
-                self.scrmgr.add_widget(LondonBusStop(stop=stop, name=nm))
+                self.add_stop(stop)
             self.running = True
 
         else:
@@ -180,6 +198,64 @@ class LondonBusScreen(Screen):
             if c.name == self.scrmgr.current:
                 c.on_leave()
 
+    def prefetch(self):
+        # Refresh the stop that will be shown when we're displayed
+        for c in self.scrmgr.children:
+            if c.name == self.scrmgr.current:
+                c.prefetch()
+
+    def add_stop(self, stop):
+        nm = str(stop["stopid"])
+        self.scrmgr.add_widget(LondonBusStop(stop=stop, name=nm))
+
+    def update_params(self, diff):
+        """Adds and removes bus stops without rebuilding the screen so we
+           keep the arrivals for the stops that haven't changed.
+        """
+        # Anything else needs a full reload
+        if not diff.only("stops") or not diff.new["stops"]:
+            return False
+
+        self.params = diff.new
+        self.stops = self.params["stops"]
+        self.myscreens = [str(x["stopid"]) for x in self.stops]
+
+        # The stops will be set up when we're first shown
+        if not self.running:
+            return True
+
+        current = self.scrmgr.current
+        shown = self.manager is not None and self.manager.current == self.name
+
+        # Remove the stops that have gone
+        for c in list(self.scrmgr.screens):
+            if c.name not in self.myscreens:
+                if shown and c.name == current:
+                    c.on_leave()
+                fetch_service.cancel(c)
+                self.scrmgr.remove_widget(c)
+
+        # Add the new stops and update the descriptions of the others
+        for stop in self.stops:
+            nm = str(stop["stopid"])
+            if self.scrmgr.has_screen(nm):
+                c = self.scrmgr.get_screen(nm)
+                c.stop = stop
+                c.description = stop["description"]
+            else:
+                self.add_stop(stop)
+
+        # If the stop we were showing has gone, show the first one
+        if current in self.myscreens:
+            self.scrid = self.myscreens.index(current)
+        else:
+            self.scrid = 0
+            self.scrmgr.current = self.myscreens[0]
+            if shown:
+                self.scrmgr.current_screen.on_enter()
+
+        return True
+
     def next_screen(self, rev=True):
         a = self.myscreens
         n = -1 if rev else 1
@@ -11,8 +11,10 @@ from kivy.properties import (StringProperty,
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.screenmanager import Screen
 from kivy.uix.gridlayout import GridLayout
+from kivy.uix.label import Label
 
 from core.bglabel import BGLabel
+from core.reconcile import reconcile
 
 from MythTV import MythBE
 
@@ -36,7 +38,12 @@ class MythRecordingHeader(BGLabel):
     def __init__(self, **kwargs):
         super(MythRecordingHeader, self).__init__(**kwargs)
         self.bgcolour = [0.1, 0.1, 0.4, 1]
-        self.rec_date = kwargs["rec_date"]
+        self.setDay(kwargs["day"])
+
+    def setDay(self, day):
+        """Shows the date for a day (in seconds since the epoch)."""
+        day = dt.timedelta(0, day) + EPOCH
+        self.rec_date = day.strftime("%A %d %B")
 
 
 class MythTVScreen(Screen):
@@ -68,6 +75,10 @@ class MythTVScreen(Screen):
         self.be = None
         self.recs = None
 
+        # Create a child widget to hold the recordings.
+        self.sl = GridLayout(cols=1, size_hint=(1, None), spacing=2)
+        self.sl.bind(minimum_height=self.sl.setter('height'))
+
     def on_enter(self):
         # We only update when we enter the screen. No need for regular updates.
         self.getRecordings()
@@ -160,30 +171,47 @@ class MythTVScreen(Screen):
         If not, the user is notified that the backend is unreachable.
         """
         sv = self.ids.myth_scroll
-        sv.clear_widgets()
 
         if self.recs:
-            # Create a child widget to hold the recordings.
-            self.sl = GridLayout(cols=1, size_hint=(1, None), spacing=2)
-            self.sl.bind(minimum_height=self.sl.setter('height'))
-
-            # Loop over the list of recordings.
+            # Make sure we're showing the list of recordings
+            if self.sl.parent is not sv:
+                sv.clear_widgets()
+                sv.add_widget(self.sl)
+
+            # The recordings are grouped by day so we need a header for
+            # each day followed by that day's recordings.
+            rows = []
             for rec in self.recs:
+                rows.append(("day", rec[0]))
+                rows.extend(("rec", r) for r in rec[1])
 
-                # These are grouped by day so we need a header
-                day = dt.timedelta(0, rec[0]) + EPOCH
-                mrh = MythRecordingHeader(rec_date=day.strftime("%A %d %B"))
-                self.sl.add_widget(mrh)
-
-                # Then we loop over the recordings scheduled for that day
-                for r in rec[1]:
-                    # and add them to the display.
-                    mr = MythRecording(rec=r)
-                    self.sl.add_widget(mr)
-
-            sv.add_widget(self.sl)
+            # Update the list, only creating widgets for new recordings.
+            reconcile(self.sl, rows,
+                      key=self.rowKey,
+                      create=self.createRow,
+                      update=self.updateRow)
 
         else:
             lb = Label(text="Backend is unreachable and there is no cached"
                             " information")
+            sv.clear_widgets()
             sv.add_widget(lb)
+
+    def rowKey(self, row):
+        kind, item = row
+        if kind == "day":
+            return (kind, item)
+        return (kind, item["timestamp"], item["title"])
+
+    def createRow(self, row):
+        kind, item = row
+        if kind == "day":
+            return MythRecordingHeader(day=item)
+        return MythRecording(rec=item)
+
+    def updateRow(self, widget, row):
+        kind, item = row
+        if kind == "day":
+            widget.setDay(item)
+        else:
+            widget.rec = item
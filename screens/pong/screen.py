@@ -62,6 +62,9 @@ class PongScreen(Screen):
 
         self.speed = 8
 
+        # The game needs the full frame rate while it's running
+        self.keep_awake = False
+
     def lock(self, locked=True):
         app = App.get_running_app()
         app.base.toggle_lock(locked)
@@ -84,6 +87,7 @@ class PongScreen(Screen):
         self.pongfloat.remove_widget(lbl)
         self.serve_ball()
         Clock.schedule_interval(self.update, 1.0 / 30.0)
+        self.keep_awake = True
         self.lock(True)
 
     def restart(self, vel, lbl):
@@ -95,6 +99,7 @@ class PongScreen(Screen):
 
     def on_leave(self):
         Clock.unschedule(self.update)
+        self.keep_awake = False
         self.player1.score = 0
         self.player2.score = 0
         for c in self.pongfloat.children:
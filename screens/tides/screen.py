@@ -1,12 +1,13 @@
 from kivy.uix.label import Label
 from kivy.properties import DictProperty, StringProperty
-from kivy.clock import Clock
 from kivy.uix.screenmanager import Screen
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.scrollview import ScrollView
 from kivy.logger import Logger
 
-import requests
+from core.httpclient import http_client
+from core.ticks import tick_bus, SECOND
+
 import time
 from datetime import datetime
 import dateutil.parser
@@ -74,7 +75,7 @@ class TidesSummary(Screen):
         self.url_tides = self.buildURL(self.location)
         #with open('screens/tides/result.json') as data_file:    
         #    self.tides = json.load(data_file)
-        self.tides = requests.get(self.url_tides).json()
+        self.tides = http_client.get(self.url_tides, source="tides").json()
         if self.tides == None or not self.tides.has_key('status'):
             raise TideException("Unknown error")
         if self.tides['status'] != 200:
@@ -158,14 +159,14 @@ class TidesSummary(Screen):
 
     def on_enter(self):
         # We only need to update the clock every second.
-        self.timer = Clock.schedule_interval(self.update, 1)
+        self.timer = tick_bus.subscribe(self.update, SECOND, owner=self)
 
     def on_pre_enter(self):
         self.get_time()
 
     def on_pre_leave(self):
         # Save resource by unscheduling the updates.
-        Clock.unschedule(self.timer)
+        tick_bus.unsubscribe(self.timer)
 
     def is_setup(self):
         if self.tides:
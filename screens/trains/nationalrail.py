@@ -11,8 +11,9 @@ projects.
 # We can therefore insert the current time to get details on the next trains
 from datetime import datetime
 
-# Simple way of submitting web requests (easier to use than urllib2)
-import requests
+# Shared (pooled) client for submitting web requests
+from core.httpclient import http_client
+from core.tracing import tracer
 
 # BeautifulSoup is the tool we'll use for scraping the pages
 from BeautifulSoup import BeautifulSoup
@@ -38,7 +39,7 @@ SUFFIX = "{start}/{dest}/{dep_day}/{dep_time}/{direction}"
 
 # Simple method to submit web request
 def __getPage(url):
-    r = requests.get(url)
+    r = http_client.get(url, source="trains")
     if r.status_code == 200:
         return r.text
     else:
@@ -53,7 +54,8 @@ def __parsePage(page):
 
     else:
         # Send the web page to BeautifulSoup
-        raw = BeautifulSoup(page)
+        with tracer.span("BeautifulSoup", cat="parse", screen="trains"):
+            raw = BeautifulSoup(page)
         try:
             # We're using looking for table rows that contain "mtx" in the
             # class tag. We need to use regex here as there may be other
@@ -1,6 +1,7 @@
 import os
 import sys
 import time
+from datetime import datetime
 
 from kivy.clock import Clock
 from kivy.uix.label import Label
@@ -9,6 +10,10 @@ from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.stacklayout import StackLayout
 from kivy.properties import StringProperty, ListProperty
 
+from core.datacache import data_cache
+from core.fetch import fetch_service
+from core.tracing import tracer
+
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import nationalrail as NR
@@ -33,8 +38,20 @@ class TrainJourney(Screen):
         self.running = False
         self.nextupdate = 0
         self.timer = None
+        self.job = None
+        self.active = False
+
+        # Show the last saved trains while we wait for the first update
+        self.cachekey = "trains:{}:{}".format(self.frm, self.to)
+        trains, saved = data_cache.get(self.cachekey)
+        if trains:
+            updt = datetime.fromtimestamp(saved).strftime("%H:%M")
+            desc = "{} (saved data from {})".format(self.desc, updt)
+            self.drawTrains(trains, desc)
 
     def on_enter(self):
+        self.active = True
+
         # Calculate when the next update is due.
         if (time.time() > self.nextupdate):
             dt = 0.5
@@ -44,52 +61,48 @@ class TrainJourney(Screen):
         self.timer = Clock.schedule_once(self.getTrains, dt)
 
     def on_leave(self):
+        self.active = False
         Clock.unschedule(self.timer)
 
     def getTrains(self, *args):
-        # Try loading the train data but handle any failure gracefully.
-        try:
-            trains = NR.lookup(self.frm, self.to)
-        except:
-            trains = None
-
-        # If we've got trains then we need to set up the screen
+        # Don't queue up another request if the last one hasn't finished.
+        if self.job and self.job.pending:
+            return
+
+        # Load the train data in the background and handle any failure
+        # gracefully.
+        self.job = fetch_service.submit(self.fetchTrains,
+                                        callback=self.showTrains,
+                                        errback=self.fetchFailed,
+                                        owner=self)
+
+    def fetchFailed(self, error):
+        self.showTrains(None)
+
+    def fetchTrains(self):
+        # Runs in a worker thread.
+        trains = NR.lookup(self.frm, self.to)
+
+        # Save the trains so we can show them straight away next time (here
+        # rather than in showTrains so the write doesn't hold up the
+        # display)
         if trains:
-            # Get rid of the previous widgets.
-            self.clear_widgets()
-
-            # Add a box layout
-            self.bx = BoxLayout(orientation="vertical")
-
-            # Show the name of the train route
-            self.bx.add_widget(Label(text=self.desc, size_hint_y=0.2))
-
-            # Add headers for the trains
-            self.bx.add_widget(TrainDetail(train=self.headers,
-                                           bg=[0.2, 0.2, 0.2, 1]))
-
-            # Create a StackLayout in case we need to scroll over the trains.
-            self.stck = StackLayout(orientation="tb-lr", size_hint_y=0.8)
-            self.bx.add_widget(self.stck)
-
-            # Loop over the trains
-            for train in trains:
-
-                # Create a TrainDetail widget and add it to the StackLayout
-                trn = TrainDetail(train=train)
-                self.stck.add_widget(trn)
+            data_cache.set(self.cachekey, trains)
 
-            # Get rid of the Loading label (if it's there)
-            try:
-                self.remove_widget(self.ids.load_label)
-            except ReferenceError:
-                pass
+        return trains
 
-            self.add_widget(self.bx)
+    def showTrains(self, trains):
+        # If we've got trains then we need to set up the screen
+        if trains:
+            self.drawTrains(trains, self.desc)
 
             # Set the next update for 5 mins later
             self.nextupdate = time.time() + 300
-            self.timer = Clock.schedule_once(self.getTrains, 300)
+
+            # If we've left the screen, on_enter will schedule the next
+            # update.
+            if self.active:
+                self.timer = Clock.schedule_once(self.getTrains, 300)
 
         # No trains so let the user know.
         else:
@@ -100,6 +113,40 @@ class TrainJourney(Screen):
             lb = Label(text=errorm)
             self.add_widget(lb)
 
+    @tracer.traced(cat="render", screen="trains")
+    def drawTrains(self, trains, desc):
+        # Get rid of the previous widgets.
+        self.clear_widgets()
+
+        # Add a box layout
+        self.bx = BoxLayout(orientation="vertical")
+
+        # Show the name of the train route
+        self.bx.add_widget(Label(text=desc, size_hint_y=0.2))
+
+        # Add headers for the trains
+        self.bx.add_widget(TrainDetail(train=self.headers,
+                                       bg=[0.2, 0.2, 0.2, 1]))
+
+        # Create a StackLayout in case we need to scroll over the trains.
+        self.stck = StackLayout(orientation="tb-lr", size_hint_y=0.8)
+        self.bx.add_widget(self.stck)
+
+        # Loop over the trains
+        for train in trains:
+
+            # Create a TrainDetail widget and add it to the StackLayout
+            trn = TrainDetail(train=train)
+            self.stck.add_widget(trn)
+
+        # Get rid of the Loading label (if it's there)
+        try:
+            self.remove_widget(self.ids.load_label)
+        except ReferenceError:
+            pass
+
+        self.add_widget(self.bx)
+
 
 class TrainDetail(BoxLayout):
     """Custom widget to show detail for a specific train."""
@@ -6,8 +6,9 @@ Please note, if you use TfL data in your application you should
 acknowledge the source of your data as appropriate.
 """
 
-# Simple way of submitting web requests (easier to use than urllib2)
-import requests
+# Shared (pooled) client for submitting web requests
+from core.httpclient import http_client
+from core.tracing import tracer
 
 # we'll use the basic eTree parser to parse the XML file
 import xml.etree.cElementTree as et
@@ -20,7 +21,7 @@ BASE_URL = "http://cloud.tfl.gov.uk/TrackerNet/LineStatus"
 
 
 def __getTubeData():
-    r = requests.get(BASE_URL)
+    r = http_client.get(BASE_URL, source="tube")
     if r.status_code == 200:
         return r.content
     else:
@@ -54,7 +55,8 @@ def TubeStatus(filterlines=None):
         # difficult)
         rawstatus = re.sub(' xmlns="[^"]+"', '', rawstatus, count=1)
         # Loa it into eTree
-        status = et.XML(rawstatus)
+        with tracer.span("XML", cat="parse", screen="tube"):
+            status = et.XML(rawstatus)
     else:
         return None
 
@@ -12,6 +12,10 @@ from kivy.properties import (ObjectProperty,
 from kivy.uix.screenmanager import Screen
 from kivy.uix.boxlayout import BoxLayout
 
+from core.datacache import data_cache
+from core.fetch import fetch_service
+from core.tracing import tracer
+
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from resources.londonunderground import TubeStatus
@@ -43,6 +47,13 @@ class TubeScreen(Screen):
         self.build_dict()
         super(TubeScreen, self).__init__(**kwargs)
         self.timer = None
+        self.job = None
+        self.nextupdate = 0
+
+        # Show the last saved status while we wait for the first update
+        raw, saved = data_cache.get("tube")
+        if raw:
+            self.show_status(raw, saved)
 
     def hex_to_kcol(self, hexcol):
         """Method to turn hex colour code to Kivy compatible list."""
@@ -74,12 +85,33 @@ class TubeScreen(Screen):
         self.tube["update"] = "Waiting for data..."
 
     def update(self, dt):
-        # Get the tube data or handle failure to retrieve data.
-        try:
-            raw = TubeStatus()
-        except:
-            raw = None
+        # Don't queue up another request if the last one hasn't finished.
+        if self.job and self.job.pending:
+            return
+
+        # Get the tube data in the background.
+        self.job = fetch_service.submit(self.fetch_status,
+                                        callback=self.show_status,
+                                        errback=self.fetch_failed,
+                                        owner=self)
+
+    def fetch_status(self):
+        # Runs in a worker thread.
+        raw = TubeStatus()
+
+        # Save the data so we can show it straight away next time (here
+        # rather than in show_status so the write doesn't hold up the
+        # display)
+        if raw:
+            data_cache.set("tube", raw)
+
+        return raw
 
+    def fetch_failed(self, error):
+        self.show_status(None)
+
+    @tracer.traced(cat="render", screen="tube")
+    def show_status(self, raw, saved=None):
         # If we've got data, let's show the status
         if raw:
             temp = {x["name"][:3].upper(): x["status"] for x in raw}
@@ -103,15 +135,29 @@ class TubeScreen(Screen):
 
         self.tube["colours"] = self.coldict
 
-        if raw:
+        # Let the user know if this is old data
+        if raw and saved:
+            updt = datetime.fromtimestamp(saved).strftime("%H:%M")
+            self.tube["update"] = ("Saved data from {} - "
+                                   "waiting for update...".format(updt))
+
+        elif raw:
             updt = datetime.now().strftime("%H:%M")
             self.tube["update"] = "Last updated at {}".format(updt)
             self.nextupdate = time.time() + 300
 
     def on_enter(self):
-        self.update(None)
+        # No need to update straight away if we were refreshed just before
+        # being shown.
+        if time.time() > self.nextupdate:
+            self.update(None)
         self.timer = Clock.schedule_interval(self.update, 5 * 60)
 
+    def prefetch(self):
+        # Refresh the status before we're shown (if it's due)
+        if time.time() > self.nextupdate:
+            self.update(None)
+
     def on_leave(self):
         Clock.unschedule(self.timer)
 
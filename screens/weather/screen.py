@@ -1,17 +1,26 @@
 import os
 import sys
-import requests
 import time
+from datetime import datetime
 
 from kivy.uix.label import Label
 from kivy.uix.screenmanager import Screen
 from kivy.uix.boxlayout import BoxLayout
 from kivy.properties import StringProperty
 from kivy.clock import Clock
-from kivy.uix.scrollview import ScrollView
+
+from core.datacache import data_cache
+from core.fetch import fetch_service
+from core.httpclient import http_client
+from core.reconcile import reconcile
+from core.tracing import tracer
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Forecasts don't change often so there's no need to download them again if
+# the location is shown again within this time (in seconds).
+WEATHER_TTL = 15 * 60
+
 
 class WeatherForecastHourly(BoxLayout):
     """Custom widget to show hourly forecast summary."""
@@ -62,15 +71,28 @@ class WeatherSummary(Screen):
 
     def __init__(self, **kwargs):
         super(WeatherSummary, self).__init__(**kwargs)
-        self.location = kwargs["location"]
+        self.location = self.locationname = kwargs["location"]
         self.url_forecast = kwargs["forecast"]
         self.url_hourly = kwargs["hourly"]
         self.bx_forecast = self.ids.bx_forecast
-        self.bx_hourly = self.ids.bx_hourly
+        self.hourly_list = self.ids.hourly_list
         self.nextupdate = 0
         self.timer = None
+        self.job = None
+        self.active = False
+
+        # Show the last saved forecast while we wait for the first update
+        self.cachekey = "weather:{}".format(kwargs["name"])
+        result, saved = data_cache.get(self.cachekey)
+        if result:
+            self.showData(*result)
+            updt = datetime.fromtimestamp(saved).strftime("%H:%M")
+            self.location = "{} (saved data from {})".format(self.locationname,
+                                                             updt)
 
     def on_enter(self):
+        self.active = True
+
         # Check if the next update is due
         if (time.time() > self.nextupdate):
             dt = 0.5
@@ -80,57 +102,57 @@ class WeatherSummary(Screen):
         self.timer = Clock.schedule_once(self.getData, dt)
 
     def on_leave(self):
+        self.active = False
         Clock.unschedule(self.timer)
 
+    def prefetch(self):
+        # Refresh the forecast before we're shown (if it's due)
+        if not self.active and time.time() > self.nextupdate:
+            self.getData()
+
     def getData(self, *args):
+        # Don't queue up another request if the last one hasn't finished.
+        if self.job and self.job.pending:
+            return
+
+        # Get the data in the background so we don't block the display.
+        self.job = fetch_service.submit(self.fetchData,
+                                        callback=self.drawData,
+                                        owner=self)
+
+    def fetchData(self):
         # Try to get the daily data but handle any failure to do so.
         try:
-            self.forecast = requests.get(self.url_forecast).json()
+            self.forecast = http_client.get(self.url_forecast,
+                                            source="weather",
+                                            ttl=WEATHER_TTL).json()
             days = self.forecast["forecast"]["simpleforecast"]["forecastday"]
         except:
             days = None
 
         # Try to get the hourly data but handle any failure to do so.
         try:
-            self.hourly = requests.get(self.url_hourly).json()
+            self.hourly = http_client.get(self.url_hourly,
+                                          source="weather",
+                                          ttl=WEATHER_TTL).json()
             hours = self.hourly["hourly_forecast"]
         except:
             hours = None
 
-        # Clear the screen of existing widgets
-        self.bx_forecast.clear_widgets()
-        self.bx_hourly.clear_widgets()
-
-        # If we've got daily info then we can display it.
-        if days:
-            for day in days:
-                frc = WeatherForecastDay(summary=day)
-                self.bx_forecast.add_widget(frc)
-
-        # If not, let the user know.
-        else:
-            lb_error = Label(text="Error getting weather data.")
-            self.bx_forecast.add_widget(lb_error)
+        # Save the data so we can show it straight away next time (here
+        # rather than in drawData so the write doesn't hold up the display)
+        if hours and days:
+            data_cache.set(self.cachekey, (days, hours))
 
-        # If we've got hourly weather data then show it
-        if hours:
+        return days, hours
 
-            # We need a scroll view as there's a lot of data...
-            w = len(hours) * 45
-            bx = BoxLayout(orientation="horizontal", size=(w, 180),
-                           size_hint=(None, None), spacing=5)
-            sv = ScrollView(size_hint=(1, 1))
-            sv.add_widget(bx)
+    def drawData(self, result):
+        days, hours = result
 
-            for hour in hours:
-                frc = WeatherForecastHourly(summary=hour)
-                bx.add_widget(frc)
-            self.bx_hourly.add_widget(sv)
+        # Make sure we're not still showing a "saved data" message
+        self.location = self.locationname
 
-        # If there's no data, let the user know
-        else:
-            lb_error = Label(text="Error getting weather data.")
-            self.bx_forecast.add_widget(lb_error)
+        self.showData(days, hours)
 
         # We're done, so schedule the next update
         if hours and days:
@@ -139,7 +161,37 @@ class WeatherSummary(Screen):
             dt = 5 * 60
 
         self.nextupdate = time.time() + dt
-        self.timer = Clock.schedule_once(self.getData, dt)
+
+        # If we were refreshed before being shown, on_enter will schedule the
+        # next update.
+        if self.active:
+            self.timer = Clock.schedule_once(self.getData, dt)
+
+    @tracer.traced(cat="render", screen="weather")
+    def showData(self, days, hours):
+        # Update the daily forecasts, only creating boxes for new days
+        reconcile(self.bx_forecast, days or [],
+                  key=lambda day: day["date"]["epoch"],
+                  create=lambda day: WeatherForecastDay(summary=day),
+                  update=lambda box, day: box.buildText(day))
+
+        # If there's no daily info, let the user know.
+        if not days:
+            lb_error = Label(text="Error getting weather data.")
+            self.bx_forecast.add_widget(lb_error)
+
+        # Update the hourly forecasts (in a scroll view as there's a lot of
+        # data...)
+        reconcile(self.hourly_list, hours or [],
+                  key=lambda hour: hour["FCTTIME"]["epoch"],
+                  create=lambda hour: WeatherForecastHourly(summary=hour),
+                  update=lambda box, hour: box.buildText(hour))
+        self.hourly_list.width = len(hours or []) * 45
+
+        # If there's no data, let the user know
+        if not hours:
+            lb_error = Label(text="Error getting weather data.")
+            self.bx_forecast.add_widget(lb_error)
 
 
 class WeatherScreen(Screen):
@@ -162,18 +214,7 @@ class WeatherScreen(Screen):
         # the locations
         if not self.running:
             for location in self.locations:
-
-                # Create the necessary URLs for the data
-                forecast, hourly = self.buildURLs(location["address"])
-
-                # Create a weather summary screen
-                ws = WeatherSummary(forecast=forecast,
-                                    hourly=hourly,
-                                    name=location["address"],
-                                    location=location["name"])
-
-                # and add to our screen manager.
-                self.scrmgr.add_widget(ws)
+                self.add_location(location)
 
             # set the flag so we don't do this again.
             self.running = True
@@ -192,6 +233,70 @@ class WeatherScreen(Screen):
             if c.name == self.scrmgr.current:
                 c.on_leave()
 
+    def prefetch(self):
+        # Refresh the location that will be shown when we're displayed
+        for c in self.scrmgr.children:
+            if c.name == self.scrmgr.current:
+                c.prefetch()
+
+    def add_location(self, location):
+        # Create the necessary URLs for the data
+        forecast, hourly = self.buildURLs(location["address"])
+
+        # Create a weather summary screen
+        ws = WeatherSummary(forecast=forecast,
+                            hourly=hourly,
+                            name=location["address"],
+                            location=location["name"])
+
+        # and add to our screen manager.
+        self.scrmgr.add_widget(ws)
+
+    def update_params(self, diff):
+        """Adds and removes locations without rebuilding the screen so we
+           keep the forecasts for the locations that haven't changed.
+        """
+        # Anything else (e.g. a new API key) needs a full reload
+        if not diff.only("locations") or not diff.new["locations"]:
+            return False
+
+        self.locations = diff.new["locations"]
+        self.myscreens = [x["address"] for x in self.locations]
+
+        # The locations will be set up when we're first shown
+        if not self.running:
+            return True
+
+        current = self.scrmgr.current
+        shown = self.manager is not None and self.manager.current == self.name
+
+        # Remove the locations that have gone
+        for c in list(self.scrmgr.screens):
+            if c.name not in self.myscreens:
+                if shown and c.name == current:
+                    c.on_leave()
+                fetch_service.cancel(c)
+                self.scrmgr.remove_widget(c)
+
+        # Add the new locations and update the names of the others
+        for location in self.locations:
+            if self.scrmgr.has_screen(location["address"]):
+                ws = self.scrmgr.get_screen(location["address"])
+                ws.locationname = ws.location = location["name"]
+            else:
+                self.add_location(location)
+
+        # If the location we were showing has gone, show the first one
+        if current in self.myscreens:
+            self.scrid = self.myscreens.index(current)
+        else:
+            self.scrid = 0
+            self.scrmgr.current = self.myscreens[0]
+            if shown:
+                self.scrmgr.current_screen.on_enter()
+
+        return True
+
     def buildURLs(self, location):
         return (self.forecast.format(key=self.key, location=location),
                 self.hourly.format(key=self.key, location=location))
@@ -4,12 +4,13 @@ import sys
 from datetime import datetime as DT
 
 from kivy.animation import Animation
-from kivy.clock import Clock
 from kivy.properties import BooleanProperty, StringProperty, ListProperty
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.label import Label
 from kivy.uix.screenmanager import Screen
 
+from core.ticks import tick_bus, FIVE_MINUTES
+
 
 def round_down(num, divisor):
     return num - (num % divisor)
@@ -68,11 +69,13 @@ class WordClockScreen(Screen):
             self.setup()
             self.running = True
 
-        # Set the interval timer
-        self.timer = Clock.schedule_interval(self.update, 1)
+        # The clock only changes every five minutes so we just need to
+        # update it now and then on each five minute boundary.
+        self.update()
+        self.timer = tick_bus.subscribe(self.update, FIVE_MINUTES, owner=self)
 
     def on_leave(self):
-        Clock.unschedule(self.timer)
+        tick_bus.unsubscribe(self.timer)
 
     def update(self, *args):
         # What time is it?
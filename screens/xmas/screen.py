@@ -1,11 +1,12 @@
 from datetime import datetime
 
-from kivy.clock import Clock
 from kivy.properties import StringProperty
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.screenmanager import Screen
 
+from core.ticks import tick_bus, MINUTE
+
 class XmasScreen(Screen):
 
     first_line = StringProperty("")
@@ -30,10 +31,13 @@ class XmasScreen(Screen):
         return datetime(yr, 12, 25, 0, 0)
 
     def on_enter(self):
-        self.timer = Clock.schedule_interval(self.update, 1)
+        # The countdown only shows minutes so there's no need to update it
+        # more often than that.
+        self.update()
+        self.timer = tick_bus.subscribe(self.update, MINUTE, owner=self)
 
     def on_leave(self):
-        Clock.unschedule(self.timer)
+        tick_bus.unsubscribe(self.timer)
 
     def update(self, *args):
         nw = datetime.now()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+'''Soak test for the Raspberry Pi Information Screen.
+
+   Runs the app with all of the enabled screens, changing screen every few
+   seconds for hours, and checks that the number of widgets, textures and
+   Python objects and the memory used don't keep growing (see core/soak.py).
+
+   The screens are fed with the recorded responses used by the benchmark
+   (see benchmark.py) so no network is needed:
+
+       python soak.py --hours 4 --output soak.json
+
+   The report is written as JSON. The exit status is 1 if a leak was found.
+   On a machine without a display, run it under a virtual one e.g.
+   "xvfb-run python soak.py".
+'''
+import argparse
+import json
+import os
+import sys
+
+# Stop Kivy from trying to parse our command line options
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+
+from kivy.app import App
+from kivy.clock import Clock
+from kivy.core.window import Window
+from kivy.logger import Logger
+
+from core.fixtures import FixtureFolder, FixtureSession
+from core.getplugins import getPlugins
+from core.httpclient import http_client
+from core.infoscreen import InfoScreen
+from core.kvcache import kv_cache
+from core.soak import SoakMonitor
+
+# Set the current working directory
+os.chdir(os.path.dirname(os.path.abspath(sys.argv[0])))
+
+# Default length of the test (in hours)
+DEFAULT_HOURS = 4
+
+# Default time (in seconds) to show each screen
+DEFAULT_INTERVAL = 2
+
+# Default time (in seconds) between samples
+DEFAULT_SAMPLE = 60
+
+# Default warm up time (in minutes) before we start looking for leaks
+DEFAULT_WARMUP = 10
+
+
+class SoakApp(App):
+    def __init__(self, plugins, monitor, interval, sample, duration,
+                 **kwargs):
+        super(SoakApp, self).__init__(**kwargs)
+        self.plugins = plugins
+        self.monitor = monitor
+        self.interval = interval
+        self.sample = sample
+        self.duration = duration
+
+    def build(self):
+        # Same size as the official Raspberry Pi display
+        Window.size = (800, 480)
+
+        kv_cache.load_file("base.kv")
+        for p in self.plugins:
+            kv_cache.load_file(p["kvpath"])
+
+        # Let the prefetcher change the screens for us
+        return InfoScreen(plugins=self.plugins,
+                          prefetch={"rotate": self.interval})
+
+    def on_start(self):
+        self.monitor.sample()
+        Clock.schedule_interval(self.monitor.sample, self.sample)
+        Clock.schedule_once(lambda dt: self.stop(), self.duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak test the screens.")
+    parser.add_argument("--hours", type=float, default=DEFAULT_HOURS,
+                        help="length of the test")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                        help="seconds to show each screen")
+    parser.add_argument("--sample", type=float, default=DEFAULT_SAMPLE,
+                        help="seconds between samples")
+    parser.add_argument("--warmup", type=float, default=DEFAULT_WARMUP,
+                        help="minutes to ignore at the start")
+    parser.add_argument("--fixtures", default=FixtureFolder,
+                        help="folder of recorded responses")
+    parser.add_argument("--output", help="file for the report "
+                                         "(default: print it)")
+    args = parser.parse_args()
+
+    # Use the recorded responses in place of the network
+    fixtures = FixtureSession(args.fixtures)
+    http_client.use_session(fixtures)
+
+    monitor = SoakMonitor(warmup=args.warmup * 60)
+    SoakApp(getPlugins(), monitor, args.interval, args.sample,
+            args.hours * 3600).run()
+
+    report = monitor.report()
+    report["fixtures"] = {"missing": sorted(fixtures.missing)}
+
+    if args.output:
+        with open(args.output, "w") as rfile:
+            json.dump(report, rfile, indent=4, sort_keys=True)
+        Logger.info("Soak: Report saved to {}".format(args.output))
+    else:
+        print json.dumps(report, indent=4, sort_keys=True)
+
+    if not report["passed"]:
+        Logger.error("Soak: Leaks found in {}".format(
+            ", ".join(sorted(report["leaks"]))))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()